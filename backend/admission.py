@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Intervalle minimal entre deux avertissements de délestage dans les logs
+SHED_LOG_SECONDS = 10.0
+
+
+class Overloaded(Exception):
+    """Requête refusée par le contrôle d'admission (file pleine ou attente trop longue)"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Serveur saturé ({reason}), réessayer dans {retry_after} s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """Place accordée par le contrôleur ; release() peut être appelé plusieurs fois"""
+    __slots__ = ("_controller", "_started", "released", "__weakref__")
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._started = time.monotonic()
+        self.released = False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        self._controller._release(time.monotonic() - self._started)
+
+    async def __aenter__(self) -> "Slot":
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """Contrôle d'admission devant un point d'entrée coûteux (décisions IA).
+
+    Au plus `max_in_flight` traitements en parallèle ; au-delà, jusqu'à
+    `max_queue` requêtes attendent leur tour (premier arrivé, premier
+    servi) pendant au plus `queue_timeout` secondes. Une requête qui trouve
+    la file pleine, ou qui attend trop longtemps, est refusée tout de suite
+    (`Overloaded`) avec un délai de nouvel essai estimé d'après la durée
+    moyenne d'un traitement, plutôt que d'accumuler de la latence pour tout
+    le monde. Les compteurs servent à dimensionner la capacité.
+    """
+
+    def __init__(self, name: str, max_in_flight: int = 64, max_queue: int = 256, queue_timeout: float = 2.0):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_seconds = 0.0  # moyenne glissante (exponentielle) d'un traitement
+        self._last_shed_log = 0.0
+        self._shed_since_log = 0
+        self.counters: Dict[str, Any] = {
+            "admitted": 0, "queued": 0, "degraded": 0,
+            "shed": {"queue_full": 0, "queue_timeout": 0},
+            "peak_in_flight": 0, "peak_queue": 0, "wait_ms_total": 0.0,
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Slot:
+        """Place de traitement ; lève Overloaded si la requête doit être délestée"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return self._admit(0.0)
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.counters["queued"] += 1
+        self.counters["peak_queue"] = max(self.counters["peak_queue"], len(self._waiters))
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._drop_waiter(future)
+                raise self._shed("queue_timeout")
+            # Place transmise au moment même de l'expiration : on la garde
+        except asyncio.CancelledError:
+            if future.done():
+                # Place déjà transmise à cette requête abandonnée : on la rend
+                self._release(None)
+            else:
+                self._drop_waiter(future)
+            raise
+        return self._admit(time.monotonic() - started)
+
+    def _admit(self, waited: float) -> Slot:
+        self.counters["admitted"] += 1
+        self.counters["peak_in_flight"] = max(self.counters["peak_in_flight"], self.in_flight)
+        self.counters["wait_ms_total"] += waited * 1000
+        return Slot(self)
+
+    def _drop_waiter(self, future: asyncio.Future):
+        future.cancel()
+        self._waiters.remove(future)
+
+    def _release(self, held_seconds: Optional[float]):
+        """Libère une place ; s'il y a une requête en attente, la place lui est transmise telle quelle"""
+        if held_seconds is not None:
+            self._service_seconds = held_seconds if not self._service_seconds else \
+                0.9 * self._service_seconds + 0.1 * held_seconds
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.in_flight -= 1
+
+    def retry_after(self) -> int:
+        """Secondes estimées avant qu'une place se libère pour une nouvelle requête"""
+        backlog = (len(self._waiters) + 1) / self.max_in_flight
+        return max(1, math.ceil(backlog * (self._service_seconds or 1.0)))
+
+    def degraded(self):
+        """Compte une requête délestée servie par la décision de secours locale"""
+        self.counters["degraded"] += 1
+
+    def _shed(self, reason: str) -> Overloaded:
+        self.counters["shed"][reason] += 1
+        self._shed_since_log += 1
+        now = time.monotonic()
+        if now - self._last_shed_log >= SHED_LOG_SECONDS:
+            logger.warning(
+                f"Admission {self.name}: {self._shed_since_log} requête(s) délestée(s) "
+                f"({reason}, {self.in_flight} en cours, {len(self._waiters)} en attente)"
+            )
+            self._last_shed_log = now
+            self._shed_since_log = 0
+        return Overloaded(reason, self.retry_after())
+
+    def stats(self) -> Dict[str, Any]:
+        admitted = self.counters["admitted"]
+        shed = sum(self.counters["shed"].values())
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted": admitted,
+            "queued": self.counters["queued"],
+            "shed": dict(self.counters["shed"]),
+            "degraded": self.counters["degraded"],
+            "shed_rate": round(shed / (admitted + shed), 4) if admitted + shed else 0.0,
+            "peak_in_flight": self.counters["peak_in_flight"],
+            "peak_queue": self.counters["peak_queue"],
+            "avg_wait_ms": round(self.counters["wait_ms_total"] / admitted, 3) if admitted else 0.0,
+            "avg_service_ms": round(self._service_seconds * 1000, 3),
+        }
@@ -1,31 +1,389 @@
-import openai
 import os
 import json
-from typing import Dict, List, Any
-from .models import NPC, DecisionRequest, DecisionResponse, NPCType, NPCMood, ActivityType, Location
+import asyncio
+import logging
+import time
+from typing import Dict, List, Any, Optional, NamedTuple
+from .models import NPC, DecisionRequest, DecisionResponse, NPCType, NPCMood, ActivityType, Location, Memory
+from .circuit_breaker import CircuitBreaker, AdaptiveTimeout, LatencyWindow
+from .token_governor import TokenGovernor, estimate_tokens
+from .llm_providers import LLMProvider, create_provider_from_env
+from .json_stream import IncrementalJSONFields
+from .model_router import ModelRouter, ModelTier
+from .dialogue_bank import DialogueBank, DEFAULT_BANK_PATH
+from .memory_archive import LazyMemories
+from .metrics import Histogram, LLM_BUCKETS
+from .timing import record_span, span
 from datetime import datetime
 import random
 
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "Tu es un assistant IA qui contrôle des PNJ dans GTA 5. Réponds toujours en JSON valide."
+
+# Action locale selon l'activité en cours (niveau "local" du routeur)
+ROUTINE_ACTIONS = {
+    ActivityType.WORKING: "travailler",
+    ActivityType.SHOPPING: "acheter",
+    ActivityType.DRIVING: "conduire",
+    ActivityType.WALKING: "marcher",
+    ActivityType.SOCIALIZING: "socialiser",
+    ActivityType.CRIMINAL_ACTIVITY: "se_cacher",
+    ActivityType.PATROLLING: "patrouiller",
+    ActivityType.SLEEPING: "dormir",
+    ActivityType.EATING: "manger",
+}
+
+class LLMCall(NamedTuple):
+    prompt: str
+    prompt_tokens: int
+    plan: Any
+    tier: ModelTier
+
 class AIEngine:
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        # Fournisseur LLM interchangeable (OpenAI, local déterministe, rejeu)
+        self.provider = provider or create_provider_from_env()
+        
+        # Niveau de modèle choisi selon la complexité de chaque décision
+        self.router = ModelRouter.from_env()
+        
+        # Résilience des appels LLM
+        self.breaker = CircuitBreaker(
+            error_rate_threshold=float(os.environ.get('LLM_BREAKER_ERROR_RATE', 0.5)),
+            p95_latency_threshold=float(os.environ.get('LLM_BREAKER_P95_SECONDS', 8.0)),
+            open_seconds=float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', 15.0))
+        )
+        self.latencies = LatencyWindow(200)  # latences des appels réussis uniquement
+        # Latence de tous les appels, par niveau et issue (exportée par GET /metrics)
+        self.call_latency = Histogram(
+            "gta5_llm_call_duration_seconds", "Durée des appels LLM par niveau de modèle et issue",
+            ("tier", "outcome"), LLM_BUCKETS
+        )
+        self.timeout = AdaptiveTimeout(
+            self.latencies,
+            initial=float(os.environ.get('LLM_TIMEOUT_SECONDS', 10.0)),
+            maximum=float(os.environ.get('LLM_TIMEOUT_MAX_SECONDS', 20.0))
+        )
+        self.hedging = os.environ.get('LLM_HEDGING', '0') == '1'
+        
+        # Budget global de tokens par minute
+        self.governor = TokenGovernor(int(os.environ.get('LLM_TOKENS_PER_MINUTE', 200000)))
         
-    async def make_decision(self, npc: NPC, request: DecisionRequest) -> DecisionResponse:
-        """Utilise OpenAI GPT pour faire prendre une décision intelligente au PNJ"""
+        # Répliques d'ambiance précalculées : le LLM ne génère le dialogue qu'en interaction avec le joueur
+        self.dialogue_bank = DialogueBank.load(os.environ.get('DIALOGUE_BANK_PATH', DEFAULT_BANK_PATH))
+        self.ambient_dialogue_rate = float(os.environ.get('DIALOGUE_AMBIENT_RATE', 0.5))
         
-        context_prompt = self._build_context_prompt(npc, request)
+        # Compteurs exportés via stats()
+        self.decisions = 0
+        self.fallbacks: Dict[str, int] = {}
+        self.hedges_launched = 0
+        self.hedges_won = 0
+        self.streamed = 0
+        self.stream_time_to_action = 0.0
+        self.stream_total_time = 0.0
         
+    async def make_decision(self, npc: NPC, request: DecisionRequest,
+                            memories: Optional[LazyMemories] = None) -> DecisionResponse:
+        """Utilise le LLM configuré (OpenAI GPT par défaut) pour faire prendre une décision au PNJ.
+        
+        `memories` : souvenirs archivés, lus seulement si la décision part vers le LLM.
+        """
+        self.decisions += 1
+        decision = await self._decide(npc, request, memories)
+        return self._with_dialogue(npc, request, decision)
+    
+    async def _decide(self, npc: NPC, request: DecisionRequest, memories: Optional[LazyMemories] = None) -> DecisionResponse:
+        reason, call = await self._plan_llm_call(npc, request, memories)
+        if reason == "local":
+            return self._local_decision(npc, request)
+        if reason:
+            return self._fallback(npc, request, reason)
+        plan, prompt_tokens = call.plan, call.prompt_tokens
+        
+        started = time.monotonic()
         try:
-            response = await self._call_openai(context_prompt)
-            decision = self._parse_decision_response(response)
-            return decision
-            
+            # Pas de requête doublée quand le budget est déjà sous tension
+            with span("llm_call"):
+                response, usage = await self._call_llm(call, hedge=plan.level == 0)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure(time.monotonic() - started)
+            self.call_latency.observe(time.monotonic() - started, call.tier.name, "timeout")
+            # Consommation inconnue : la réservation est conservée
+            self.governor.commit(plan, prompt_tokens, plan.max_tokens)
+            return self._fallback(npc, request, "timeout")
         except Exception as e:
-            print(f"Erreur IA pour NPC {npc.id}: {e}")
+            logger.error(f"Erreur IA pour NPC {npc.id}: {e}")
+            self.breaker.record_failure(time.monotonic() - started)
+            self.call_latency.observe(time.monotonic() - started, call.tier.name, "error")
+            self.governor.release(plan)
             # Fallback vers décision simple si OpenAI échoue
-            return self._fallback_decision(npc, request)
+            return self._fallback(npc, request, "error")
+        except BaseException:
+            # Annulation (client parti, délai de l'appelant) : ni succès ni échec à compter
+            self._abandon_call(plan)
+            raise
+        
+        tokens = (usage[0] or prompt_tokens, usage[1] or estimate_tokens(response))
+        self.governor.commit(plan, *tokens)
+        latency = time.monotonic() - started
+        self.breaker.record_success(latency)
+        self.call_latency.observe(latency, call.tier.name, "ok")
+        self.latencies.add(True, latency)
+        self.router.record_call(call.tier, latency, sum(tokens))
+        
+        try:
+            with span("parse"):
+                return self._parse_decision_response(response)
+        except Exception:
+            return self._fallback(npc, request, "parse_error")
     
-    def _build_context_prompt(self, npc: NPC, request: DecisionRequest) -> str:
+    async def stream_decision(self, npc: NPC, request: DecisionRequest, memories: Optional[LazyMemories] = None):
+        """Décision en flux : émet ("field", nom, valeur) dès qu'un champ est complet,
+        puis ("decision", DecisionResponse) une fois la réponse terminée"""
+        self.decisions += 1
+        events = self._stream_events(npc, request, memories)
+        try:
+            async for event in events:
+                if event[0] == "decision":
+                    event = ("decision", self._with_dialogue(npc, request, event[1]))
+                yield event
+        finally:
+            await events.aclose()
+    
+    async def _stream_events(self, npc: NPC, request: DecisionRequest, memories: Optional[LazyMemories] = None):
+        reason, call = await self._plan_llm_call(npc, request, memories)
+        if reason == "local":
+            yield ("decision", self._local_decision(npc, request))
+            return
+        if reason:
+            yield ("decision", self._fallback(npc, request, reason))
+            return
+        plan, prompt_tokens = call.plan, call.prompt_tokens
+        
+        started = time.monotonic()
+        deadline = started + self.timeout.current()
+        parser = IncrementalJSONFields()
+        text_parts = []
+        time_to_action = None
+        llm_stream = self.provider.stream(
+            model=call.tier.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": call.prompt}
+            ],
+            max_tokens=plan.max_tokens,
+            temperature=call.tier.temperature
+        )
+        chunks = llm_stream.__aiter__()
+        failure = None
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                text_parts.append(chunk)
+                for key, value in parser.feed(chunk):
+                    if key == "action" and time_to_action is None:
+                        time_to_action = time.monotonic() - started
+                    yield ("field", key, value)
+        except asyncio.TimeoutError:
+            failure = "timeout"
+        except Exception as e:
+            logger.error(f"Erreur IA (flux) pour NPC {npc.id}: {e}")
+            failure = "error"
+        except BaseException:
+            # Client parti en cours de flux (GeneratorExit) ou annulation : aucune issue à compter
+            self._abandon_call(plan)
+            raise
+        finally:
+            await llm_stream.aclose()
+        
+        latency = time.monotonic() - started
+        self.call_latency.observe(latency, call.tier.name, failure or "ok")
+        record_span("llm_call", latency * 1000)
+        if failure:
+            self.breaker.record_failure(latency)
+            if failure == "timeout":
+                self.governor.commit(plan, prompt_tokens, plan.max_tokens)
+            else:
+                self.governor.release(plan)
+            # Une action déjà reçue reste exploitable même si la fin du flux manque
+            if "action" in parser.fields:
+                yield ("decision", self._decision_from_fields(npc, request, parser.fields))
+            else:
+                yield ("decision", self._fallback(npc, request, failure))
+            return
+        
+        response = "".join(text_parts)
+        tokens = (
+            llm_stream.prompt_tokens or prompt_tokens,
+            llm_stream.completion_tokens or estimate_tokens(response)
+        )
+        self.governor.commit(plan, *tokens)
+        self.breaker.record_success(latency)
+        self.latencies.add(True, latency)
+        self.router.record_call(call.tier, latency, sum(tokens))
+        self.streamed += 1
+        self.stream_total_time += latency
+        if time_to_action is not None:
+            self.stream_time_to_action += time_to_action
+        
+        if "action" in parser.fields:
+            yield ("decision", self._decision_from_fields(npc, request, parser.fields))
+            return
+        try:
+            with span("parse"):
+                decision = self._parse_decision_response(response)
+        except Exception:
+            yield ("decision", self._fallback(npc, request, "parse_error"))
+            return
+        yield ("decision", decision)
+    
+    async def _plan_llm_call(self, npc: NPC, request: DecisionRequest, memories: Optional[LazyMemories] = None):
+        """Routage, disjoncteur et budget : (raison de ne pas appeler le LLM ou None, LLMCall)
+        
+        La raison "local" signifie que la décision est assez simple pour les règles locales.
+        """
+        tier, score = self.router.route(npc, request)
+        if tier.model is None:
+            return "local", None
+        
+        # Souvenirs marquants : l'archive n'est lue que pour les décisions destinées au LLM
+        with span("memories"):
+            long_term = await memories.get() if memories is not None else []
+        
+        # Disjoncteur ouvert : décision locale immédiate, sans attendre le fournisseur
+        if not self.breaker.allow():
+            return "circuit_open", None
+        
+        with span("prompt"):
+            context_prompt = self._build_context_prompt(npc, request, long_term)
+        
+        # Budget de tokens : réduit max_tokens ou bascule en local quand il s'épuise
+        prompt_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(context_prompt)
+        plan = self.governor.plan(
+            npc.id, prompt_tokens, self.router.is_high_priority(score), max_tokens=tier.max_tokens
+        )
+        if not plan.use_llm:
+            self.breaker.release_probe()
+            return plan.reason, None
+        return None, LLMCall(context_prompt, prompt_tokens, plan, tier)
+    
+    def _with_dialogue(self, npc: NPC, request: DecisionRequest, decision: DecisionResponse) -> DecisionResponse:
+        """Dialogue d'ambiance tiré de la banque ; celui du LLM n'est gardé qu'en interaction avec le joueur"""
+        interactive = bool(request.context.get("player_interaction"))
+        if interactive and decision.dialogue:
+            return decision
+        
+        decision.dialogue = None
+        if interactive or random.random() < self.ambient_dialogue_rate:
+            decision.dialogue = self.dialogue_bank.pick(
+                npc.id, npc.npc_type.value, npc.current_mood.value, decision.action,
+                request.time_of_day, npc.current_location.area_name
+            )
+        return decision
+    
+    def degraded_decision(self, npc: NPC, request: DecisionRequest) -> DecisionResponse:
+        """Décision de secours immédiate, sans LLM, pour une requête délestée en surcharge"""
+        self.decisions += 1
+        return self._fallback(npc, request, "shed")
+    
+    def _abandon_call(self, plan):
+        """Appel interrompu sans issue : rend la sonde du disjoncteur et la réservation de tokens"""
+        self.breaker.release_probe()
+        self.governor.release(plan)
+    
+    def _fallback(self, npc: NPC, request: DecisionRequest, reason: str) -> DecisionResponse:
+        self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+        return self._fallback_decision(npc, request)
+    
+    async def _call_llm(self, call: LLMCall, hedge: bool = True):
+        """Appel LLM borné par le délai adaptatif, avec requête doublée optionnelle"""
+        started = time.monotonic()
+        timeout = self.timeout.current()
+        if not (self.hedging and hedge):
+            return await asyncio.wait_for(self._call_provider(call), timeout)
+        
+        # Hedging : si la première requête dépasse le p90 observé, on en lance une seconde,
+        # à condition que le gouverneur lui réserve ses propres tokens
+        hedge_delay = self.latencies.percentile(90) if len(self.latencies) >= 10 else None
+        primary = asyncio.ensure_future(self._call_provider(call))
+        tasks = {primary}
+        hedge_plan = None
+        abandoned = False
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    hedge_plan = self.governor.hedge(call.plan)
+                    if hedge_plan is not None:
+                        self.hedges_launched += 1
+                        tasks.add(asyncio.ensure_future(self._call_provider(call)))
+            
+            deadline = started + timeout
+            last_error = None
+            while tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_error = task.exception()
+            if last_error is not None and not tasks:
+                raise last_error
+            raise asyncio.TimeoutError()
+        except BaseException as e:
+            abandoned = not isinstance(e, Exception)
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            # La réponse retenue est imputée à la réservation principale (par l'appelant),
+            # la réservation doublée couvre l'autre requête
+            if hedge_plan is not None:
+                if tasks and not abandoned:
+                    # Requête interrompue en vol : consommation inconnue, la réservation est conservée
+                    self.governor.commit(hedge_plan, call.prompt_tokens, hedge_plan.max_tokens)
+                else:
+                    self.governor.release(hedge_plan)
+    
+    def stats(self) -> Dict[str, Any]:
+        """État du disjoncteur, délai courant et taux de décisions de secours"""
+        fallback_total = sum(self.fallbacks.values())
+        p95 = self.latencies.percentile(95)
+        return {
+            "provider": self.provider.name,
+            "tiers": self.router.stats(),
+            "breaker": self.breaker.stats(),
+            "timeout_s": round(self.timeout.current(), 3),
+            "latency_p95_s": round(p95, 3) if p95 is not None else None,
+            "decisions": self.decisions,
+            "fallbacks": dict(self.fallbacks),
+            "fallback_rate": round(fallback_total / self.decisions, 4) if self.decisions else 0.0,
+            "hedging": {
+                "enabled": self.hedging,
+                "launched": self.hedges_launched,
+                "won": self.hedges_won
+            },
+            "budget": self.governor.stats(),
+            "dialogue_bank": self.dialogue_bank.stats(),
+            "streaming": {
+                "decisions": self.streamed,
+                "avg_time_to_action_ms": round(self.stream_time_to_action / self.streamed * 1000, 1) if self.streamed else None,
+                "avg_total_ms": round(self.stream_total_time / self.streamed * 1000, 1) if self.streamed else None
+            }
+        }
+    
+    def _build_context_prompt(self, npc: NPC, request: DecisionRequest, long_term: Optional[List[Memory]] = None) -> str:
         """Construit le prompt contextuel pour OpenAI"""
         
         # Informations sur le PNJ
@@ -44,11 +402,20 @@ class AIEngine:
             recent_memories.append(f"- {memory.description} ({memory.timestamp.strftime('%H:%M')})")
         
         memories_text = "\n".join(recent_memories) if recent_memories else "Aucune mémoire récente"
+        if long_term:
+            memories_text += "\n\nSOUVENIRS MARQUANTS:\n" + "\n".join(
+                f"- {memory.description} ({memory.timestamp.strftime('%d/%m %H:%M')})" for memory in long_term
+            )
         
         # Contexte actuel
         time_context = self._get_time_context(request.time_of_day)
         location_context = self._get_location_context(npc.current_location)
         
+        # Hors interaction avec le joueur, la réplique vient de la banque : pas de tokens pour le dialogue
+        dialogue_field = ""
+        if request.context.get("player_interaction"):
+            dialogue_field = '    "dialogue": "ce_que_tu_dis_ou_null",\n'
+        
         prompt = f"""
 Tu es {npc.name}, un {npc.npc_type.value} dans Los Santos (GTA 5). Tu dois prendre une décision réaliste basée sur ton contexte.
 
@@ -83,8 +450,7 @@ Réponds UNIQUEMENT au format JSON suivant:
     "action": "description_action",
     "target_location": {{"x": 0.0, "y": 0.0, "z": 0.0, "area_name": "nom_zone"}},
     "interaction_target": "id_cible_ou_null",
-    "dialogue": "ce_que_tu_dis_ou_null",
-    "reasoning": "pourquoi_cette_decision"
+{dialogue_field}    "reasoning": "pourquoi_cette_decision"
 }}
 
 Actions possibles: conduire, marcher, parler, acheter, travailler, patrouiller, commettre_crime, fuir, se_cacher, socialiser, dormir, manger
@@ -92,19 +458,19 @@ Actions possibles: conduire, marcher, parler, acheter, travailler, patrouiller,
         
         return prompt
     
-    async def _call_openai(self, prompt: str) -> str:
-        """Appelle l'API OpenAI"""
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
+    async def _call_provider(self, call: LLMCall):
+        """Appelle le fournisseur LLM, retourne le texte et (tokens prompt, tokens complétion)"""
+        result = await self.provider.complete(
+            model=call.tier.model,
             messages=[
-                {"role": "system", "content": "Tu es un assistant IA qui contrôle des PNJ dans GTA 5. Réponds toujours en JSON valide."},
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": call.prompt}
             ],
-            max_tokens=500,
-            temperature=0.7
+            max_tokens=call.plan.max_tokens,
+            temperature=call.tier.temperature
         )
         
-        return response.choices[0].message.content.strip()
+        return result.text, (result.prompt_tokens, result.completion_tokens)
     
     def _parse_decision_response(self, response: str) -> DecisionResponse:
         """Parse la réponse JSON d'OpenAI"""
@@ -116,24 +482,50 @@ Actions possibles: conduire, marcher, parler, acheter, travailler, patrouiller,
                 response = response.split("```")[1]
             
             data = json.loads(response.strip())
-            
-            target_location = None
-            if data.get("target_location"):
-                target_location = Location(**data["target_location"])
-            
-            return DecisionResponse(
-                action=data.get("action", "marcher"),
-                target_location=target_location,
-                interaction_target=data.get("interaction_target"),
-                dialogue=data.get("dialogue"),
-                reasoning=data.get("reasoning", "Décision par défaut")
-            )
+            return self._decision_from_data(data)
             
         except Exception as e:
-            print(f"Erreur parsing réponse IA: {e}")
-            print(f"Réponse brute: {response}")
+            # Déjà compté par le fallback « parse_error » : réponse brute en debug seulement
+            logger.debug(f"Erreur parsing réponse IA: {e} ; réponse brute: {response!r}")
             raise
     
+    def _decision_from_fields(self, npc: NPC, request: DecisionRequest, fields: Dict[str, Any]) -> DecisionResponse:
+        """Décision des champs reçus en flux ; champs invalides : secours « parse_error », comme sans flux"""
+        try:
+            return self._decision_from_data(fields)
+        except Exception as e:
+            logger.debug(f"Champs de la réponse IA invalides: {e} ; champs: {fields!r}")
+            return self._fallback(npc, request, "parse_error")
+    
+    def _decision_from_data(self, data: Dict[str, Any]) -> DecisionResponse:
+        """Construit la décision à partir des champs JSON de la réponse"""
+        target_location = None
+        if data.get("target_location"):
+            target_location = Location(**data["target_location"])
+        
+        return DecisionResponse(
+            action=data.get("action", "marcher"),
+            target_location=target_location,
+            interaction_target=data.get("interaction_target"),
+            dialogue=data.get("dialogue"),
+            reasoning=data.get("reasoning", "Décision par défaut")
+        )
+    
+    def _local_decision(self, npc: NPC, request: DecisionRequest) -> DecisionResponse:
+        """Décision par règles locales pour les situations routinières (sans LLM)"""
+        if request.time_of_day < 6 and npc.npc_type not in (NPCType.CRIMINAL, NPCType.POLICE):
+            action = "dormir"
+        else:
+            action = ROUTINE_ACTIONS.get(npc.current_activity, "marcher")
+        
+        return DecisionResponse(
+            action=action,
+            target_location=None,
+            interaction_target=None,
+            dialogue=None,
+            reasoning="Décision locale - situation routinière"
+        )
+    
     def _fallback_decision(self, npc: NPC, request: DecisionRequest) -> DecisionResponse:
         """Décision de secours si OpenAI échoue"""
         actions = ["marcher", "conduire", "socialiser"]
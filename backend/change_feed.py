@@ -0,0 +1,175 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+COUNTER_ID = "npc_changes"
+
+# Champs toujours renvoyés par le flux, quelle que soit la projection demandée
+FEED_FIELDS = ("id", "version", "change_seq")
+
+
+class ChangeFeed:
+    """Séquence globale des modifications de PNJ et flux « ce qui a changé depuis N ».
+
+    Chaque écriture d'un PNJ pose dans le document un numéro de la
+    séquence et sa date (`change_seq`, `changed_at`) ; une suppression
+    laisse une pierre tombale dans `npc_tombstones`. Les pierres tombales
+    sont gardées `tombstone_retention_hours` : un client dont le curseur
+    est plus ancien reçoit `resync` et recharge la liste complète.
+
+    Les numéros viennent d'un compteur unique (collection `counters`,
+    partagée par tous les shards), réservés par blocs de `block_size` : la
+    plupart des écritures n'ajoutent donc aucun aller-retour. Un bloc n'est
+    utilisé que `block_seconds` après sa réservation, le reste est perdu.
+
+    Un numéro peut ainsi être écrit un peu après un numéro plus grand
+    (autre processus, autre bloc). Le curseur renvoyé n'avance donc que sur
+    les modifications plus vieilles que `settle_seconds`, qui doit dépasser
+    `block_seconds` ; les plus récentes sont envoyées tout de suite mais le
+    seront encore au prochain appel.
+    """
+
+    def __init__(self, db, tombstone_retention_hours: float = 24, settle_seconds: float = 5.0,
+                 block_size: int = 100, block_seconds: float = 1.0):
+        self.counters = db.counters
+        self.tombstones = db.npc_tombstones
+        self.retention = timedelta(hours=tombstone_retention_hours)
+        self.settle = timedelta(seconds=settle_seconds)
+        self.block_size = max(1, block_size)
+        self.block_seconds = block_seconds
+        self._next = 1
+        self._end = 0
+        self._block_reserved_at = 0.0
+        self._refill = asyncio.Lock()
+        self._last_prune: Optional[datetime] = None
+
+    async def ensure_indexes(self, npcs_collection):
+        await npcs_collection.create_index("change_seq")
+        await self.tombstones.create_index("change_seq")
+        await self.tombstones.create_index("changed_at")
+
+    async def reserve(self, count: int = 1) -> int:
+        """Réserve `count` numéros consécutifs dans le compteur partagé, retourne le dernier"""
+        counter = await self.counters.find_one_and_update(
+            {"_id": COUNTER_ID}, {"$inc": {"seq": count}}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"]
+
+    def _block_usable(self, count: int) -> bool:
+        return (self._next + count - 1 <= self._end
+                and time.monotonic() - self._block_reserved_at < self.block_seconds)
+
+    async def _take(self, count: int) -> int:
+        """`count` numéros consécutifs du bloc courant (nouveau bloc si épuisé ou trop vieux), retourne le premier"""
+        if not self._block_usable(count):
+            async with self._refill:
+                if not self._block_usable(count):
+                    # Heure prise avant l'appel : l'âge du bloc n'est jamais sous-estimé
+                    reserved_at = time.monotonic()
+                    size = max(count, self.block_size)
+                    last = await self.reserve(size)
+                    self._next, self._end, self._block_reserved_at = last - size + 1, last, reserved_at
+        first = self._next
+        self._next += count
+        return first
+
+    async def stamp(self) -> Dict[str, Any]:
+        """Champs à poser ($set) avec une écriture de PNJ"""
+        return {"change_seq": await self._take(1), "changed_at": datetime.utcnow()}
+
+    async def stamps(self, count: int) -> List[Dict[str, Any]]:
+        """Champs pour un lot de `count` écritures (numéros consécutifs)"""
+        if count <= 0:
+            return []
+        first = await self._take(count)
+        now = datetime.utcnow()
+        return [{"change_seq": seq, "changed_at": now} for seq in range(first, first + count)]
+
+    async def record_deletion(self, npc_id: str):
+        await self.tombstones.insert_one({"id": npc_id, **await self.stamp()})
+
+    async def current(self) -> Dict[str, int]:
+        counter = await self.counters.find_one({"_id": COUNTER_ID}) or {}
+        return {"seq": counter.get("seq", 0), "floor": counter.get("floor", 0)}
+
+    async def prune(self, now: Optional[datetime] = None):
+        """Supprime les pierres tombales expirées et relève le plancher des curseurs valides"""
+        limit = (now or datetime.utcnow()) - self.retention
+        newest = await self.tombstones.find_one({"changed_at": {"$lt": limit}}, sort=[("change_seq", -1)])
+        if newest is None:
+            return
+        await self.counters.update_one({"_id": COUNTER_ID}, {"$max": {"floor": newest["change_seq"]}}, upsert=True)
+        await self.tombstones.delete_many({"change_seq": {"$lte": newest["change_seq"]}})
+
+    async def _settled_cursor(self, npcs_collection, now: datetime, floor: int) -> int:
+        """Curseur de reprise après rechargement complet : dernière modification plus vieille que `settle`.
+
+        Le compteur lui-même peut être en avance sur des blocs réservés mais
+        pas encore écrits ; un numéro plus petit que celui renvoyé ici est
+        déjà dans la base.
+        """
+        query = {"changed_at": {"$lte": now - self.settle}}
+        cursor = floor
+        for collection in (npcs_collection, self.tombstones):
+            newest = await collection.find_one(query, {"_id": 0, "change_seq": 1}, sort=[("change_seq", DESCENDING)])
+            if newest and newest.get("change_seq"):
+                cursor = max(cursor, newest["change_seq"])
+        return cursor
+
+    async def changes(self, npcs_collection, since: Optional[int], fields: Optional[List[str]] = None,
+                      limit: int = 500) -> Dict[str, Any]:
+        """PNJ modifiés et supprimés depuis le curseur `since`, dans l'ordre de la séquence"""
+        now = datetime.utcnow()
+        if self._last_prune is None or now - self._last_prune > timedelta(minutes=1):
+            self._last_prune = now
+            await self.prune(now)
+
+        state = await self.current()
+        if since is None or since < state["floor"] or since > state["seq"]:
+            # Curseur absent, trop ancien ou d'une autre base : liste complète à recharger
+            cursor = await self._settled_cursor(npcs_collection, now, state["floor"])
+            return {"since": since, "cursor": cursor, "resync": True, "more": False, "changes": [], "deleted": []}
+
+        if fields:
+            projection = {field: 1 for field in (*FEED_FIELDS, *fields)}
+            projection["changed_at"] = 1
+            projection["_id"] = 0
+        else:
+            projection = {"_id": 0, "long_term_memory": 0, "position": 0}
+        query = {"change_seq": {"$gt": since}}
+        changed = [
+            document async for document in
+            npcs_collection.find(query, projection).sort("change_seq", ASCENDING).limit(limit + 1)
+        ]
+        deleted = [
+            document async for document in
+            self.tombstones.find(query, {"_id": 0}).sort("change_seq", ASCENDING).limit(limit + 1)
+        ]
+
+        # Fusion des deux listes par numéro, puis page de `limit` entrées
+        entries = sorted(
+            [(d["change_seq"], False, d) for d in changed] + [(d["change_seq"], True, d) for d in deleted],
+            key=lambda entry: entry[0]
+        )
+        more = len(entries) > limit
+        entries = entries[:limit]
+
+        # Le curseur s'arrête avant la première modification encore trop récente
+        cursor = since
+        settled_before = now - self.settle
+        for seq, _, document in entries:
+            if document["changed_at"] > settled_before:
+                break
+            cursor = seq
+
+        return {
+            "since": since,
+            "cursor": cursor,
+            "resync": False,
+            "more": more,
+            "changes": [document for _, is_deleted, document in entries if not is_deleted],
+            "deleted": [document["id"] for _, is_deleted, document in entries if is_deleted],
+        }
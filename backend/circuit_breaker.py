@@ -0,0 +1,171 @@
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Fenêtre glissante des derniers appels (succès, latence en secondes)"""
+
+    def __init__(self, size: int = 100):
+        self._samples: Deque[Tuple[bool, float]] = deque(maxlen=size)
+
+    def add(self, ok: bool, latency: float):
+        self._samples.append((ok, latency))
+
+    def clear(self):
+        self._samples.clear()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for ok, _ in self._samples if not ok) / len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Percentile des latences (p entre 0 et 100), None si fenêtre vide"""
+        if not self._samples:
+            return None
+        latencies = sorted(latency for _, latency in self._samples)
+        index = min(len(latencies) - 1, max(0, int(round(p / 100 * len(latencies))) - 1))
+        return latencies[index]
+
+
+class CircuitBreaker:
+    """Disjoncteur autour des appels LLM.
+
+    closed    : les appels passent, la fenêtre est surveillée
+    open      : les appels sont refusés (décision locale) pendant open_seconds
+    half_open : quelques appels de sonde ; succès -> closed, échec -> open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        window_size: int = 50,
+        min_calls: int = 10,
+        error_rate_threshold: float = 0.5,
+        p95_latency_threshold: float = 8.0,
+        open_seconds: float = 15.0,
+        half_open_probes: int = 1,
+    ):
+        self.window = LatencyWindow(window_size)
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.p95_latency_threshold = p95_latency_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.transitions: Dict[str, int] = {}
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Indique si un appel LLM peut être tenté maintenant"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._transition(self.HALF_OPEN)
+
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                return False
+            self._probes_in_flight += 1
+
+        return True
+
+    def release_probe(self):
+        """Rend un créneau de sonde accordé par allow() mais finalement non utilisé"""
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record_success(self, latency: float):
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            # Le fournisseur répond de nouveau : on repart d'une fenêtre propre
+            self.window.clear()
+            self.window.add(True, latency)
+            self._transition(self.CLOSED)
+            return
+
+        self.window.add(True, latency)
+        self._check_thresholds()
+
+    def record_failure(self, latency: float):
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            self._open()
+            return
+
+        self.window.add(False, latency)
+        self._check_thresholds()
+
+    def _check_thresholds(self):
+        if self.state != self.CLOSED or len(self.window) < self.min_calls:
+            return
+        if self.window.error_rate() >= self.error_rate_threshold:
+            self._open()
+        elif (self.window.percentile(95) or 0.0) >= self.p95_latency_threshold:
+            self._open()
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(self.OPEN)
+
+    def _transition(self, new_state: str):
+        if new_state == self.state:
+            return
+        key = f"{self.state}->{new_state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        logger.warning(f"Disjoncteur LLM: {self.state} -> {new_state}")
+        self.state = new_state
+        if new_state != self.HALF_OPEN:
+            self._probes_in_flight = 0
+
+    def stats(self) -> Dict:
+        p95 = self.window.percentile(95)
+        return {
+            "state": self.state,
+            "transitions": dict(self.transitions),
+            "rejected_calls": self.rejected,
+            "window_calls": len(self.window),
+            "window_error_rate": round(self.window.error_rate(), 4),
+            "window_p95_s": round(p95, 3) if p95 is not None else None,
+        }
+
+
+class AdaptiveTimeout:
+    """Délai d'attente dérivé du p95 observé, borné entre minimum et maximum"""
+
+    def __init__(
+        self,
+        window: LatencyWindow,
+        initial: float = 10.0,
+        minimum: float = 2.0,
+        maximum: float = 20.0,
+        multiplier: float = 1.5,
+        min_samples: int = 10,
+    ):
+        self.window = window
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+
+    def current(self) -> float:
+        if len(self.window) < self.min_samples:
+            return self.initial
+        p95 = self.window.percentile(95) or self.initial
+        return min(self.maximum, max(self.minimum, p95 * self.multiplier))
@@ -0,0 +1,104 @@
+import math
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from .models import NPC, NPCType, DecisionResponse, Location
+
+# Rôles attribués localement aux membres d'un groupe, selon le type de PNJ
+GROUP_ROLES: Dict[NPCType, Tuple[str, List[str]]] = {
+    NPCType.POLICE: ("chef_d_equipe", ["cordon", "cordon", "couverture"]),
+    NPCType.CRIMINAL: ("meneur", ["complice", "guetteur"]),
+    NPCType.CIVILIAN: ("meneur", ["participant", "participant", "spectateur"]),
+    NPCType.SHOPKEEPER: ("responsable", ["employe"]),
+    NPCType.WORKER: ("chef_de_chantier", ["ouvrier"]),
+}
+
+
+def cluster_npcs(npcs: List[NPC], radius: float = 15.0) -> List[List[NPC]]:
+    """Regroupe les PNJ proches (< radius) de même type, humeur et activité.
+
+    Grille spatiale de pas `radius` : chaque PNJ n'est comparé qu'aux cases
+    voisines, puis union-find pour former les groupes. Chaque groupe est
+    trié avec le meneur (le plus proche du centre) en tête ; les PNJ isolés
+    forment des groupes d'un élément.
+    """
+    parent = list(range(len(npcs)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    cells: Dict[tuple, List[int]] = defaultdict(list)
+    for index, npc in enumerate(npcs):
+        state = (npc.npc_type, npc.current_mood, npc.current_activity, npc.stress_level // 25)
+        loc = npc.current_location
+        cells[(state, int(loc.x // radius), int(loc.y // radius))].append(index)
+
+    radius_squared = radius ** 2
+    for (state, cx, cy), members in cells.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                neighbours = cells.get((state, cx + dx, cy + dy))
+                if not neighbours:
+                    continue
+                for i in members:
+                    a = npcs[i].current_location
+                    for j in neighbours:
+                        if j <= i:
+                            continue
+                        b = npcs[j].current_location
+                        if (a.x - b.x) ** 2 + (a.y - b.y) ** 2 + (a.z - b.z) ** 2 <= radius_squared:
+                            parent[find(i)] = find(j)
+
+    groups: Dict[int, List[NPC]] = defaultdict(list)
+    for index, npc in enumerate(npcs):
+        groups[find(index)].append(npc)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) > 1:
+            cx = sum(m.current_location.x for m in members) / len(members)
+            cy = sum(m.current_location.y for m in members) / len(members)
+            members.sort(key=lambda m: (m.current_location.x - cx) ** 2 + (m.current_location.y - cy) ** 2)
+        clusters.append(members)
+    return clusters
+
+
+def assign_role(npc_type: NPCType, index: int) -> str:
+    leader_role, member_roles = GROUP_ROLES.get(npc_type, ("meneur", ["membre"]))
+    if index == 0:
+        return leader_role
+    return member_roles[(index - 1) % len(member_roles)]
+
+
+def derive_member_decision(
+    group_decision: DecisionResponse, member: NPC, index: int, size: int, spacing: float = 2.5
+) -> DecisionResponse:
+    """Variante locale de la décision de groupe pour le membre `index` (0 = meneur).
+
+    Les cibles sont décalées en anneaux autour de la cible du groupe pour que
+    les membres ne convergent pas tous vers le même point ; seul le meneur
+    garde la réplique.
+    """
+    role = assign_role(member.npc_type, index)
+
+    target = group_decision.target_location
+    if target is not None and index > 0:
+        ring = (index - 1) // 8 + 1
+        angle = 2 * math.pi * ((index - 1) % 8) / 8
+        target = Location(
+            x=target.x + math.cos(angle) * spacing * ring,
+            y=target.y + math.sin(angle) * spacing * ring,
+            z=target.z,
+            area_name=target.area_name
+        )
+
+    return DecisionResponse(
+        action=group_decision.action,
+        target_location=target,
+        interaction_target=group_decision.interaction_target,
+        dialogue=group_decision.dialogue if index == 0 else None,
+        reasoning=f"Décision de groupe ({size} PNJ, rôle: {role}) - {group_decision.reasoning}"
+    )
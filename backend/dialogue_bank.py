@@ -0,0 +1,264 @@
+"""Banque de répliques d'ambiance précalculées.
+
+Usage hors ligne (construction depuis des enregistrements LLM_PROVIDER=record) :
+
+    python -m backend.dialogue_bank build enregistrements.jsonl -o backend/dialogue_bank.json
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+WILDCARD = "*"
+
+DEFAULT_BANK_PATH = Path(__file__).parent / "dialogue_bank.json"
+
+# Clé : (type de PNJ, humeur, action, tranche horaire, classe de zone)
+BankKey = Tuple[str, str, str, str, str]
+
+
+def time_bucket(hour: int) -> str:
+    """Tranche horaire, alignée sur les contextes temporels du prompt"""
+    if 6 <= hour <= 9:
+        return "morning_rush"
+    elif 9 <= hour <= 17:
+        return "day"
+    elif 17 <= hour <= 19:
+        return "evening_rush"
+    elif 19 <= hour <= 23:
+        return "evening"
+    return "night"
+
+
+def area_class(area_name: str) -> str:
+    """Classe de zone, alignée sur les contextes de position du prompt"""
+    area = (area_name or "").lower()
+    if "downtown" in area or "center" in area:
+        return "downtown"
+    elif "grove" in area:
+        return "grove"
+    elif "vinewood" in area:
+        return "vinewood"
+    elif "beach" in area:
+        return "beach"
+    elif "industrial" in area:
+        return "industrial"
+    return "other"
+
+
+# Masques (humeur, action, heure, zone) -> champ conservé ; le type de PNJ est toujours exact.
+# Regroupés par spécificité décroissante : le niveau le plus précis qui a des répliques l'emporte.
+_MASK_LEVELS = [
+    [mask for mask in itertools.product((True, False), repeat=4) if sum(mask) == kept]
+    for kept in range(4, -1, -1)
+]
+
+
+def _fallback_levels(key: BankKey) -> List[List[BankKey]]:
+    """Clés candidates, de la plus précise (clé exacte) à la plus générale (type seul)"""
+    npc_type, *fields = key
+    return [
+        [(npc_type, *(value if keep else WILDCARD for value, keep in zip(fields, mask))) for mask in masks]
+        for masks in _MASK_LEVELS
+    ]
+
+
+class DialogueBank:
+    """Répliques indexées par contexte, avec contrôle de la répétition.
+
+    Forme compacte : chaque réplique est stockée une seule fois, l'index
+    associe une clé de contexte à un tuple d'indices de répliques. Un PNJ
+    ne redit pas une de ses `recent_window` dernières répliques tant qu'une
+    autre est disponible pour le même contexte.
+    """
+
+    def __init__(self, lines: Optional[List[str]] = None, index: Optional[Dict[BankKey, Tuple[int, ...]]] = None,
+                 recent_window: int = 5, max_tracked_npcs: int = 10000, seed: Optional[int] = None):
+        self.lines: List[str] = lines or []
+        self.index: Dict[BankKey, Tuple[int, ...]] = index or {}
+        self._line_ids = {line: line_id for line_id, line in enumerate(self.lines)}
+        self._resolved: Dict[BankKey, Tuple[int, ...]] = {}
+        self.recent_window = recent_window
+        self.max_tracked_npcs = max_tracked_npcs
+        self._recent: "OrderedDict[str, Deque[int]]" = OrderedDict()
+        self._rng = random.Random(seed)
+
+        self.lookups = 0
+        self.hits = 0
+        self.repeats = 0
+
+    @classmethod
+    def load(cls, path=DEFAULT_BANK_PATH, **kwargs) -> "DialogueBank":
+        """Charge la banque ; fichier absent -> banque vide (répliques LLM uniquement)"""
+        path = Path(path)
+        if not path.exists():
+            return cls(**kwargs)
+        with path.open(encoding="utf-8") as f:
+            data = json.load(f)
+        index = {tuple(entry[:5]): tuple(entry[5]) for entry in data.get("entries", [])}
+        return cls(data.get("lines", []), index, **kwargs)
+
+    def save(self, path):
+        data = {
+            "version": 1,
+            "lines": self.lines,
+            "entries": [list(key) + [list(ids)] for key, ids in sorted(self.index.items())],
+        }
+        with Path(path).open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+    def add(self, key: BankKey, line: str):
+        """Ajoute une réplique (dédupliquée) sous une clé de contexte"""
+        line = line.strip()
+        if not line:
+            return
+        line_id = self._line_ids.get(line)
+        if line_id is None:
+            line_id = len(self.lines)
+            self.lines.append(line)
+            self._line_ids[line] = line_id
+        ids = self.index.get(key, ())
+        if line_id not in ids:
+            self.index[key] = ids + (line_id,)
+            self._resolved.clear()
+
+    def candidates(self, key: BankKey) -> Tuple[int, ...]:
+        """Répliques du niveau de précision le plus élevé disponible pour ce contexte"""
+        ids = self._resolved.get(key)
+        if ids is None:
+            ids = ()
+            for level in _fallback_levels(key):
+                ids = tuple(dict.fromkeys(line_id for candidate in level for line_id in self.index.get(candidate, ())))
+                if ids:
+                    break
+            self._resolved[key] = ids
+        return ids
+
+    def pick(self, npc_id: str, npc_type: str, mood: str, action: str, hour: int, area_name: str) -> Optional[str]:
+        """Réplique d'ambiance pour ce PNJ, None si la banque n'a rien pour ce contexte"""
+        self.lookups += 1
+        ids = self.candidates((npc_type, mood, action, time_bucket(hour), area_class(area_name)))
+        if not ids:
+            return None
+        self.hits += 1
+
+        recent = self._recent.get(npc_id)
+        if recent is None:
+            recent = deque(maxlen=self.recent_window)
+            self._recent[npc_id] = recent
+            if len(self._recent) > self.max_tracked_npcs:
+                self._recent.popitem(last=False)
+        else:
+            self._recent.move_to_end(npc_id)
+
+        fresh = [line_id for line_id in ids if line_id not in recent]
+        if fresh:
+            line_id = self._rng.choice(fresh)
+        else:
+            # Tout a été dit récemment : la réplique la plus ancienne revient
+            self.repeats += 1
+            line_id = next(line_id for line_id in recent if line_id in ids)
+            recent.remove(line_id)
+        recent.append(line_id)
+        return self.lines[line_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lines": len(self.lines),
+            "keys": len(self.index),
+            "lookups": self.lookups,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "repeats": self.repeats,
+        }
+
+
+# ==================== CONSTRUCTION HORS LIGNE ====================
+
+# Contexte de position du prompt -> classe de zone
+_POSITION_CLASSES = {
+    "Centre-ville": "downtown",
+    "Grove Street": "grove",
+    "Vinewood": "vinewood",
+    "Plage": "beach",
+    "Zone industrielle": "industrial",
+}
+
+
+def key_from_prompt(prompt: str, action: str) -> Optional[BankKey]:
+    """Retrouve la clé de contexte depuis un prompt de décision enregistré"""
+    npc_type = re.search(r"un (\w+) dans Los Santos", prompt)
+    mood = re.search(r"- Humeur: (\w+)", prompt)
+    hour = re.search(r"- Heure: (\d+)h", prompt)
+    position = re.search(r"- Position: (.*)", prompt)
+    if not (npc_type and mood and hour and position):
+        return None
+
+    position = position.group(1).strip()
+    area = next((cls for prefix, cls in _POSITION_CLASSES.items() if position.startswith(prefix)), None)
+    if area is None:
+        area = area_class(position[len("Zone:"):] if position.startswith("Zone:") else position)
+    return (npc_type.group(1), mood.group(1), action, time_bucket(int(hour.group(1))), area)
+
+
+def _is_player_interaction(prompt: str) -> bool:
+    match = re.search(r"CONTEXTE ENVIRONNEMENTAL:\n(.*?)\n\nPNJ À PROXIMITÉ", prompt, re.S)
+    if not match:
+        return False
+    try:
+        return bool(json.loads(match.group(1)).get("player_interaction"))
+    except ValueError:
+        return False
+
+
+def build_from_records(paths: Iterable[str], bank: Optional[DialogueBank] = None) -> DialogueBank:
+    """Remplit la banque à partir d'enregistrements JSONL de RecordReplayProvider.
+
+    Seules les répliques d'ambiance sont retenues : les échanges avec le
+    joueur restent propres à leur situation.
+    """
+    bank = bank or DialogueBank()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                prompt = entry["messages"][-1]["content"]
+                if _is_player_interaction(prompt):
+                    continue
+                try:
+                    response = entry["response"]
+                    if "```" in response:
+                        response = response.split("```json")[-1].split("```")[0]
+                    data = json.loads(response.strip())
+                except (ValueError, IndexError):
+                    continue
+                if not isinstance(data, dict) or not data.get("dialogue") or not data.get("action"):
+                    continue
+                key = key_from_prompt(prompt, data["action"])
+                if key is not None:
+                    bank.add(key, data["dialogue"])
+    return bank
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="construit la banque depuis des enregistrements JSONL")
+    build.add_argument("records", nargs="+")
+    build.add_argument("-o", "--output", default=str(DEFAULT_BANK_PATH))
+    build.add_argument("--merge", action="store_true", help="complète la banque existante au lieu de la remplacer")
+    args = parser.parse_args()
+
+    bank = DialogueBank.load(args.output) if args.merge else DialogueBank()
+    build_from_records(args.records, bank)
+    bank.save(args.output)
+    print(f"Banque de répliques: {len(bank.lines)} répliques, {len(bank.index)} contextes -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import logging
+import math
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, GEO2D, UpdateOne
+from pymongo.errors import OperationFailure
+
+from .models import GameEvent
+
+logger = logging.getLogger(__name__)
+
+# Dimensions des agrégats horaires maintenus à l'insertion
+ROLLUP_DIMENSIONS = ("total", "type", "area")
+
+# Bornes de l'index "2d" (coordonnées du jeu, en mètres)
+WORLD_BOUNDS = (-20000.0, 20000.0)
+
+# Une minute de jeu dure 2 secondes réelles
+GAME_MINUTE_SECONDS = 2.0
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def epoch_seconds(timestamp: datetime) -> float:
+    """Horodatage UTC naïf -> secondes (sans passer par le fuseau local)"""
+    return (timestamp - EPOCH).total_seconds()
+
+
+class SpatialTimeIndex:
+    """Index en mémoire des événements récents : grille spatiale, cases triées par date.
+
+    Chaque case de `cell_size` mètres garde ses événements dans l'ordre
+    d'arrivée ; une requête ne visite que les cases qui recouvrent le rayon
+    et s'arrête, dans chaque case, au premier événement trop ancien. Les
+    événements plus vieux que `horizon_seconds` sont retirés au fil des
+    insertions.
+    """
+
+    def __init__(self, cell_size: float = 100.0, horizon_seconds: float = 3600.0):
+        self.cell_size = cell_size
+        self.horizon_seconds = horizon_seconds
+        self._cells: Dict[Tuple[int, int], Deque[Tuple[float, Dict[str, Any]]]] = defaultdict(deque)
+        self._order: Deque[Tuple[float, Tuple[int, int]]] = deque()
+        # Appelé à chaque événement ajouté ("event", [ts, résumé]), ex. journal du snapshot
+        self.listener: Optional[Callable[[str, Any], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def add(self, event: GameEvent):
+        ts = epoch_seconds(event.timestamp)
+        summary = {
+            "id": event.id,
+            "event_type": event.event_type,
+            "severity": event.severity,
+            "description": event.description,
+            "participants": event.participants,
+            "location": event.location.model_dump(),
+            "timestamp": event.timestamp.isoformat(),
+        }
+        self._insert(ts, summary)
+        if self.listener:
+            self.listener("event", [ts, summary])
+
+    def _insert(self, ts: float, summary: Dict[str, Any]):
+        key = self._cell(summary["location"]["x"], summary["location"]["y"])
+        self._cells[key].append((ts, summary))
+        self._order.append((ts, key))
+        self.prune(ts)
+
+    def entries(self) -> List[Tuple[float, Dict[str, Any]]]:
+        """Événements indexés (date, résumé), du plus ancien au plus récent"""
+        return sorted((entry for cell in self._cells.values() for entry in cell), key=lambda entry: entry[0])
+
+    def restore(self, entries: Iterable[Tuple[float, Dict[str, Any]]]) -> int:
+        """Remplace le contenu de l'index (snapshot)"""
+        self._cells.clear()
+        self._order.clear()
+        for ts, summary in entries:
+            self._insert(ts, summary)
+        self.prune(epoch_seconds(datetime.utcnow()))
+        return len(self._order)
+
+    def prune(self, now: float):
+        limit = now - self.horizon_seconds
+        while self._order and self._order[0][0] < limit:
+            _, key = self._order.popleft()
+            cell = self._cells[key]
+            cell.popleft()
+            if not cell:
+                del self._cells[key]
+
+    def query(self, x: float, y: float, radius: float, since: float, event_type: Optional[str] = None,
+              min_severity: int = 1, limit: Optional[int] = None, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Événements à moins de `radius` m (distance horizontale) depuis `since`, les plus récents d'abord"""
+        now = now if now is not None else epoch_seconds(datetime.utcnow())
+        radius_squared = radius * radius
+        x0, y0 = self._cell(x - radius, y - radius)
+        x1, y1 = self._cell(x + radius, y + radius)
+        matches = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self._cells.get((cx, cy))
+                if not cell:
+                    continue
+                for ts, summary in reversed(cell):
+                    if ts < since:
+                        break
+                    if summary["severity"] < min_severity or (event_type and summary["event_type"] != event_type):
+                        continue
+                    dx = summary["location"]["x"] - x
+                    dy = summary["location"]["y"] - y
+                    distance_squared = dx * dx + dy * dy
+                    if distance_squared <= radius_squared:
+                        matches.append((ts, distance_squared, summary))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        if limit is not None:
+            matches = matches[:limit]
+        return [
+            {**summary, "distance_m": round(math.sqrt(d2), 1), "age_s": round(now - ts, 1)}
+            for ts, d2, summary in matches
+        ]
+
+
+class EventStore:
+    """Événements du jeu, rangés par heure, avec expiration et agrégats.
+
+    `events` garde les événements bruts (index sur timestamp, qui sert aussi
+    d'index TTL) ; `event_rollups` tient un compteur par heure et par
+    dimension (total, type, zone), incrémenté à chaque insertion. Les
+    statistiques lisent les agrégats : leur coût dépend du nombre d'heures
+    demandées, pas du volume d'événements. La dernière heure est aussi
+    gardée en mémoire (SpatialTimeIndex) pour les requêtes « autour d'ici ».
+    """
+
+    def __init__(self, db, ttl_days: float = 7, rollup_ttl_days: float = 90, recent_horizon_seconds: float = 3600.0):
+        self.events = db.events
+        self.rollups = db.event_rollups
+        self.db = db
+        self.ttl_seconds = int(ttl_days * 86400)
+        self.rollup_ttl_seconds = int(rollup_ttl_days * 86400)
+        # Événements récents en mémoire pour les requêtes spatio-temporelles du chemin de décision
+        self.recent_index = SpatialTimeIndex(horizon_seconds=recent_horizon_seconds)
+
+    async def ensure_indexes(self):
+        """Crée les index au démarrage (sans effet s'ils existent déjà)"""
+        await self._ttl_index(self.events, "timestamp", self.ttl_seconds)
+        await self.events.create_index("id", unique=True)
+        await self.events.create_index([("event_type", 1), ("timestamp", DESCENDING)])
+        # Requêtes au-delà de la fenêtre en mémoire : position + date
+        await self.events.create_index(
+            [("position", GEO2D), ("timestamp", DESCENDING)], min=WORLD_BOUNDS[0], max=WORLD_BOUNDS[1]
+        )
+        await self._ttl_index(self.rollups, "bucket", self.rollup_ttl_seconds)
+        await self.rollups.create_index([("dimension", 1), ("bucket", 1)])
+
+    async def _ttl_index(self, collection, field: str, seconds: int):
+        try:
+            await collection.create_index(field, expireAfterSeconds=seconds)
+        except OperationFailure:
+            # Index déjà présent avec une autre durée : on ajuste la durée en place
+            await self.db.command("collMod", collection.name, index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds})
+            logger.info(f"Durée de rétention de {collection.name} mise à jour: {seconds} s")
+
+    async def insert(self, event: GameEvent):
+        """Enregistre l'événement et met à jour ses agrégats horaires"""
+        document = event.model_dump()
+        bucket = hour_bucket(event.timestamp)
+        document["hour_bucket"] = bucket
+        document["position"] = [event.location.x, event.location.y]
+        await self.events.insert_one(document)
+        self.recent_index.add(event)
+
+        area = event.location.area_name or "unknown"
+        operations = [
+            UpdateOne(
+                {"_id": f"{bucket.isoformat()}|{dimension}|{value}"},
+                {
+                    "$setOnInsert": {"bucket": bucket, "dimension": dimension, "value": value},
+                    "$inc": {"count": 1, "severity_sum": event.severity},
+                    "$max": {"max_severity": event.severity}
+                },
+                upsert=True
+            )
+            for dimension, value in (("total", "all"), ("type", event.event_type), ("area", area))
+        ]
+        await self.rollups.bulk_write(operations, ordered=False)
+
+    async def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Derniers événements (parcours de l'index timestamp, arrêté à `limit`)"""
+        cursor = self.events.find({}, {"_id": 0, "hour_bucket": 0, "position": 0}).sort("timestamp", DESCENDING).limit(limit)
+        return [event async for event in cursor]
+
+    async def total(self) -> int:
+        """Nombre d'événements conservés (métadonnées de la collection, sans parcours)"""
+        return await self.events.estimated_document_count()
+
+    async def rollup_series(self, hours: int = 24, dimension: str = "total",
+                            now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Agrégats horaires d'une dimension sur les `hours` dernières heures"""
+        since = hour_bucket((now or datetime.utcnow()) - timedelta(hours=hours - 1))
+        cursor = self.rollups.find(
+            {"dimension": dimension, "bucket": {"$gte": since}},
+            {"_id": 0, "bucket": 1, "value": 1, "count": 1, "severity_sum": 1, "max_severity": 1}
+        ).sort("bucket", 1)
+        return [rollup async for rollup in cursor]
+
+    async def summary(self, hours: int = 24) -> Dict[str, Any]:
+        """Totaux sur la période, par type et par zone, depuis les agrégats"""
+        result: Dict[str, Any] = {"hours": hours, "total": 0, "by_type": {}, "by_area": {}}
+        for dimension, key in (("total", None), ("type", "by_type"), ("area", "by_area")):
+            for rollup in await self.rollup_series(hours, dimension):
+                if key is None:
+                    result["total"] += rollup["count"]
+                else:
+                    result[key][rollup["value"]] = result[key].get(rollup["value"], 0) + rollup["count"]
+        return result
+
+    async def warm(self) -> int:
+        """Recharge en mémoire les événements de la fenêtre récente (au démarrage)"""
+        since = datetime.utcnow() - timedelta(seconds=self.recent_index.horizon_seconds)
+        cursor = self.events.find({"timestamp": {"$gte": since}}, {"_id": 0}).sort("timestamp", ASCENDING)
+        count = 0
+        async for document in cursor:
+            self.recent_index.add(GameEvent(**document))
+            count += 1
+        return count
+
+    def nearby_recent(self, x: float, y: float, radius: float, seconds: float, event_type: Optional[str] = None,
+                      min_severity: int = 1, limit: Optional[int] = 20) -> List[Dict[str, Any]]:
+        """Requête en mémoire uniquement (chemin de décision), fenêtre bornée par l'horizon"""
+        now = epoch_seconds(datetime.utcnow())
+        return self.recent_index.query(x, y, radius, now - seconds, event_type, min_severity, limit, now)
+
+    async def nearby(self, x: float, y: float, radius: float, seconds: float, event_type: Optional[str] = None,
+                     min_severity: int = 1, limit: int = 50) -> List[Dict[str, Any]]:
+        """Événements proches sur une fenêtre quelconque : mémoire si possible, sinon index Mongo"""
+        if seconds <= self.recent_index.horizon_seconds:
+            return self.nearby_recent(x, y, radius, seconds, event_type, min_severity, limit)
+
+        now = datetime.utcnow()
+        query: Dict[str, Any] = {
+            "position": {"$geoWithin": {"$center": [[x, y], radius]}},
+            "timestamp": {"$gte": now - timedelta(seconds=seconds)},
+            "severity": {"$gte": min_severity},
+        }
+        if event_type:
+            query["event_type"] = event_type
+        cursor = self.events.find(query, {"_id": 0, "hour_bucket": 0}).sort("timestamp", DESCENDING).limit(limit)
+        results = []
+        async for document in cursor:
+            px, py = document.pop("position")
+            document["distance_m"] = round(math.hypot(px - x, py - y), 1)
+            document["age_s"] = round((now - document["timestamp"]).total_seconds(), 1)
+            document["timestamp"] = document["timestamp"].isoformat()
+            results.append(document)
+        return results
@@ -0,0 +1,130 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+
+class IncrementalJSONFields:
+    """Extrait les champs de premier niveau d'un objet JSON reçu par morceaux.
+
+    Chaque champ est résolu dès que sa valeur est complète, sans attendre la
+    fin de l'objet : "action" est disponible bien avant "reasoning". Le texte
+    avant la première accolade (```json, préambule) est ignoré.
+    """
+
+    # États de l'analyseur
+    _BEFORE_OBJECT = 0
+    _EXPECT_KEY = 1
+    _IN_KEY = 2
+    _EXPECT_COLON = 3
+    _EXPECT_VALUE = 4
+    _IN_VALUE = 5
+    _DONE = 6
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._state = self._BEFORE_OBJECT
+        self._key_start = 0
+        self._key = ""
+        self._value_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def done(self) -> bool:
+        return self._state == self._DONE
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Ajoute un morceau de texte, retourne les champs nouvellement complets"""
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+
+        while self._pos < len(buffer) and self._state != self._DONE:
+            char = buffer[self._pos]
+            state = self._state
+
+            if state == self._BEFORE_OBJECT:
+                if char == "{":
+                    self._state = self._EXPECT_KEY
+
+            elif state == self._EXPECT_KEY:
+                if char == '"':
+                    self._state = self._IN_KEY
+                    self._key_start = self._pos
+                    self._escape = False
+                elif char == "}":
+                    self._state = self._DONE
+
+            elif state == self._IN_KEY:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._key = json.loads(buffer[self._key_start:self._pos + 1])
+                    self._state = self._EXPECT_COLON
+
+            elif state == self._EXPECT_COLON:
+                if char == ":":
+                    self._state = self._EXPECT_VALUE
+
+            elif state == self._EXPECT_VALUE:
+                if not char.isspace():
+                    self._state = self._IN_VALUE
+                    self._value_start = self._pos
+                    self._depth = 0
+                    self._in_string = False
+                    self._escape = False
+                    # Le caractère courant est traité par l'état _IN_VALUE
+                    continue
+
+            elif state == self._IN_VALUE:
+                field = self._scan_value(char)
+                if field is not None:
+                    completed.append(field)
+
+            self._pos += 1
+
+        return completed
+
+    def _scan_value(self, char: str):
+        """Avance dans une valeur ; retourne (clé, valeur) quand elle se termine"""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    # Chaîne de premier niveau : complète dès le guillemet fermant
+                    return self._emit(self._pos + 1, self._EXPECT_KEY)
+            return None
+
+        if char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            if self._depth == 0:
+                # Fin de l'objet principal juste après un scalaire (nombre, null...)
+                return self._emit(self._pos, self._DONE)
+            self._depth -= 1
+            if self._depth == 0:
+                return self._emit(self._pos + 1, self._EXPECT_KEY)
+        elif char == "," and self._depth == 0:
+            return self._emit(self._pos, self._EXPECT_KEY)
+        return None
+
+    def _emit(self, end: int, next_state: int):
+        raw = self._buffer[self._value_start:end].strip()
+        self._state = next_state
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            # Valeur mal formée : on l'ignore, les autres champs restent exploitables
+            return None
+        self.fields[self._key] = value
+        return self._key, value
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ("npcs", "events", "decisions", "stats")
+
+# Attente maximale sans donnée avant un commentaire de maintien de connexion
+KEEPALIVE_SECONDS = 15.0
+
+# Champs des PNJ affichés par le tableau de bord (la fenêtre mémoire reste dans GET /api/npcs)
+LIVE_NPC_FIELDS = (
+    "name", "npc_type", "personality", "current_location", "current_mood", "current_activity",
+    "health", "stress_level", "relationships",
+)
+
+
+def sse_frame(event: str, data: Any, frame_id: Optional[int] = None) -> bytes:
+    """Message Server-Sent Events encodé (une seule sérialisation, partagée par les abonnés)"""
+    head = f"event: {event}\n" + (f"id: {frame_id}\n" if frame_id is not None else "")
+    return (head + "data: " + json.dumps(data, default=str, separators=(",", ":")) + "\n\n").encode("utf-8")
+
+
+class Frame:
+    """Message encodé et les étiquettes utilisées par les filtres des abonnés"""
+    __slots__ = ("topic", "data", "area", "npc_type")
+
+    def __init__(self, topic: str, data: bytes, area: str = "", npc_type: Optional[str] = None):
+        self.topic = topic
+        self.data = data
+        self.area = area.lower()
+        self.npc_type = npc_type
+
+
+class Subscriber:
+    """Un client du flux : filtres et file bornée de morceaux à envoyer"""
+
+    def __init__(self, topics: Set[str], area: Optional[str], npc_types: Set[str], queue_size: int):
+        self.topics = topics
+        self.area = area.lower() if area else None
+        self.npc_types = npc_types
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+        self.closed = False
+
+    def accepts(self, frame: Frame) -> bool:
+        if frame.topic not in self.topics:
+            return False
+        if self.area and frame.area and self.area not in frame.area:
+            return False
+        if self.npc_types and frame.npc_type and frame.npc_type not in self.npc_types:
+            return False
+        return True
+
+
+class LiveBroadcaster:
+    """Diffusion en direct (SSE) vers tous les tableaux de bord ouverts.
+
+    Les mises à jour sont regroupées pendant `flush_seconds` (dernier état
+    par PNJ, dernière décision par PNJ), encodées une seule fois, puis
+    chaque abonné reçoit en un seul morceau les messages qui passent ses
+    filtres. Les états de PNJ viennent du flux de modifications (quel que
+    soit le nombre d'abonnés, jusqu'à `max_pages` pages de `page_size`
+    PNJ par intervalle, champs du tableau de bord seulement) et les
+    statistiques sont calculées une fois par `stats_seconds`. Un retard
+    plus grand (populate, routine quotidienne) ou un curseur perdu donne un
+    message `resync` : les tableaux de bord rechargent la liste. Un abonné
+    dont la file est pleine est déconnecté (message `dropped`) plutôt que
+    de ralentir les autres ; à la reconnexion il recharge l'état complet.
+    """
+
+    def __init__(self, changes: Callable[[Optional[int], List[str], int], Awaitable[Dict[str, Any]]],
+                 stats: Callable[[], Awaitable[Dict[str, Any]]],
+                 flush_seconds: float = 1.0, stats_seconds: float = 10.0, queue_size: int = 64,
+                 page_size: int = 500, max_pages: int = 10):
+        self.changes = changes
+        self.stats_source = stats
+        self.flush_seconds = flush_seconds
+        self.stats_seconds = stats_seconds
+        self.queue_size = queue_size
+        self.page_size = page_size
+        self.max_pages = max(1, max_pages)
+        self.subscribers: Set[Subscriber] = set()
+        self._pending_events: List[Frame] = []
+        self._pending_decisions: Dict[str, Frame] = {}
+        self._cursor: Optional[int] = None
+        self._sent_unsettled: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._frame_id = 0
+        self.counters = {"frames_encoded": 0, "chunks_sent": 0, "dropped_subscribers": 0, "resyncs": 0}
+
+    def _next_id(self) -> int:
+        self._frame_id += 1
+        return self._frame_id
+
+    def subscribe(self, topics: Optional[Set[str]] = None, area: Optional[str] = None,
+                  npc_types: Optional[Set[str]] = None) -> Subscriber:
+        subscriber = Subscriber(set(topics or TOPICS), area, set(npc_types or ()), self.queue_size)
+        self.subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish_event(self, event: Dict[str, Any]):
+        """Nouvel événement du jeu (envoyé au prochain regroupement)"""
+        if not self.subscribers:
+            return
+        area = (event.get("location") or {}).get("area_name", "")
+        self._pending_events.append(self._frame("events", "event", event, area))
+
+    def publish_decision(self, result: Dict[str, Any], area: str = "", npc_type: Optional[str] = None):
+        """Décision d'un PNJ ; seule la dernière par PNJ est envoyée à chaque regroupement"""
+        if not self.subscribers:
+            return
+        self._pending_decisions[result["npc_id"]] = self._frame("decisions", "decision", result, area, npc_type)
+
+    def _frame(self, topic: str, event: str, data: Any, area: str = "", npc_type: Optional[str] = None) -> Frame:
+        self.counters["frames_encoded"] += 1
+        return Frame(topic, sse_frame(event, data, self._next_id()), area or "", npc_type)
+
+    async def _run(self):
+        """Boucle de regroupement, active tant qu'il reste des abonnés"""
+        elapsed_since_stats = self.stats_seconds
+        try:
+            while self.subscribers:
+                frames = await self._npc_frames()
+                if elapsed_since_stats >= self.stats_seconds:
+                    elapsed_since_stats = 0.0
+                    frames.append(self._frame("stats", "stats", await self.stats_source()))
+                frames.extend(self._pending_events)
+                frames.extend(self._pending_decisions.values())
+                self._pending_events = []
+                self._pending_decisions = {}
+                self._dispatch(frames)
+                await asyncio.sleep(self.flush_seconds)
+                elapsed_since_stats += self.flush_seconds
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Flux en direct interrompu: {e}")
+            for subscriber in list(self.subscribers):
+                self._close(subscriber)
+        finally:
+            self._cursor = None
+
+    async def _feed_page(self, since: Optional[int]) -> Dict[str, Any]:
+        return await self.changes(since, list(LIVE_NPC_FIELDS), self.page_size)
+
+    async def _npc_frames(self) -> List[Frame]:
+        """États des PNJ modifiés depuis le dernier regroupement (flux de modifications, page après page)"""
+        first_pass = self._cursor is None
+        feed = await self._feed_page(self._cursor)
+        frames = []
+        for page in range(1, self.max_pages + 1):
+            if feed["resync"] and first_pass:
+                # Premier passage : on repart du présent
+                self._cursor = feed["cursor"]
+                self._sent_unsettled.clear()
+                return []
+            if feed["resync"]:
+                # Curseur perdu : les tableaux de bord rechargent la liste
+                return self._resync(feed["cursor"])
+            since, self._cursor = self._cursor, feed["cursor"]
+            frames.extend(self._page_frames(feed))
+            # Curseur arrêté sur une modification encore récente : la suite viendra aux prochains passages
+            if not feed["more"] or self._cursor == since:
+                break
+            if page == self.max_pages:
+                # Retard trop grand pour être rattrapé page à page
+                return self._resync((await self._feed_page(None))["cursor"])
+            feed = await self._feed_page(self._cursor)
+        self._sent_unsettled = {k: v for k, v in self._sent_unsettled.items() if v > self._cursor}
+        return frames
+
+    def _page_frames(self, feed: Dict[str, Any]) -> List[Frame]:
+        frames = []
+        # Les modifications récentes reviennent tant que le curseur ne les a pas dépassées : envoyées une fois
+        for npc in feed["changes"]:
+            if self._sent_unsettled.get(npc["id"]) == npc["change_seq"]:
+                continue
+            self._sent_unsettled[npc["id"]] = npc["change_seq"]
+            area = (npc.get("current_location") or {}).get("area_name", "")
+            frames.append(self._frame("npcs", "npc", npc, area, npc.get("npc_type")))
+        for npc_id in feed["deleted"]:
+            frames.append(self._frame("npcs", "npc_deleted", {"id": npc_id}))
+        return frames
+
+    def _resync(self, cursor: int) -> List[Frame]:
+        """Message `resync` (liste complète à recharger) ; le flux reprend depuis `cursor`"""
+        self._cursor = cursor
+        self._sent_unsettled.clear()
+        self.counters["resyncs"] += 1
+        return [self._frame("npcs", "resync", {"cursor": cursor})]
+
+    def _dispatch(self, frames: List[Frame]):
+        if not frames:
+            return
+        for subscriber in list(self.subscribers):
+            chunk = b"".join(frame.data for frame in frames if subscriber.accepts(frame))
+            if not chunk:
+                continue
+            try:
+                subscriber.queue.put_nowait(chunk)
+                self.counters["chunks_sent"] += 1
+            except asyncio.QueueFull:
+                self._close(subscriber, dropped=True)
+
+    def _close(self, subscriber: Subscriber, dropped: bool = False):
+        """Vide la file de l'abonné et termine son flux (après le message `dropped` s'il est trop lent)"""
+        self.subscribers.discard(subscriber)
+        subscriber.dropped = dropped
+        if dropped:
+            self.counters["dropped_subscribers"] += 1
+        subscriber.closed = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(sse_frame("dropped", {"reason": "client trop lent"}) if dropped else None)
+
+    async def stream(self, subscriber: Subscriber):
+        """Générateur de la réponse HTTP d'un abonné"""
+        try:
+            yield b"retry: 2000\n" + sse_frame("hello", {"topics": sorted(subscriber.topics)})
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if chunk is None:
+                    return
+                yield chunk
+                if subscriber.closed and subscriber.queue.empty():
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def close(self):
+        for subscriber in list(self.subscribers):
+            self._close(subscriber)
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": len(self.subscribers), **self.counters}
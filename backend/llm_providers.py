@@ -0,0 +1,346 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional
+
+from .token_governor import estimate_tokens
+
+
+class LLMResult(NamedTuple):
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class LLMStream:
+    """Flux de morceaux de texte ; l'usage en tokens est connu à la fin du flux"""
+
+    def __init__(self, chunks: AsyncIterator[str]):
+        self._chunks = chunks
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def __aiter__(self):
+        return self._chunks.__aiter__()
+
+    async def aclose(self):
+        close = getattr(self._chunks, "aclose", None)
+        if close is not None:
+            await close()
+
+
+class LLMProviderError(Exception):
+    """Échec (réel ou injecté) d'un fournisseur LLM"""
+
+
+def request_key(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+    """Clé stable d'une requête LLM (utilisée par l'enregistrement/rejeu)"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMProvider(ABC):
+    """Interface commune des fournisseurs de complétion"""
+
+    name = "base"
+
+    @abstractmethod
+    async def complete(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float
+    ) -> LLMResult:
+        """Complétion entière (texte et usage en tokens)"""
+
+    def stream(
+        self, model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float
+    ) -> LLMStream:
+        """Complétion en flux ; par défaut un seul morceau une fois la réponse complète"""
+        async def chunks():
+            result = await self.complete(model, messages, max_tokens, temperature)
+            llm_stream.prompt_tokens = result.prompt_tokens
+            llm_stream.completion_tokens = result.completion_tokens
+            yield result.text
+
+        llm_stream = LLMStream(chunks())
+        return llm_stream
+
+
+class OpenAIProvider(LLMProvider):
+    """Fournisseur OpenAI (client asynchrone, sans retries : le disjoncteur gère)"""
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or os.environ.get('OPENAI_API_KEY')
+        self._client = None
+
+    @property
+    def client(self):
+        """Client créé au premier appel : l'import d'openai (~0,5 s) ne pèse pas sur le démarrage"""
+        if self._client is None:
+            import openai
+            self._client = openai.AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        return self._client
+
+    async def complete(self, model, messages, max_tokens, temperature) -> LLMResult:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        usage = response.usage
+        return LLMResult(
+            response.choices[0].message.content.strip(),
+            usage.prompt_tokens if usage else 0,
+            usage.completion_tokens if usage else 0
+        )
+
+    def stream(self, model, messages, max_tokens, temperature) -> LLMStream:
+        async def chunks():
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for event in response:
+                if event.usage:
+                    llm_stream.prompt_tokens = event.usage.prompt_tokens
+                    llm_stream.completion_tokens = event.usage.completion_tokens
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+
+        llm_stream = LLMStream(chunks())
+        return llm_stream
+
+
+FAKE_ACTIONS = [
+    "conduire", "marcher", "parler", "acheter", "travailler", "patrouiller",
+    "commettre_crime", "fuir", "se_cacher", "socialiser", "dormir", "manger"
+]
+FAKE_LINES = [
+    "Belle journée, non ?", "Circulez, il n'y a rien à voir.", "Bienvenue, je peux vous aider ?",
+    "Encore des bouchons sur l'autoroute...", "Tu regardes quoi, toi ?", None, None
+]
+
+
+class FakeProvider(LLMProvider):
+    """Fournisseur local déterministe pour les tests de charge et benchmarks.
+
+    La réponse et la latence ne dépendent que de la graine et du prompt.
+    latency_dist : constant | uniform | normal | lognormal (moyenne latency_ms,
+    dispersion jitter_ms). failure_rate : proportion d'appels qui échouent.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        seed: int = 0,
+        latency_ms: float = 200.0,
+        jitter_ms: float = 50.0,
+        latency_dist: str = "lognormal",
+        failure_rate: float = 0.0,
+    ):
+        if latency_dist not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Distribution de latence inconnue: {latency_dist}")
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.latency_dist = latency_dist
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    def _rng(self, messages: List[Dict[str, str]]) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{messages[-1]['content']}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Latence simulée en secondes"""
+        mean, jitter = self.latency_ms, self.jitter_ms
+        if self.latency_dist == "constant" or mean <= 0:
+            value = mean
+        elif self.latency_dist == "uniform":
+            value = rng.uniform(mean - jitter, mean + jitter)
+        elif self.latency_dist == "normal":
+            value = rng.gauss(mean, jitter)
+        else:
+            # Log-normale de moyenne `mean` et d'écart-type `jitter` : queue longue réaliste
+            sigma2 = math.log(1 + (jitter / mean) ** 2)
+            value = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return max(0.0, value) / 1000
+
+    def render(self, rng: random.Random) -> str:
+        """Réponse JSON au format attendu par le moteur de décision"""
+        target = None
+        if rng.random() < 0.5:
+            target = {
+                "x": round(rng.uniform(-3000, 3000), 1),
+                "y": round(rng.uniform(-3000, 3000), 1),
+                "z": 30.0,
+                "area_name": "Los Santos"
+            }
+        return json.dumps({
+            "action": rng.choice(FAKE_ACTIONS),
+            "target_location": target,
+            "interaction_target": None,
+            "dialogue": rng.choice(FAKE_LINES),
+            "reasoning": "Décision simulée (fournisseur local)"
+        }, ensure_ascii=False)
+
+    async def complete(self, model, messages, max_tokens, temperature) -> LLMResult:
+        self.calls += 1
+        rng = self._rng(messages)
+        await asyncio.sleep(self.sample_latency(rng))
+        if rng.random() < self.failure_rate:
+            raise LLMProviderError("Échec injecté par FakeProvider")
+        text = self.render(rng)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        return LLMResult(text, prompt_tokens, min(max_tokens, estimate_tokens(text)))
+
+    def stream(self, model, messages, max_tokens, temperature, chunk_size: int = 8) -> LLMStream:
+        """Même réponse que complete(), émise par morceaux.
+
+        30 % de la latence simulée précède le premier morceau, le reste est
+        réparti uniformément entre les morceaux, comme un vrai flux de tokens.
+        """
+        async def chunks():
+            self.calls += 1
+            rng = self._rng(messages)
+            latency = self.sample_latency(rng)
+            await asyncio.sleep(latency * 0.3)
+            if rng.random() < self.failure_rate:
+                raise LLMProviderError("Échec injecté par FakeProvider")
+            text = self.render(rng)
+            parts = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+            llm_stream.prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            llm_stream.completion_tokens = min(max_tokens, estimate_tokens(text))
+            for part in parts:
+                yield part
+                await asyncio.sleep(latency * 0.7 / len(parts))
+
+        llm_stream = LLMStream(chunks())
+        return llm_stream
+
+
+class RecordReplayProvider(LLMProvider):
+    """Enregistre les paires prompt -> réponse d'un fournisseur réel, puis les rejoue.
+
+    mode "record" : délègue à `inner` et ajoute chaque échange au fichier JSONL.
+    mode "replay" : sert les réponses enregistrées, sans réseau. Une requête
+    inconnue est servie par l'enregistrement suivant en tourniquet, sauf en
+    mode strict où elle lève LLMProviderError. replay_latency rejoue aussi la
+    latence mesurée à l'enregistrement.
+    """
+
+    name = "record_replay"
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        inner: Optional[LLMProvider] = None,
+        strict: bool = False,
+        replay_latency: bool = True,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Mode inconnu: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("Le mode record nécessite un fournisseur réel")
+        self.path = Path(path)
+        self.mode = mode
+        self.inner = inner
+        self.strict = strict
+        self.replay_latency = replay_latency
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._order: List[str] = []
+        self._cursor = 0
+        self.hits = 0
+        self.misses = 0
+        if mode == "replay":
+            self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"Enregistrement introuvable: {self.path}")
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["key"] not in self._entries:
+                    self._order.append(entry["key"])
+                self._entries[entry["key"]] = entry
+
+    async def complete(self, model, messages, max_tokens, temperature) -> LLMResult:
+        key = request_key(model, messages, max_tokens, temperature)
+        if self.mode == "record":
+            return await self._record(key, model, messages, max_tokens, temperature)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            if self.strict or not self._order:
+                raise LLMProviderError(f"Aucun enregistrement pour la requête {key[:12]}")
+            entry = self._entries[self._order[self._cursor % len(self._order)]]
+            self._cursor += 1
+
+        if self.replay_latency:
+            await asyncio.sleep(entry.get("latency_ms", 0) / 1000)
+        return LLMResult(entry["response"], entry.get("prompt_tokens", 0), entry.get("completion_tokens", 0))
+
+    async def _record(self, key, model, messages, max_tokens, temperature) -> LLMResult:
+        started = time.monotonic()
+        result = await self.inner.complete(model, messages, max_tokens, temperature)
+        entry = {
+            "key": key,
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "response": result.text,
+            "prompt_tokens": result.prompt_tokens,
+            "completion_tokens": result.completion_tokens,
+            "latency_ms": round((time.monotonic() - started) * 1000, 3),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return result
+
+
+def create_provider_from_env() -> LLMProvider:
+    """Construit le fournisseur selon LLM_PROVIDER (openai, fake, record, replay)"""
+    kind = os.environ.get('LLM_PROVIDER', 'openai')
+
+    if kind == "openai":
+        return OpenAIProvider()
+    if kind == "fake":
+        return FakeProvider(
+            seed=int(os.environ.get('LLM_FAKE_SEED', 0)),
+            latency_ms=float(os.environ.get('LLM_FAKE_LATENCY_MS', 200)),
+            jitter_ms=float(os.environ.get('LLM_FAKE_JITTER_MS', 50)),
+            latency_dist=os.environ.get('LLM_FAKE_LATENCY_DIST', 'lognormal'),
+            failure_rate=float(os.environ.get('LLM_FAKE_FAILURE_RATE', 0.0))
+        )
+    if kind in ("record", "replay"):
+        path = os.environ.get('LLM_RECORD_PATH', 'llm_recordings.jsonl')
+        if kind == "record":
+            return RecordReplayProvider(path, mode="record", inner=OpenAIProvider())
+        return RecordReplayProvider(
+            path, mode="replay", strict=os.environ.get('LLM_REPLAY_STRICT', '0') == '1'
+        )
+    raise ValueError(f"LLM_PROVIDER inconnu: {kind}")
@@ -0,0 +1,139 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DESCENDING, InsertOne, UpdateOne
+
+from .models import Memory
+
+# Importance à partir de laquelle un souvenir est archivé (mémoire long terme)
+LONG_TERM_MEMORY_IMPORTANCE = 7
+
+# Souvenirs marquants ajoutés au prompt de décision
+PROMPT_MEMORIES = 3
+
+
+def _cursor(document: Dict[str, Any]) -> str:
+    return f"{document['timestamp'].isoformat()}|{document['id']}"
+
+
+def _parse_cursor(cursor: str) -> Tuple[datetime, str]:
+    timestamp, memory_id = cursor.split("|", 1)
+    return datetime.fromisoformat(timestamp), memory_id
+
+
+class MemoryArchive:
+    """Mémoire long terme des PNJ, hors du document PNJ.
+
+    La collection `memories` stocke un document par souvenir marquant
+    {npc_id, ...Memory}, indexé par (npc_id, timestamp) : le document PNJ ne
+    garde que la fenêtre courte (`short_term_memory`), et l'historique se lit
+    par pages ou à la demande pour le prompt.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("npc_id", 1), ("timestamp", DESCENDING), ("id", DESCENDING)])
+
+    @staticmethod
+    def should_archive(memory: Memory) -> bool:
+        return memory.importance >= LONG_TERM_MEMORY_IMPORTANCE
+
+    @staticmethod
+    def insert_operation(npc_id: str, memory: Memory) -> InsertOne:
+        return InsertOne({"npc_id": npc_id, **memory.model_dump()})
+
+    async def add(self, npc_id: str, memory: Memory):
+        await self.collection.insert_one({"npc_id": npc_id, **memory.model_dump()})
+
+    async def add_many(self, items: Iterable[Tuple[str, Memory]]) -> int:
+        """Archive un lot de souvenirs (npc_id, mémoire) en une écriture groupée"""
+        operations = [self.insert_operation(npc_id, memory) for npc_id, memory in items]
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    async def recent(self, npc_id: str, limit: int = PROMPT_MEMORIES) -> List[Memory]:
+        """Derniers souvenirs archivés d'un PNJ (parcours de l'index, arrêté à `limit`)"""
+        cursor = self.collection.find({"npc_id": npc_id}, {"_id": 0, "npc_id": 0}) \
+            .sort([("timestamp", DESCENDING), ("id", DESCENDING)]).limit(limit)
+        return [Memory(**document) async for document in cursor]
+
+    async def page(self, npc_id: str, before: Optional[str] = None, limit: int = 50,
+                   min_importance: int = 1) -> Dict[str, Any]:
+        """Une page d'historique, du plus récent au plus ancien.
+
+        `before` est le curseur `next` de la page précédente (date|id du
+        dernier souvenir renvoyé) : la page suivante reprend juste après, sans
+        `skip`, quel que soit le nombre de souvenirs déjà parcourus.
+        """
+        query: Dict[str, Any] = {"npc_id": npc_id}
+        if min_importance > 1:
+            query["importance"] = {"$gte": min_importance}
+        if before:
+            timestamp, memory_id = _parse_cursor(before)
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "id": {"$lt": memory_id}}
+            ]
+        cursor = self.collection.find(query, {"_id": 0, "npc_id": 0}) \
+            .sort([("timestamp", DESCENDING), ("id", DESCENDING)]).limit(limit + 1)
+        documents = [document async for document in cursor]
+        next_cursor = _cursor(documents[limit - 1]) if len(documents) > limit else None
+        return {"npc_id": npc_id, "memories": documents[:limit], "next": next_cursor}
+
+    async def delete_npc(self, npc_id: str) -> int:
+        result = await self.collection.delete_many({"npc_id": npc_id})
+        return result.deleted_count
+
+    async def migrate_embedded(self, npcs_collection) -> int:
+        """Déplace les anciens tableaux NPC.long_term_memory dans l'archive (relançable sans doublon)"""
+        operations = []
+        ids: List[str] = []
+        cursor = npcs_collection.find(
+            {"long_term_memory.0": {"$exists": True}}, {"_id": 0, "id": 1, "long_term_memory": 1}
+        )
+        async for npc_data in cursor:
+            ids.append(npc_data["id"])
+            for memory_data in npc_data["long_term_memory"]:
+                memory = Memory(**memory_data)
+                operations.append(UpdateOne(
+                    {"id": memory.id},
+                    {"$setOnInsert": {"npc_id": npc_data["id"], **memory.model_dump()}},
+                    upsert=True
+                ))
+        if not ids:
+            return 0
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        await npcs_collection.update_many({"id": {"$in": ids}}, {"$unset": {"long_term_memory": ""}})
+        return len(operations)
+
+    async def count(self) -> int:
+        return await self.collection.estimated_document_count()
+
+
+class LazyMemories:
+    """Souvenirs archivés d'un PNJ, lus au premier accès seulement.
+
+    Passé au moteur IA avec la décision : l'archive n'est lue que si la
+    décision part vraiment vers le LLM (pas pour les règles locales ni les
+    décisions de secours).
+    """
+
+    def __init__(self, archive: MemoryArchive, npc_id: str, limit: int = PROMPT_MEMORIES):
+        self.archive = archive
+        self.npc_id = npc_id
+        self.limit = limit
+        self._memories: Optional[List[Memory]] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._memories is not None
+
+    async def get(self) -> List[Memory]:
+        if self._memories is None:
+            self._memories = await self.archive.recent(self.npc_id, self.limit)
+        return self._memories
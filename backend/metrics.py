@@ -0,0 +1,236 @@
+"""Métriques au format texte de Prometheus (GET /metrics), sans dépendance externe.
+
+Le chemin chaud ne fait que des additions : un histogramme par série
+d'étiquettes (recherche dichotomique du seuil, deux additions), un
+intercepteur ASGI pour la latence des routes et un écouteur de commandes
+pymongo pour MongoDB. Les compteurs déjà tenus par les composants
+(moteur IA, déduplication, contrôle d'admission...) sont lus au moment
+de la collecte plutôt que dupliqués.
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+from .timing import record_span
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seuils (secondes) adaptés aux requêtes HTTP et MongoDB
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Appels LLM : de la centaine de millisecondes à la limite du délai adaptatif
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+
+# Méthode de NPCManager en cours : les commandes MongoDB lui sont attribuées
+CURRENT_OPERATION: ContextVar[str] = ContextVar("db_operation", default="other")
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def family(name: str, kind: str, help_text: str, samples: Iterable[Tuple[Dict[str, Any], float]]) -> List[str]:
+    """Lignes d'une famille de métriques lue à la collecte ({étiquettes: valeur})"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+    return lines
+
+
+class Histogram:
+    """Histogramme à étiquettes (valeurs d'étiquettes passées dans l'ordre de `labelnames`).
+
+    `threadsafe` : observations faites hors de la boucle asyncio (écouteur
+    pymongo, exécuté dans les threads de motor).
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, threadsafe: bool = False):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        # valeurs d'étiquettes -> [compte par seuil (+Inf en dernier), somme]
+        self._series: Dict[Tuple, List[Any]] = {}
+        self._lock = threading.Lock() if threadsafe else None
+
+    def observe(self, value: float, *labels):
+        if self._lock is not None:
+            with self._lock:
+                self._observe(value, labels)
+        else:
+            self._observe(value, labels)
+
+    def _observe(self, value: float, labels: Tuple):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.bounds) + 1), 0.0]
+        series[0][bisect_left(self.bounds, value)] += 1
+        series[1] += value
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        if self._lock is not None:
+            with self._lock:
+                snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        else:
+            snapshot = [(labels, counts, total) for labels, (counts, total) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histogrammes enregistrés et fonctions de collecte, rendus ensemble à chaque lecture"""
+
+    def __init__(self):
+        self._histograms: List[Histogram] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def histogram(self, histogram: Histogram) -> Histogram:
+        self._histograms.append(histogram)
+        return histogram
+
+    def collector(self, collect: Callable[[], List[str]]):
+        self._collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def db_operation(func):
+    """Attribue à la méthode décorée les commandes MongoDB qu'elle lance (la plus interne l'emporte)"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = CURRENT_OPERATION.set(name)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            CURRENT_OPERATION.reset(token)
+    return wrapper
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Nombre et durée des commandes MongoDB par méthode appelante, commande et collection.
+
+    motor exécute pymongo dans des threads en recopiant le contexte de la
+    coroutine : la méthode courante (CURRENT_OPERATION) y est lisible.
+    """
+
+    def __init__(self):
+        self.latency = Histogram(
+            "gta5_mongo_command_duration_seconds",
+            "Durée des commandes MongoDB par méthode de NPCManager",
+            ("operation", "command", "collection", "outcome"),
+            threadsafe=True
+        )
+        self._started: Dict[Tuple[int, Any], Tuple[str, str]] = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection", "")
+        self._started[(event.request_id, event.connection_id)] = (CURRENT_OPERATION.get(), collection)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+    def _finish(self, event, outcome: str):
+        operation, collection = self._started.pop((event.request_id, event.connection_id), ("other", ""))
+        self.latency.observe(event.duration_micros / 1e6, operation, event.command_name, collection, outcome)
+        # Temps MongoDB de la requête HTTP en cours (Server-Timing, traces)
+        record_span(f"mongo.{event.command_name}", event.duration_micros / 1000)
+
+
+class RequestMetrics:
+    """Intercepteur ASGI : latence des requêtes HTTP par route (modèle de chemin, pas l'URL brute)"""
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            # Requêtes sans route : 404, ou traitées avant le routage (transmission à un shard, 503 au démarrage)
+            path = getattr(route, "path_format", None) or "other"
+            self.histogram.observe(time.perf_counter() - started, scope["method"], path, str(status))
+
+
+class ActiveNPCs:
+    """PNJ qui ont pris une décision pendant les `window_seconds` dernières secondes, par type"""
+
+    def __init__(self, window_seconds: float = 300.0):
+        self.window_seconds = window_seconds
+        self._seen: Dict[str, Tuple[float, str]] = {}
+
+    def touch(self, npc_id: str, npc_type: str):
+        self._seen[npc_id] = (time.monotonic(), npc_type)
+
+    def by_type(self) -> Dict[str, int]:
+        cutoff = time.monotonic() - self.window_seconds
+        self._seen = {npc_id: entry for npc_id, entry in self._seen.items() if entry[0] >= cutoff}
+        counts: Dict[str, int] = {}
+        for _, npc_type in self._seen.values():
+            counts[npc_type] = counts.get(npc_type, 0) + 1
+        return counts
+
+
+def ratio(hits: float, total: float) -> float:
+    return hits / total if total else 0.0
+
+
+def counters(prefix: str, help_text: str, label: str, values: Optional[Dict[str, float]]) -> List[str]:
+    """Famille de compteurs depuis un dictionnaire {valeur d'étiquette: total}"""
+    return family(prefix, "counter", help_text, (({label: key}, value) for key, value in (values or {}).items()))
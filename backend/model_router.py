@@ -0,0 +1,129 @@
+import json
+import math
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .models import NPC, DecisionRequest, NPCType
+
+
+class ModelTier(NamedTuple):
+    name: str
+    min_score: float            # score de complexité à partir duquel ce niveau s'applique
+    model: Optional[str]        # None : règles locales, pas d'appel LLM
+    max_tokens: int = 0
+    temperature: float = 0.7
+    cost_per_1k_tokens: float = 0.0
+
+
+DEFAULT_TIERS: List[ModelTier] = [
+    ModelTier("local", 0.0, None),
+    ModelTier("small", 1.0, "gpt-4o-mini", 200, 0.6, 0.0006),
+    ModelTier("large", 6.0, "gpt-4o", 500, 0.7, 0.01),
+]
+
+
+def _number(value) -> float:
+    """Valeur numérique venue du client, 0 si elle n'en est pas une"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if math.isfinite(number) else 0.0
+
+
+class ModelRouter:
+    """Choisit un niveau de modèle selon la complexité de la décision.
+
+    Un civil qui dort à 3h du matin n'a pas besoin du même modèle qu'un
+    criminel pris dans une fusillade avec la police. Le score (0 à ~10)
+    combine gravité des événements, présence du joueur, stress, présence
+    policière et souvenirs marquants récents.
+    """
+
+    def __init__(self, tiers: Optional[List[ModelTier]] = None, high_priority_score: float = 4.0):
+        self.tiers = sorted(tiers or DEFAULT_TIERS, key=lambda t: t.min_score)
+        self.high_priority_score = high_priority_score
+        self._stats: Dict[str, Dict[str, float]] = {
+            tier.name: {"decisions": 0, "llm_calls": 0, "latency_total": 0.0, "tokens": 0, "cost": 0.0}
+            for tier in self.tiers
+        }
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """Niveaux configurables via LLM_TIERS (liste JSON d'objets ModelTier)"""
+        raw = os.environ.get('LLM_TIERS')
+        if raw:
+            tiers = [ModelTier(**tier) for tier in json.loads(raw)]
+        else:
+            tiers = [
+                DEFAULT_TIERS[0],
+                DEFAULT_TIERS[1]._replace(model=os.environ.get('LLM_MODEL', DEFAULT_TIERS[1].model)),
+                DEFAULT_TIERS[2]._replace(model=os.environ.get('LLM_LARGE_MODEL', DEFAULT_TIERS[2].model)),
+            ]
+        return cls(tiers, float(os.environ.get('LLM_HIGH_PRIORITY_SCORE', 4.0)))
+
+    def score(self, npc: NPC, request: DecisionRequest) -> float:
+        context = request.context
+        score = 0.0
+
+        # Gravité de l'événement en cours (1-10) : jusqu'à 4 points
+        severities = [_number(context.get("event_severity"))]
+        events = context.get("recent_nearby_events")
+        if isinstance(events, list):
+            severities += [_number(e.get("severity")) for e in events if isinstance(e, dict)]
+        score += min(max(severities), 10) / 10 * 4
+
+        # Joueur à proximité ou en interaction directe
+        if context.get("player_interaction"):
+            score += 3
+        elif context.get("nearby_player"):
+            score += 2
+
+        # Stress du PNJ : jusqu'à 2 points
+        score += npc.stress_level / 100 * 2
+
+        # Présence policière (0-10), doublée pour un criminel
+        police = _number(context.get("police_presence"))
+        weight = 3 if npc.npc_type == NPCType.CRIMINAL else 1.5
+        score += min(max(police, 0), 10) / 10 * weight
+
+        # Souvenirs marquants récents : 0.5 point chacun, 1.5 max
+        important = sum(1 for m in npc.short_term_memory[-5:] if m.importance >= 7)
+        score += min(important * 0.5, 1.5)
+
+        return round(score, 3)
+
+    def route(self, npc: NPC, request: DecisionRequest) -> Tuple[ModelTier, float]:
+        score = self.score(npc, request)
+        tier = self.tiers[0]
+        for candidate in self.tiers:
+            if score >= candidate.min_score:
+                tier = candidate
+        self._stats[tier.name]["decisions"] += 1
+        return tier, score
+
+    def is_high_priority(self, score: float) -> bool:
+        return score >= self.high_priority_score
+
+    def record_call(self, tier: ModelTier, latency: float, tokens: int):
+        stats = self._stats[tier.name]
+        stats["llm_calls"] += 1
+        stats["latency_total"] += latency
+        stats["tokens"] += tokens
+        stats["cost"] += tokens / 1000 * tier.cost_per_1k_tokens
+
+    def stats(self) -> Dict[str, Dict]:
+        result = {}
+        for tier in self.tiers:
+            stats = self._stats[tier.name]
+            calls = stats["llm_calls"]
+            result[tier.name] = {
+                "model": tier.model,
+                "min_score": tier.min_score,
+                "decisions": stats["decisions"],
+                "llm_calls": calls,
+                "avg_latency_ms": round(stats["latency_total"] / calls * 1000, 1) if calls else None,
+                "tokens": stats["tokens"],
+                "estimated_cost_usd": round(stats["cost"], 4),
+            }
+        return result
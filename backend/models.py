@@ -70,14 +70,19 @@ class NPC(BaseModel):
     current_mood: NPCMood = NPCMood.NEUTRAL
     current_activity: ActivityType = ActivityType.WALKING
     
-    # Schedule et comportements
+    # Schedule et comportements : modèle partagé (voir schedules.py) + surcharges propres au PNJ.
+    # `schedule` n'est plus rempli que par les anciens documents qui embarquent leur planning.
+    schedule_template_id: Optional[str] = None
+    schedule_overrides: List[NPCSchedule] = []
     schedule: List[NPCSchedule] = []
     
-    # Mémoire
+    # Mémoire : fenêtre courte embarquée. `long_term_memory` n'est plus rempli que par les
+    # anciens documents, migrés au démarrage vers l'archive (voir memory_archive.py)
     short_term_memory: List[Memory] = []
     long_term_memory: List[Memory] = []
     
-    # Relations avec autres PNJ/joueur
+    # Relations avec autres PNJ/joueur : ancien stockage embarqué, migré au démarrage
+    # vers le graphe de relations (voir relationships.py)
     relationships: Dict[str, int] = {}  # npc_id -> relationship_score (-10 to +10)
     
     # État actuel
@@ -85,7 +90,8 @@ class NPC(BaseModel):
     stress_level: int = Field(default=0, ge=0, le=100)
     last_decision_time: datetime = Field(default_factory=datetime.utcnow)
     
-    # Métadonnées
+    # Métadonnées ; `version` augmente à chaque écriture (écritures conditionnelles, voir NPCManager)
+    version: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_updated: datetime = Field(default_factory=datetime.utcnow)
 
@@ -95,6 +101,8 @@ class NPCCreate(BaseModel):
     npc_type: NPCType
     personality: Optional[NPCPersonality] = None
     current_location: Location
+    schedule_template_id: Optional[str] = None  # défaut : modèle courant du type de PNJ
+    schedule_overrides: List[NPCSchedule] = []
 
 class NPCUpdate(BaseModel):
     current_location: Optional[Location] = None
@@ -1,18 +1,135 @@
 from motor.motor_asyncio import AsyncIOMotorCollection
-from .models import NPC, NPCCreate, NPCUpdate, Memory, GameEvent, NPCType, NPCPersonality, Location, ActivityType
+from pymongo import GEO2D, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
+from .models import (
+    NPC, NPCCreate, NPCUpdate, Memory, GameEvent, NPCType, NPCPersonality, Location, ActivityType,
+    NPCSchedule, DecisionRequest, DecisionResponse
+)
 from .ai_engine import AIEngine
-from typing import List, Optional, Dict, Any
+from .single_flight import SingleFlight, context_hash
+from .timing import StageTimer, StageStats
+from .population import generate_population, insert_population
+from .schedules import checked_template_id, default_template_id, resolve_activity, template_matches
+from .relationships import RelationshipGraph
+from .event_store import EventStore, GAME_MINUTE_SECONDS, WORLD_BOUNDS
+from .memory_archive import MemoryArchive, LazyMemories
+from .change_feed import ChangeFeed
+from .crowd import cluster_npcs, derive_member_decision, assign_role
+from .metrics import db_operation
+from typing import List, Optional, Dict, Any, Tuple, Callable
 from datetime import datetime, timedelta
 import random
+import time
 import uuid
 
+# Fenêtre de mémoire embarquée dans le document PNJ (la mémoire long terme est archivée à part)
+SHORT_TERM_MEMORY_SIZE = 10
+
+# Champs lourds exclus des lectures qui n'ont pas besoin de la mémoire
+LIGHT_PROJECTION = {"_id": 0, "short_term_memory": 0, "long_term_memory": 0, "schedule": 0}
+
+# Écritures conditionnelles : tentatives avant d'abandonner sur conflit de version
+MAX_WRITE_ATTEMPTS = 5
+
+
+class VersionConflict(Exception):
+    """Le document PNJ a changé depuis sa lecture (version différente de celle attendue)"""
+    
+    def __init__(self, npc_id: str, expected: int):
+        super().__init__(f"PNJ {npc_id} modifié entre-temps (version attendue {expected})")
+        self.npc_id = npc_id
+        self.expected = expected
+
+
+def npc_position(location: Dict[str, Any]) -> List[float]:
+    """Champ `position` ([x, y], index 2d des recherches de proximité), tenu à jour avec current_location"""
+    return [location["x"], location["y"]]
+
+
+def npc_document(npc: NPC) -> Dict[str, Any]:
+    """Document MongoDB d'un PNJ (mémoire long terme archivée à part)"""
+    document = npc.model_dump(exclude={"long_term_memory"})
+    document["position"] = npc_position(document["current_location"])
+    return document
+
+
+def version_filter(npc_id: str, version: int) -> Dict[str, Any]:
+    """Filtre d'écriture conditionnelle ; la version 0 couvre aussi les documents d'avant le versionnage"""
+    return {"id": npc_id, "version": version if version else {"$in": [0, None]}}
+
+
+# Événements récents injectés dans le contexte de décision : 300 m, 10 minutes de jeu
+NEARBY_EVENTS_RADIUS = 300.0
+NEARBY_EVENTS_SECONDS = 10 * GAME_MINUTE_SECONDS
+NEARBY_EVENTS_LIMIT = 5
+
 class NPCManager:
-    def __init__(self, db, ai_engine: AIEngine):
+    def __init__(self, db, ai_engine: AIEngine, event_store: Optional[EventStore] = None):
         self.db = db
         self.npcs_collection: AsyncIOMotorCollection = db.npcs
         self.events_collection: AsyncIOMotorCollection = db.events
+        self.event_store = event_store or EventStore(db)
+        self.memory_archive = MemoryArchive(db.memories)
+        # Séquence globale des modifications (flux /api/npcs/changes)
+        self.change_feed = ChangeFeed(db)
         self.ai_engine = ai_engine
+        # Une seule décision en vol par PNJ (ticks qui se chevauchent côté mod)
+        self.decision_flight = SingleFlight(idempotency_window=2.0)
+        self.decision_timings = StageStats()
+        
+        # Graphe des relations entre PNJ (collection dédiée, chargé au démarrage)
+        self.relationships = RelationshipGraph(db.relationships)
+        
+        # Décisions de foule (bulk) : rayon de regroupement et compteurs
+        self.crowd_radius = 15.0
+        self.crowd_stats = {"sweeps": 0, "clusters": 0, "clustered_npcs": 0, "llm_calls_saved": 0}
+        
+        # Écritures conditionnelles sur la version du PNJ (concurrence optimiste)
+        self.write_stats = {"conditional_writes": 0, "conflicts": 0, "retries_exhausted": 0}
         
+        # Appelé pour chaque décision écrite (flux en direct du tableau de bord), posé par le serveur
+        self.on_decision: Optional[Callable[[NPC, Dict[str, Any]], None]] = None
+        
+    @db_operation
+    async def ensure_indexes(self) -> int:
+        """Index unique sur l'id et index 2d des positions ; retourne le nombre de doublons supprimés"""
+        removed = 0
+        try:
+            await self.npcs_collection.create_index("id", unique=True)
+        except OperationFailure as e:
+            if e.code != 11000:
+                raise
+            removed = await self._remove_duplicate_ids()
+            await self.npcs_collection.create_index("id", unique=True)
+        
+        await self._backfill_positions()
+        await self.npcs_collection.create_index([("position", GEO2D)], min=WORLD_BOUNDS[0], max=WORLD_BOUNDS[1])
+        return removed
+    
+    async def _backfill_positions(self) -> int:
+        """Documents d'avant l'index 2d : `position` recopiée depuis current_location"""
+        operations = [
+            UpdateOne({"_id": npc_data["_id"]}, {"$set": {"position": npc_position(npc_data["current_location"])}})
+            async for npc_data in self.npcs_collection.find({"position": {"$exists": False}}, {"current_location": 1})
+        ]
+        if operations:
+            await self.npcs_collection.bulk_write(operations, ordered=False)
+        return len(operations)
+    
+    async def _remove_duplicate_ids(self) -> int:
+        """Anciennes bases (populate relancé avec le même seed) : garde la version la plus récente de chaque id"""
+        duplicates = self.npcs_collection.aggregate([
+            {"$sort": {"version": -1, "last_updated": -1}},
+            {"$group": {"_id": "$id", "documents": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}
+        ], allowDiskUse=True)
+        removed = 0
+        async for group in duplicates:
+            result = await self.npcs_collection.delete_many({"_id": {"$in": group["documents"][1:]}})
+            removed += result.deleted_count
+        return removed
+    
+    @db_operation
     async def create_npc(self, npc_data: NPCCreate) -> NPC:
         """Crée un nouveau PNJ avec personnalité générée"""
         
@@ -24,164 +141,695 @@ class NPCManager:
             npc_type=npc_data.npc_type,
             personality=personality,
             current_location=npc_data.current_location,
-            schedule=self._generate_schedule(npc_data.npc_type)
+            schedule_template_id=checked_template_id(npc_data.npc_type, npc_data.schedule_template_id),
+            schedule_overrides=npc_data.schedule_overrides
         )
         
         # Sauvegarder en base
-        await self.npcs_collection.insert_one(npc.model_dump())
+        await self.npcs_collection.insert_one({**npc_document(npc), **await self.change_feed.stamp()})
         return npc
     
+    @db_operation
+    async def create_npcs(self, npcs_data: List[NPCCreate]) -> List[NPC]:
+        """Crée plusieurs PNJ en une seule insertion groupée"""
+        npcs = [
+            NPC(
+                name=npc_data.name,
+                npc_type=npc_data.npc_type,
+                personality=npc_data.personality or self._generate_personality(npc_data.npc_type),
+                current_location=npc_data.current_location,
+                schedule_template_id=checked_template_id(npc_data.npc_type, npc_data.schedule_template_id),
+                schedule_overrides=npc_data.schedule_overrides
+            )
+            for npc_data in npcs_data
+        ]
+        if npcs:
+            stamps = await self.change_feed.stamps(len(npcs))
+            await insert_population(self.npcs_collection, [
+                {**npc_document(npc), **stamp} for npc, stamp in zip(npcs, stamps)
+            ])
+        return npcs
+    
+    @db_operation
+    async def populate(self, count: int, seed: int = 42, mix: Optional[Dict[NPCType, float]] = None) -> Dict[str, Any]:
+        """Peuple la ville avec `count` PNJ générés (reproductible pour un même seed)"""
+        started = time.perf_counter()
+        documents = generate_population(count, seed=seed, mix=mix)
+        for document, stamp in zip(documents, await self.change_feed.stamps(len(documents))):
+            document.update(stamp)
+        generated = time.perf_counter()
+        inserted = await insert_population(self.npcs_collection, documents)
+        
+        npc_types: Dict[str, int] = {}
+        for document in documents:
+            npc_types[document["npc_type"]] = npc_types.get(document["npc_type"], 0) + 1
+        return {
+            "inserted": inserted,
+            "npc_types": npc_types,
+            "generation_ms": round((generated - started) * 1000, 1),
+            "insert_ms": round((time.perf_counter() - generated) * 1000, 1),
+        }
+    
+    @db_operation
+    async def delete_npc(self, npc_id: str) -> bool:
+        """Supprime un PNJ, ses relations et sa mémoire archivée (pierre tombale pour le flux de modifications)"""
+        result = await self.npcs_collection.delete_one({"id": npc_id})
+        if result.deleted_count == 0:
+            return False
+        await self.change_feed.record_deletion(npc_id)
+        await self.relationships.remove_node(npc_id)
+        await self.memory_archive.delete_npc(npc_id)
+        return True
+    
+    @db_operation
+    async def get_changes(self, since: Optional[int], fields: Optional[List[str]] = None,
+                          limit: int = 500) -> Dict[str, Any]:
+        """PNJ modifiés et supprimés depuis le curseur `since` (voir ChangeFeed.changes)"""
+        return await self.change_feed.changes(self.npcs_collection, since, fields, limit)
+    
+    @db_operation
     async def get_npc(self, npc_id: str) -> Optional[NPC]:
-        """Récupère un PNJ par son ID"""
-        npc_data = await self.npcs_collection.find_one({"id": npc_id})
+        """Récupère un PNJ par son ID (fenêtre mémoire courte incluse, historique via l'archive)"""
+        npc_data = await self.npcs_collection.find_one({"id": npc_id}, {"_id": 0, "long_term_memory": 0})
         if npc_data:
             return NPC(**npc_data)
         return None
     
-    async def get_all_npcs(self) -> List[NPC]:
-        """Récupère tous les PNJ"""
-        cursor = self.npcs_collection.find()
+    @db_operation
+    async def get_all_npcs(self, include_memory: bool = True) -> List[NPC]:
+        """Récupère tous les PNJ (include_memory=False : sans la fenêtre mémoire ni l'ancien planning)"""
+        projection = {"_id": 0, "long_term_memory": 0} if include_memory else LIGHT_PROJECTION
+        cursor = self.npcs_collection.find({}, projection)
         npcs = []
         async for npc_data in cursor:
             npcs.append(NPC(**npc_data))
         return npcs
     
-    async def update_npc(self, npc_id: str, updates: NPCUpdate) -> Optional[NPC]:
-        """Met à jour un PNJ"""
+    @db_operation
+    async def update_npc(self, npc_id: str, updates: NPCUpdate, expected_version: Optional[int] = None) -> Optional[NPC]:
+        """Met à jour un PNJ (un seul aller-retour, document mis à jour retourné).
+        
+        Avec `expected_version`, la mise à jour n'est appliquée que si le PNJ
+        n'a pas changé depuis cette version (VersionConflict sinon).
+        """
         update_data = {k: v for k, v in updates.model_dump().items() if v is not None}
         update_data["last_updated"] = datetime.utcnow()
+        if "current_location" in update_data:
+            update_data["position"] = npc_position(update_data["current_location"])
+        update_data.update(await self.change_feed.stamp())
         
-        await self.npcs_collection.update_one(
-            {"id": npc_id},
-            {"$set": update_data}
+        query = {"id": npc_id}
+        if expected_version is not None:
+            query = version_filter(npc_id, expected_version)
+            self.write_stats["conditional_writes"] += 1
+        npc_data = await self.npcs_collection.find_one_and_update(
+            query,
+            {"$set": update_data, "$inc": {"version": 1}},
+            projection={"_id": 0, "long_term_memory": 0},
+            return_document=ReturnDocument.AFTER
         )
         
-        return await self.get_npc(npc_id)
+        if npc_data:
+            return NPC(**npc_data)
+        if expected_version is not None:
+            if await self.npcs_collection.count_documents({"id": npc_id}, limit=1):
+                self.write_stats["conflicts"] += 1
+                raise VersionConflict(npc_id, expected_version)
+        return None
     
-    async def add_memory(self, npc_id: str, memory: Memory):
-        """Ajoute une mémoire à un PNJ"""
-        npc = await self.get_npc(npc_id)
-        if not npc:
-            return
-        
-        # Ajouter à la mémoire court terme
-        npc.short_term_memory.append(memory)
-        
-        # Limiter la mémoire court terme à 20 éléments
-        if len(npc.short_term_memory) > 20:
-            # Déplacer les plus anciennes vers long terme si importantes
-            old_memory = npc.short_term_memory.pop(0)
-            if old_memory.importance >= 7:
-                npc.long_term_memory.append(old_memory)
+    async def update_versioned(self, npc_id: str, mutate: Callable[[NPC], Optional[Dict[str, Any]]],
+                               npc: Optional[NPC] = None) -> Optional[NPC]:
+        """Lecture-modification-écriture conditionnelle, rejouée tant que la version a changé.
         
-        # Limiter la mémoire long terme à 100 éléments
-        if len(npc.long_term_memory) > 100:
-            npc.long_term_memory.pop(0)
+        `mutate` reçoit l'état courant du PNJ et retourne l'opération de mise à
+        jour à appliquer (ou None : rien à faire). L'écriture n'est acceptée que
+        si la version lue est toujours celle du document ; sinon le PNJ est
+        relu et `mutate` réévalué sur le nouvel état. `npc` évite la première
+        lecture quand l'appelant a déjà le document.
+        """
+        expected = 0
+        stamp = None
+        for _ in range(MAX_WRITE_ATTEMPTS):
+            if npc is None:
+                npc = await self.get_npc(npc_id)
+                if npc is None:
+                    return None
+            expected = npc.version
+            update = mutate(npc)
+            if update is None:
+                return npc
+            # Même numéro de séquence pour toutes les tentatives
+            stamp = stamp or await self.change_feed.stamp()
+            update = {
+                **update,
+                "$set": {**update.get("$set", {}), **stamp},
+                "$inc": {**update.get("$inc", {}), "version": 1}
+            }
+            
+            self.write_stats["conditional_writes"] += 1
+            npc_data = await self.npcs_collection.find_one_and_update(
+                version_filter(npc_id, npc.version),
+                update,
+                projection={"_id": 0, "long_term_memory": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if npc_data:
+                return NPC(**npc_data)
+            self.write_stats["conflicts"] += 1
+            npc = None
         
-        # Mettre à jour en base
+        self.write_stats["retries_exhausted"] += 1
+        raise VersionConflict(npc_id, expected)
+    
+    def write_stats_summary(self) -> Dict[str, Any]:
+        writes = self.write_stats["conditional_writes"]
+        return {
+            **self.write_stats,
+            "conflict_rate": round(self.write_stats["conflicts"] / writes, 4) if writes else 0.0
+        }
+    
+    @db_operation
+    async def add_memory(self, npc_id: str, memory: Memory):
+        """Ajoute une mémoire à un PNJ (écriture atomique, sans relecture)"""
+        # Ajout atomique et commutatif : pas de condition, la version avance seulement
         await self.npcs_collection.update_one(
             {"id": npc_id},
-            {"$set": {
-                "short_term_memory": [m.model_dump() for m in npc.short_term_memory],
-                "long_term_memory": [m.model_dump() for m in npc.long_term_memory],
-                "last_updated": datetime.utcnow()
-            }}
+            {
+                "$push": self._memory_push(memory),
+                "$set": {"last_updated": datetime.utcnow(), **await self.change_feed.stamp()},
+                "$inc": {"version": 1}
+            }
         )
+        # Les mémoires importantes sont aussi conservées à long terme, dans l'archive
+        if self.memory_archive.should_archive(memory):
+            await self.memory_archive.add(npc_id, memory)
     
+    @db_operation
+    async def add_memories(self, items: List[Tuple[str, Memory]]):
+        """Ajoute une mémoire à plusieurs PNJ : une écriture groupée, plus une pour l'archive"""
+        if not items:
+            return
+        now = datetime.utcnow()
+        stamps = await self.change_feed.stamps(len(items))
+        await self.npcs_collection.bulk_write([
+            UpdateOne(
+                {"id": npc_id},
+                {"$push": self._memory_push(memory), "$set": {"last_updated": now, **stamp}, "$inc": {"version": 1}}
+            )
+            for (npc_id, memory), stamp in zip(items, stamps)
+        ], ordered=False)
+        await self.memory_archive.add_many(
+            (npc_id, memory) for npc_id, memory in items if self.memory_archive.should_archive(memory)
+        )
+    
+    @db_operation
+    async def get_memory_history(self, npc_id: str, before: Optional[str] = None, limit: int = 50,
+                                 min_importance: int = 1) -> Dict[str, Any]:
+        """Historique long terme d'un PNJ, par pages (voir MemoryArchive.page)"""
+        return await self.memory_archive.page(npc_id, before, limit, min_importance)
+    
+    def _memory_push(self, memory: Memory) -> Dict[str, Any]:
+        """Opérateur $push qui ajoute une mémoire en bornant la fenêtre courte côté MongoDB"""
+        return {"short_term_memory": {"$each": [memory.model_dump()], "$slice": -SHORT_TERM_MEMORY_SIZE}}
+    
+    @db_operation
     async def get_nearby_npcs(self, location: Location, radius: float = 100.0) -> List[NPC]:
-        """Trouve les PNJ à proximité d'une position"""
-        npcs = await self.get_all_npcs()
+        """Trouve les PNJ à proximité d'une position (disque de l'index 2d, puis distance 3D)"""
+        cursor = self.npcs_collection.find(
+            {"position": {"$geoWithin": {"$center": [[location.x, location.y], radius]}}}, LIGHT_PROJECTION
+        )
         nearby = []
         
-        for npc in npcs:
-            distance = self._calculate_distance(location, npc.current_location)
-            if distance <= radius:
+        async for npc_data in cursor:
+            npc = NPC(**npc_data)
+            if self._calculate_distance(location, npc.current_location) <= radius:
                 nearby.append(npc)
         
         return nearby
     
+    @db_operation
     async def process_npc_decision(self, npc_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Traite une décision IA pour un PNJ"""
-        npc = await self.get_npc(npc_id)
+        """Traite une décision IA pour un PNJ (dédupliquée par PNJ)"""
+        return await self.decision_flight.run(
+            npc_id,
+            context_hash(context),
+            lambda: self._compute_npc_decision(npc_id, context)
+        )
+    
+    async def _compute_npc_decision(self, npc_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Calcule réellement la décision : une lecture, l'IA, puis une écriture combinée"""
+        timer = StageTimer()
+        
+        with timer.stage("db_read"):
+            npc, nearby_ids = await self._load_decision_state(npc_id)
         if not npc:
             return {"error": "PNJ non trouvé"}
         
-        # Construire la requête de décision
-        from .models import DecisionRequest
+        with timer.stage("nearby_events"):
+            decision_request = self._build_decision_request(npc, context, nearby_ids)
+        
+        # Obtenir la décision IA
+        with timer.stage("llm"):
+            decision = await self.ai_engine.make_decision(
+                npc, decision_request, LazyMemories(self.memory_archive, npc.id)
+            )
         
-        nearby_npcs = await self.get_nearby_npcs(npc.current_location)
-        nearby_ids = [n.id for n in nearby_npcs if n.id != npc_id]
+        return await self._commit_decision(npc, decision, timer)
+    
+    async def process_npc_decision_stream(self, npc_id: str, context: Dict[str, Any]):
+        """Décision en flux : champs partiels dès qu'ils sont connus, puis résultat complet.
         
-        decision_request = DecisionRequest(
-            npc_id=npc_id,
+        Émet des dicts {"type": "partial", "field", "value", "elapsed_ms"} puis
+        {"type": "decision", ...résultat de process_npc_decision}.
+        """
+        fingerprint = context_hash(context)
+        found, shared = await self.decision_flight.join(npc_id, fingerprint)
+        if found:
+            # Une décision pour ce PNJ est déjà en vol (ou toute récente) : on la partage
+            yield {"type": "decision", **shared}
+            return
+        
+        future = self.decision_flight.lead(npc_id)
+        result = None
+        try:
+            timer = StageTimer()
+            with timer.stage("db_read"):
+                npc, nearby_ids = await self._load_decision_state(npc_id)
+            if not npc:
+                result = {"error": "PNJ non trouvé"}
+                yield {"type": "decision", **result}
+                return
+            
+            with timer.stage("nearby_events"):
+                decision_request = self._build_decision_request(npc, context, nearby_ids)
+            decision = None
+            with timer.stage("llm"):
+                memories = LazyMemories(self.memory_archive, npc.id)
+                async for event in self.ai_engine.stream_decision(npc, decision_request, memories):
+                    if event[0] == "field":
+                        yield {
+                            "type": "partial",
+                            "field": event[1],
+                            "value": event[2],
+                            "elapsed_ms": round((time.perf_counter() - timer.started) * 1000, 3)
+                        }
+                    else:
+                        decision = event[1]
+            
+            result = await self._commit_decision(npc, decision, timer)
+            yield {"type": "decision", **result}
+        except BaseException as e:
+            # Client déconnecté en cours de flux : un appelant en attente reprend la décision
+            self.decision_flight.finish(npc_id, fingerprint, future, error=e)
+            raise
+        finally:
+            if result is not None:
+                self.decision_flight.finish(npc_id, fingerprint, future, result=result)
+    
+    def _build_decision_request(self, npc: NPC, context: Dict[str, Any], nearby_ids: List[str]) -> DecisionRequest:
+        if "recent_nearby_events" not in context:
+            # Ce qui s'est passé autour du PNJ récemment (index en mémoire, sans requête Mongo)
+            location = npc.current_location
+            events = self.event_store.nearby_recent(
+                location.x, location.y, NEARBY_EVENTS_RADIUS, NEARBY_EVENTS_SECONDS, limit=NEARBY_EVENTS_LIMIT
+            )
+            if events:
+                context = {**context, "recent_nearby_events": [
+                    {
+                        "event_type": e["event_type"],
+                        "severity": e["severity"],
+                        "description": e["description"],
+                        "distance_m": e["distance_m"],
+                        "age_s": e["age_s"]
+                    }
+                    for e in events
+                ]}
+        
+        return DecisionRequest(
+            npc_id=npc.id,
             context=context,
             nearby_npcs=nearby_ids,
             time_of_day=datetime.now().hour,
             weather=context.get("weather", "sunny")
         )
+    
+    @db_operation
+    async def _commit_decision(self, npc: NPC, decision: DecisionResponse, timer: StageTimer) -> Dict[str, Any]:
+        """Mémoire de la décision + nouvel état du PNJ en une seule mise à jour, conditionnée à la version lue"""
+        now = datetime.utcnow()
+        with timer.stage("db_write"):
+            await self.update_versioned(
+                npc.id, lambda current: self._decision_update(current, decision, now), npc=npc
+            )
         
-        # Obtenir la décision IA
-        decision = await self.ai_engine.make_decision(npc, decision_request)
+        timings = timer.finish()
+        self.decision_timings.record(timings)
         
-        # Créer une mémoire de cette décision
+        result = {
+            "npc_id": npc.id,
+            "decision": decision.model_dump(),
+            "timestamp": now.isoformat(),
+            "timings_ms": timings
+        }
+        if self.on_decision:
+            self.on_decision(npc, result)
+        return result
+    
+    def _decision_update(self, npc: NPC, decision: DecisionResponse, now: datetime) -> Dict[str, Any]:
+        """Opération de mise à jour d'une décision : mémoire ajoutée + état du PNJ"""
         memory = Memory(
             event_type="decision",
             description=f"Décision: {decision.action} - {decision.reasoning}",
             location=npc.current_location,
             importance=5
         )
-        await self.add_memory(npc_id, memory)
-        
-        # Mettre à jour l'état du PNJ si nécessaire
-        updates = NPCUpdate()
+        state_updates = {"last_updated": now, "last_decision_time": now}
         if decision.target_location:
-            updates.current_location = decision.target_location
+            state_updates["current_location"] = decision.target_location.model_dump()
+            state_updates["position"] = npc_position(state_updates["current_location"])
+        return {"$push": self._memory_push(memory), "$set": state_updates}
+    
+    @db_operation
+    async def process_bulk_decisions(self, npc_contexts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Décisions groupées : une seule décision LLM par foule de PNJ similaires.
         
-        if updates.model_dump(exclude_none=True):
-            await self.update_npc(npc_id, updates)
+        Les PNJ proches, de même type et même état, qui partagent le même
+        contexte, reçoivent une décision de groupe déclinée localement
+        (cibles décalées, rôles). Les PNJ isolés passent par le chemin normal.
+        """
+        contexts = {item["npc_id"]: item["context"] for item in npc_contexts}
+        
+        npcs = []
+        cursor = self.npcs_collection.find({"id": {"$in": list(contexts)}}, {"_id": 0, "long_term_memory": 0})
+        async for npc_data in cursor:
+            npcs.append(NPC(**npc_data))
+        
+        by_context: Dict[str, List[NPC]] = {}
+        for npc in npcs:
+            by_context.setdefault(context_hash(contexts[npc.id]), []).append(npc)
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        clusters = clustered = 0
+        for group in by_context.values():
+            for cluster in cluster_npcs(group, self.crowd_radius):
+                if len(cluster) == 1:
+                    npc_id = cluster[0].id
+                    try:
+                        results[npc_id] = await self.process_npc_decision(npc_id, contexts[npc_id])
+                    except VersionConflict:
+                        # Décision non enregistrée pour ce PNJ seulement : le reste du lot continue
+                        results[npc_id] = {"npc_id": npc_id, "error": "conflict"}
+                else:
+                    results.update(await self._process_crowd_decision(cluster, contexts[cluster[0].id]))
+                    clusters += 1
+                    clustered += len(cluster)
+        
+        saved = clustered - clusters
+        self.crowd_stats["sweeps"] += 1
+        self.crowd_stats["clusters"] += clusters
+        self.crowd_stats["clustered_npcs"] += clustered
+        self.crowd_stats["llm_calls_saved"] += saved
         
         return {
-            "npc_id": npc_id,
-            "decision": decision.model_dump(),
-            "timestamp": datetime.utcnow().isoformat()
+            "results": [results.get(item["npc_id"], {"error": "PNJ non trouvé"}) for item in npc_contexts],
+            "crowd": {"clusters": clusters, "clustered_npcs": clustered, "llm_calls_saved": saved}
         }
     
-    async def simulate_daily_routine(self, npc_id: str, current_hour: int):
-        """Simule la routine quotidienne d'un PNJ"""
-        npc = await self.get_npc(npc_id)
-        if not npc:
-            return
+    @db_operation
+    async def degraded_decisions(self, npc_contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Décisions de secours pour des requêtes délestées : une lecture légère, ni LLM ni écriture.
+
+        Le PNJ garde son état en base ; le mod applique l'action et redemandera
+        une vraie décision plus tard.
+        """
+        contexts = {item["npc_id"]: item["context"] for item in npc_contexts}
+        npcs: Dict[str, NPC] = {}
+        async for npc_data in self.npcs_collection.find({"id": {"$in": list(contexts)}}, LIGHT_PROJECTION):
+            npcs[npc_data["id"]] = NPC(**npc_data)
+
+        now = datetime.utcnow()
+        results = []
+        for item in npc_contexts:
+            npc = npcs.get(item["npc_id"])
+            if npc is None:
+                results.append({"error": "PNJ non trouvé"})
+                continue
+            context = item["context"]
+            request = DecisionRequest(
+                npc_id=npc.id, context=context, time_of_day=datetime.now().hour,
+                weather=context.get("weather", "sunny")
+            )
+            results.append({
+                "npc_id": npc.id,
+                "decision": self.ai_engine.degraded_decision(npc, request).model_dump(),
+                "timestamp": now.isoformat(),
+                "degraded": True
+            })
+        return results
+
+    @db_operation
+    async def _process_crowd_decision(self, cluster: List[NPC], context: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Une décision pour le meneur du groupe, déclinée pour chaque membre, une écriture groupée"""
+        timer = StageTimer()
+        leader = cluster[0]
+        group_context = {**context, "group_size": len(cluster)}
+        with timer.stage("nearby_events"):
+            request = self._build_decision_request(leader, group_context, [m.id for m in cluster[1:]])
+        
+        with timer.stage("llm"):
+            group_decision = await self.ai_engine.make_decision(
+                leader, request, LazyMemories(self.memory_archive, leader.id)
+            )
+        
+        now = datetime.utcnow()
+        operations = []
+        results = {}
+        decisions = {}
+        stamps = await self.change_feed.stamps(len(cluster))
+        for index, member in enumerate(cluster):
+            decision = derive_member_decision(group_decision, member, index, len(cluster))
+            decisions[member.id] = decision
+            update = self._decision_update(member, decision, now)
+            update["$set"].update(stamps[index])
+            operations.append(UpdateOne(
+                version_filter(member.id, member.version),
+                {**update, "$inc": {"version": 1}}
+            ))
+            results[member.id] = {
+                "npc_id": member.id,
+                "decision": decision.model_dump(),
+                "timestamp": now.isoformat(),
+                "crowd": {
+                    "leader_id": leader.id,
+                    "size": len(cluster),
+                    "role": assign_role(member.npc_type, index)
+                }
+            }
         
-        # Trouver l'activité prévue pour cette heure
-        scheduled_activity = None
-        for schedule_item in npc.schedule:
-            if schedule_item.hour == current_hour:
-                scheduled_activity = schedule_item
-                break
+        conflicted = set()
+        with timer.stage("db_write"):
+            result = await self.npcs_collection.bulk_write(operations, ordered=False)
+            self.write_stats["conditional_writes"] += len(operations)
+            if result.matched_count < len(operations):
+                # Membres modifiés depuis leur lecture : décision réappliquée sur leur nouvel état
+                applied = await self._applied_decisions(cluster, now)
+                for member in cluster:
+                    if member.id not in applied:
+                        self.write_stats["conflicts"] += 1
+                        decision = decisions[member.id]
+                        try:
+                            await self.update_versioned(
+                                member.id, lambda current, d=decision: self._decision_update(current, d, now)
+                            )
+                        except VersionConflict:
+                            conflicted.add(member.id)
         
-        if scheduled_activity:
+        timings = timer.finish()
+        for member in cluster:
+            if member.id in conflicted:
+                results[member.id] = {"npc_id": member.id, "error": "conflict"}
+                continue
+            results[member.id]["timings_ms"] = timings
+            if self.on_decision:
+                self.on_decision(member, results[member.id])
+        return results
+    
+    async def _applied_decisions(self, members: List[NPC], now: datetime) -> set:
+        """Ids des membres dont la décision de groupe horodatée `now` a été écrite"""
+        cursor = self.npcs_collection.find(
+            {"id": {"$in": [m.id for m in members]}, "last_decision_time": now}, {"_id": 0, "id": 1}
+        )
+        return {npc_data["id"] async for npc_data in cursor}
+    
+    @db_operation
+    async def _load_decision_state(self, npc_id: str, radius: float = 100.0) -> Tuple[Optional[NPC], List[str]]:
+        """Lit le PNJ et les ids des PNJ proches en un seul aller-retour.
+        
+        Les voisins viennent d'un $geoNear sur l'index 2d de `position`
+        (distance dans le plan), la hauteur est ajoutée ensuite pour garder
+        la distance 3D de _calculate_distance.
+        """
+        distance_squared = {"$add": [
+            {"$pow": ["$_distance", 2]},
+            {"$pow": [{"$subtract": ["$current_location.z", "$$z"]}, 2]}
+        ]}
+        pipeline = [
+            {"$match": {"id": npc_id}},
+            {"$limit": 1},
+            {"$lookup": {
+                "from": self.npcs_collection.name,
+                "let": {"position": "$position", "z": "$current_location.z", "self_id": "$id"},
+                "pipeline": [
+                    {"$geoNear": {"near": "$$position", "key": "position", "distanceField": "_distance",
+                                  "maxDistance": radius}},
+                    {"$match": {"$expr": {"$and": [
+                        {"$ne": ["$id", "$$self_id"]},
+                        {"$lte": [distance_squared, radius ** 2]}
+                    ]}}},
+                    {"$project": {"_id": 0, "id": 1}}
+                ],
+                "as": "_nearby"
+            }},
+            # Anciens documents : la mémoire long terme est lue dans l'archive, à la demande
+            {"$project": {"long_term_memory": 0, "position": 0}}
+        ]
+        
+        async for npc_data in self.npcs_collection.aggregate(pipeline):
+            nearby_ids = [n["id"] for n in npc_data.pop("_nearby", [])]
+            return NPC(**npc_data), nearby_ids
+        return None, []
+    
+    @db_operation
+    async def spread_information(self, seeds: Dict[str, float], description: str,
+                                 location: Optional[Location] = None, importance: int = 5,
+                                 hops: int = 2) -> Dict[str, Tuple[float, int]]:
+        """Diffuse une information sur le graphe social et l'ajoute à la mémoire des PNJ atteints.
+        
+        Un seul passage de propagation, puis une seule écriture groupée des mémoires.
+        """
+        reached = self.relationships.propagate(seeds, hops=hops)
+        if not reached:
+            return reached
+        
+        await self.add_memories([
+            (npc_id, Memory(
+                event_type="rumor",
+                description=description,
+                location=location,
+                importance=max(1, min(10, round(importance * intensity)))
+            ))
+            for npc_id, (intensity, hop) in reached.items()
+        ])
+        return reached
+    
+    @db_operation
+    async def simulate_daily_routine(self, npc_id: str, current_hour: int):
+        """Simule la routine quotidienne d'un PNJ : applique l'activité prévue à cette heure"""
+        def routine_update(npc: NPC) -> Optional[Dict[str, Any]]:
+            # Activité en cours selon le planning, à n'importe quelle heure
+            scheduled_activity = resolve_activity(
+                npc.schedule_template_id, current_hour, npc.schedule_overrides, npc.schedule
+            )
+            if not scheduled_activity or scheduled_activity == npc.current_activity:
+                return None
+            
             # Adapter l'humeur selon l'activité
             new_mood = self._determine_mood_for_activity(
-                scheduled_activity.activity, 
+                scheduled_activity,
                 npc.personality,
                 npc.stress_level
             )
             
-            updates = NPCUpdate(
-                current_activity=scheduled_activity.activity,
-                current_mood=new_mood
-            )
-            
-            await self.update_npc(npc_id, updates)
-            
-            # Créer une mémoire de changement d'activité
+            # Mémoire de changement d'activité, écrite avec le nouvel état
             memory = Memory(
                 event_type="routine",
-                description=f"Changement d'activité: {scheduled_activity.activity.value}",
+                description=f"Changement d'activité: {scheduled_activity.value}",
                 location=npc.current_location,
                 importance=3
             )
-            await self.add_memory(npc_id, memory)
+            return {
+                "$set": {
+                    "current_activity": scheduled_activity.value,
+                    "current_mood": new_mood.value,
+                    "last_updated": datetime.utcnow()
+                },
+                "$push": self._memory_push(memory)
+            }
+        
+        await self.update_versioned(npc_id, routine_update)
+    
+    @db_operation
+    async def scheduled_activities(self, hour: int) -> Dict[str, Any]:
+        """Ce que chaque PNJ est censé faire à cette heure, sans lire les documents complets.
+        
+        Les PNJ sans surcharge sont comptés par modèle (une agrégation), seuls
+        les PNJ avec surcharges ou ancien planning embarqué sont lus un par un.
+        """
+        activities: Dict[str, int] = {}
+        by_template: Dict[str, Dict[str, Any]] = {}
+        
+        def count(activity: Optional[ActivityType], number: int):
+            key = activity.value if activity else "unscheduled"
+            activities[key] = activities.get(key, 0) + number
+        
+        shared = self.npcs_collection.aggregate([
+            {"$match": {"schedule_template_id": {"$ne": None}, "schedule_overrides.0": {"$exists": False}}},
+            {"$group": {"_id": "$schedule_template_id", "count": {"$sum": 1}}}
+        ])
+        async for group in shared:
+            activity = resolve_activity(group["_id"], hour)
+            by_template[group["_id"]] = {"npcs": group["count"], "activity": activity.value if activity else None}
+            count(activity, group["count"])
+        
+        individual = self.npcs_collection.find(
+            {"$or": [{"schedule_template_id": None}, {"schedule_overrides.0": {"$exists": True}}]},
+            {"schedule_template_id": 1, "schedule_overrides": 1, "schedule": 1}
+        )
+        individual_count = 0
+        async for npc_data in individual:
+            individual_count += 1
+            activity = resolve_activity(
+                npc_data.get("schedule_template_id"), hour,
+                [NPCSchedule(**item) for item in npc_data.get("schedule_overrides", [])],
+                [NPCSchedule(**item) for item in npc_data.get("schedule", [])]
+            )
+            count(activity, 1)
+        
+        return {
+            "hour": hour,
+            "activities": activities,
+            "templates": by_template,
+            "individual_schedules": individual_count
+        }
+    
+    @db_operation
+    async def migrate_schedules(self) -> Dict[str, int]:
+        """Remplace les plannings embarqués identiques au modèle de leur type par une référence"""
+        migrated = kept = 0
+        updates = []
+        cursor = self.npcs_collection.find(
+            {"schedule_template_id": None}, {"id": 1, "npc_type": 1, "schedule": 1}
+        )
+        async for npc_data in cursor:
+            template_id = default_template_id(NPCType(npc_data["npc_type"]))
+            schedule = [NPCSchedule(**item) for item in npc_data.get("schedule", [])]
+            if schedule and not template_matches(template_id, schedule):
+                kept += 1
+                continue
+            updates.append((npc_data["id"], template_id))
+            migrated += 1
+        
+        if updates:
+            stamps = await self.change_feed.stamps(len(updates))
+            await self.npcs_collection.bulk_write([
+                UpdateOne(
+                    {"id": npc_id},
+                    {"$set": {"schedule_template_id": template_id, "schedule": [], "schedule_overrides": [], **stamp},
+                     "$inc": {"version": 1}}
+                )
+                for (npc_id, template_id), stamp in zip(updates, stamps)
+            ], ordered=False)
+        return {"migrated": migrated, "kept_embedded": kept}
     
     def _generate_personality(self, npc_type: NPCType) -> NPCPersonality:
         """Génère une personnalité basée sur le type de PNJ"""
@@ -203,38 +851,6 @@ class NPCManager:
         
         return base_personality
     
-    def _generate_schedule(self, npc_type: NPCType) -> List:
-        """Génère un planning quotidien selon le type de PNJ"""
-        from .models import NPCSchedule
-        
-        schedule = []
-        
-        if npc_type == NPCType.CIVILIAN:
-            schedule = [
-                NPCSchedule(hour=8, activity=ActivityType.WORKING, priority=8),
-                NPCSchedule(hour=12, activity=ActivityType.EATING, priority=6),
-                NPCSchedule(hour=14, activity=ActivityType.WORKING, priority=8),
-                NPCSchedule(hour=18, activity=ActivityType.SHOPPING, priority=5),
-                NPCSchedule(hour=20, activity=ActivityType.SOCIALIZING, priority=4),
-                NPCSchedule(hour=23, activity=ActivityType.SLEEPING, priority=9)
-            ]
-        elif npc_type == NPCType.CRIMINAL:
-            schedule = [
-                NPCSchedule(hour=10, activity=ActivityType.WALKING, priority=3),
-                NPCSchedule(hour=14, activity=ActivityType.CRIMINAL_ACTIVITY, priority=7),
-                NPCSchedule(hour=22, activity=ActivityType.CRIMINAL_ACTIVITY, priority=8),
-                NPCSchedule(hour=2, activity=ActivityType.SLEEPING, priority=6)
-            ]
-        elif npc_type == NPCType.POLICE:
-            schedule = [
-                NPCSchedule(hour=8, activity=ActivityType.PATROLLING, priority=9),
-                NPCSchedule(hour=12, activity=ActivityType.EATING, priority=5),
-                NPCSchedule(hour=13, activity=ActivityType.PATROLLING, priority=9),
-                NPCSchedule(hour=20, activity=ActivityType.PATROLLING, priority=8)
-            ]
-        
-        return schedule
-    
     def _calculate_distance(self, loc1: Location, loc2: Location) -> float:
         """Calcule la distance euclidienne entre deux points"""
         return ((loc1.x - loc2.x)**2 + (loc1.y - loc2.y)**2 + (loc1.z - loc2.z)**2)**0.5
@@ -0,0 +1,171 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from pymongo.errors import BulkWriteError
+
+from .models import NPCType
+from .schedules import default_template_id
+
+PERSONALITY_TRAITS = ["aggression", "honesty", "sociability", "intelligence", "courage", "wealth_level"]
+
+
+class Area(NamedTuple):
+    name: str
+    x: float
+    y: float
+    z: float
+    spread: float                 # écart-type de la dispersion autour du centre (m)
+    weights: Dict[NPCType, float]  # attractivité de la zone par type de PNJ
+
+
+# Zones nommées de Los Santos (centres approximatifs)
+AREAS: List[Area] = [
+    Area("Downtown Los Santos", -200.0, -800.0, 30.0, 250.0,
+         {NPCType.CIVILIAN: 3, NPCType.POLICE: 2, NPCType.SHOPKEEPER: 3, NPCType.WORKER: 2, NPCType.CRIMINAL: 1}),
+    Area("Mission Row", 425.0, -979.0, 30.0, 150.0,
+         {NPCType.CIVILIAN: 1, NPCType.POLICE: 5, NPCType.SHOPKEEPER: 1, NPCType.WORKER: 1, NPCType.CRIMINAL: 1}),
+    Area("Grove Street", 100.0, -1940.0, 20.0, 150.0,
+         {NPCType.CIVILIAN: 2, NPCType.POLICE: 1, NPCType.SHOPKEEPER: 1, NPCType.WORKER: 1, NPCType.CRIMINAL: 5}),
+    Area("Davis", 200.0, -1650.0, 29.0, 200.0,
+         {NPCType.CIVILIAN: 2, NPCType.POLICE: 1, NPCType.SHOPKEEPER: 1, NPCType.WORKER: 1, NPCType.CRIMINAL: 3}),
+    Area("Vinewood", 300.0, 200.0, 105.0, 300.0,
+         {NPCType.CIVILIAN: 3, NPCType.POLICE: 1, NPCType.SHOPKEEPER: 2, NPCType.WORKER: 1, NPCType.CRIMINAL: 1}),
+    Area("Vespucci Beach", -1350.0, -1200.0, 5.0, 250.0,
+         {NPCType.CIVILIAN: 4, NPCType.POLICE: 1, NPCType.SHOPKEEPER: 2, NPCType.WORKER: 1, NPCType.CRIMINAL: 1}),
+    Area("Del Perro", -1393.0, -584.0, 30.0, 200.0,
+         {NPCType.CIVILIAN: 3, NPCType.POLICE: 1, NPCType.SHOPKEEPER: 2, NPCType.WORKER: 1, NPCType.CRIMINAL: 1}),
+    Area("Little Seoul", -707.0, -914.0, 19.0, 200.0,
+         {NPCType.CIVILIAN: 3, NPCType.POLICE: 1, NPCType.SHOPKEEPER: 4, NPCType.WORKER: 1, NPCType.CRIMINAL: 1}),
+    Area("Cypress Flats Industrial", 900.0, -2100.0, 30.0, 300.0,
+         {NPCType.CIVILIAN: 1, NPCType.POLICE: 1, NPCType.SHOPKEEPER: 0.5, NPCType.WORKER: 5, NPCType.CRIMINAL: 2}),
+    Area("Los Santos International Airport", -1037.0, -2738.0, 20.0, 300.0,
+         {NPCType.CIVILIAN: 2, NPCType.POLICE: 1, NPCType.SHOPKEEPER: 1, NPCType.WORKER: 3, NPCType.CRIMINAL: 0.5}),
+]
+
+
+class Archetype(NamedTuple):
+    means: List[float]   # moyenne de chaque trait (ordre PERSONALITY_TRAITS)
+    stds: List[float]
+
+
+# Mêmes tendances que NPCManager._generate_personality, en loi normale bornée 1-10
+ARCHETYPES: Dict[NPCType, Archetype] = {
+    NPCType.CIVILIAN: Archetype([5.0, 6.5, 6.0, 5.0, 5.0, 5.0], [1.2, 1.0, 1.2, 1.5, 1.5, 2.0]),
+    NPCType.CRIMINAL: Archetype([8.5, 2.5, 5.0, 5.0, 7.5, 4.0], [1.0, 1.0, 1.5, 1.5, 1.0, 2.0]),
+    NPCType.POLICE: Archetype([7.0, 8.5, 5.0, 6.0, 9.0, 5.0], [0.8, 1.0, 1.2, 1.2, 0.8, 1.0]),
+    NPCType.SHOPKEEPER: Archetype([3.5, 7.0, 7.5, 5.5, 4.0, 6.0], [1.0, 1.0, 1.0, 1.2, 1.5, 1.5]),
+    NPCType.WORKER: Archetype([5.0, 6.5, 5.0, 4.5, 6.0, 3.5], [1.2, 1.0, 1.2, 1.2, 1.2, 1.2]),
+}
+
+# Répartition par défaut d'une ville
+DEFAULT_MIX: Dict[NPCType, float] = {
+    NPCType.CIVILIAN: 0.60,
+    NPCType.WORKER: 0.15,
+    NPCType.SHOPKEEPER: 0.10,
+    NPCType.CRIMINAL: 0.10,
+    NPCType.POLICE: 0.05,
+}
+
+FIRST_NAMES = [
+    "Marcus", "Sarah", "Tommy", "Lamar", "Amanda", "Tracey", "Jimmy", "Denise", "Carlos", "Maria",
+    "Kevin", "Jessica", "Andre", "Tanisha", "Dwayne", "Lisa", "Hector", "Rosa", "Brad", "Karen",
+    "Jin", "Mei", "Omar", "Fatima", "Dmitri", "Olga", "Pedro", "Lucia", "Steve", "Tina",
+]
+LAST_NAMES = [
+    "Johnson", "Rodriguez", "Williams", "Chen", "Davis", "Martinez", "Brown", "Kim", "Garcia", "Smith",
+    "Lee", "Lopez", "Clark", "Nguyen", "Walker", "Park", "Hernandez", "Young", "Petrov", "Silva",
+]
+
+
+def generate_population(
+    count: int,
+    seed: int = 42,
+    mix: Optional[Dict[NPCType, float]] = None,
+    schedule_templates: Optional[Dict[NPCType, str]] = None,
+    areas: Optional[List[Area]] = None,
+) -> List[Dict[str, Any]]:
+    """Génère `count` documents PNJ prêts à insérer, de façon reproductible.
+
+    Les tirages (types, personnalités, zones, positions, noms, identifiants)
+    sont vectorisés par archétype avec numpy : aucun objet pydantic par PNJ.
+    Le planning n'est pas recopié : chaque PNJ référence le modèle de son
+    type (`schedule_templates`, par défaut la version courante).
+    """
+    import numpy as np  # import différé : seul ce chemin en a besoin
+
+    rng = np.random.default_rng(seed)
+    mix = mix or DEFAULT_MIX
+    areas = areas or AREAS
+    schedule_templates = schedule_templates or {}
+    now = datetime.utcnow()
+
+    types = list(mix)
+    probabilities = np.array([mix[t] for t in types], dtype=float)
+    type_index = rng.choice(len(types), size=count, p=probabilities / probabilities.sum())
+
+    # Identifiants UUID4 dérivés du seed
+    raw_ids = rng.integers(0, 256, size=(count, 16), dtype=np.uint8).tobytes()
+    ids = [str(uuid.UUID(bytes=raw_ids[i * 16:(i + 1) * 16], version=4)) for i in range(count)]
+
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    name_index = rng.integers(0, len(names), size=count).tolist()
+
+    documents: List[Optional[Dict[str, Any]]] = [None] * count
+    for t_index, npc_type in enumerate(types):
+        members = np.flatnonzero(type_index == t_index)
+        n = len(members)
+        if n == 0:
+            continue
+
+        archetype = ARCHETYPES.get(npc_type, ARCHETYPES[NPCType.CIVILIAN])
+        traits = np.clip(np.rint(rng.normal(archetype.means, archetype.stds, size=(n, len(PERSONALITY_TRAITS)))), 1, 10).astype(int)
+
+        weights = np.array([area.weights.get(npc_type, 1.0) for area in areas], dtype=float)
+        area_index = rng.choice(len(areas), size=n, p=weights / weights.sum())
+        centres = np.array([(area.x, area.y, area.spread) for area in areas])[area_index]
+        xs = rng.normal(centres[:, 0], centres[:, 2]).tolist()
+        ys = rng.normal(centres[:, 1], centres[:, 2]).tolist()
+        stress = rng.integers(0, 31, size=n).tolist()
+        traits = traits.tolist()
+        area_index = area_index.tolist()
+
+        template_id = schedule_templates.get(npc_type) or default_template_id(npc_type)
+        type_value = npc_type.value
+        for k, i in enumerate(members.tolist()):
+            area = areas[area_index[k]]
+            documents[i] = {
+                "id": ids[i],
+                "name": names[name_index[i]],
+                "npc_type": type_value,
+                "personality": dict(zip(PERSONALITY_TRAITS, traits[k])),
+                "current_location": {"x": xs[k], "y": ys[k], "z": area.z, "area_name": area.name},
+                "position": [xs[k], ys[k]],
+                "current_mood": "neutral",
+                "current_activity": "walking",
+                "schedule_template_id": template_id,
+                "schedule_overrides": [],
+                "schedule": [],
+                "short_term_memory": [],
+                "relationships": {},
+                "health": 100,
+                "stress_level": stress[k],
+                "last_decision_time": now,
+                "created_at": now,
+                "last_updated": now,
+                "version": 0,
+            }
+    return documents
+
+
+async def insert_population(collection, documents: List[Dict[str, Any]], chunk_size: int = 5000) -> int:
+    """Insertion par lots non ordonnés (un doublon n'arrête pas le reste du lot)"""
+    inserted = 0
+    for start in range(0, len(documents), chunk_size):
+        chunk = documents[start:start + chunk_size]
+        try:
+            result = await collection.insert_many(chunk, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+    return inserted
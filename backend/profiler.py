@@ -0,0 +1,108 @@
+import functools
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+# Profondeur maximale d'une pile échantillonnée
+MAX_DEPTH = 64
+
+
+class SamplingProfiler:
+    """Profil par échantillonnage d'un thread (celui de la boucle asyncio) pendant une durée bornée.
+
+    Un thread auxiliaire relève la pile du thread visé toutes les
+    `interval` secondes (sys._current_frames, sans instrumenter le code) et
+    compte les piles identiques. Les échantillons pris pendant que la boucle
+    attend des entrées-sorties (sélecteur) sont comptés à part : les piles
+    chaudes ne montrent que le temps où le processus travaille vraiment.
+    Un seul profil à la fois.
+    """
+
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self._busy = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._busy.locked()
+
+    def profile(self, seconds: float, interval: float = 0.005, top: int = 25) -> Dict[str, Any]:
+        """Bloquant : à lancer hors de la boucle (run_in_executor). RuntimeError si un profil est en cours"""
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("Un profil est déjà en cours")
+        try:
+            stacks, idle, samples, elapsed = self._sample(seconds, interval)
+        finally:
+            self._busy.release()
+        return self._report(stacks, idle, samples, elapsed, interval, top)
+
+    def _sample(self, seconds: float, interval: float) -> Tuple[Dict[Tuple[str, ...], int], int, int, float]:
+        stacks: Dict[Tuple[str, ...], int] = {}
+        idle = samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            samples += 1
+            if _is_idle(frame):
+                idle += 1
+            else:
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{_short_path(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                key = tuple(reversed(stack))
+                stacks[key] = stacks.get(key, 0) + 1
+            del frame
+            time.sleep(interval)
+        return stacks, idle, samples, time.perf_counter() - started
+
+    @staticmethod
+    def _report(stacks: Dict[Tuple[str, ...], int], idle: int, samples: int, elapsed: float,
+                interval: float, top: int) -> Dict[str, Any]:
+        busy = samples - idle
+        own: Dict[str, int] = {}
+        cumulative: Dict[str, int] = {}
+        for stack, count in stacks.items():
+            # Fonction sans numéro de ligne : une entrée par fonction
+            functions = [frame.rsplit(":", 1)[0] for frame in stack]
+            own[functions[-1]] = own.get(functions[-1], 0) + count
+            for function in set(functions):
+                cumulative[function] = cumulative.get(function, 0) + count
+
+        def share(count: int) -> float:
+            return round(count / busy, 4) if busy else 0.0
+
+        hot_stacks = sorted(stacks.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            "duration_s": round(elapsed, 3),
+            "interval_ms": round(interval * 1000, 3),
+            "samples": samples,
+            "idle_ratio": round(idle / samples, 4) if samples else 0.0,
+            "hot_stacks": [{"samples": count, "share": share(count), "stack": list(stack)} for stack, count in hot_stacks],
+            "self": [{"function": f, "samples": c, "share": share(c)}
+                     for f, c in sorted(own.items(), key=lambda item: item[1], reverse=True)[:top]],
+            "cumulative": [{"function": f, "samples": c, "share": share(c)}
+                           for f, c in sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]],
+        }
+
+
+def _is_idle(frame) -> bool:
+    """La boucle attend des événements : sélecteur asyncio, ou boucle en C (uvloop) sans code Python au-dessus"""
+    filename = frame.f_code.co_filename
+    return (frame.f_code.co_name == "select" and filename.endswith("selectors.py")) or filename.endswith(
+        os.path.join("asyncio", "runners.py"))
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """Chemin relatif à l'entrée de sys.path qui le contient (module lisible, sans le préfixe d'installation)"""
+    for prefix in sorted((os.path.abspath(entry) for entry in sys.path if entry), key=len, reverse=True):
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
@@ -0,0 +1,201 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from pymongo import UpdateOne
+
+MIN_SCORE = -10
+MAX_SCORE = 10
+
+
+class EdgeUpdate(NamedTuple):
+    source: str
+    target: str
+    delta: int = 0                # variation ajoutée au score courant
+    score: Optional[int] = None   # ou valeur absolue (prioritaire sur delta)
+
+
+def _clamp(score: int) -> int:
+    return max(MIN_SCORE, min(MAX_SCORE, int(score)))
+
+
+class RelationshipGraph:
+    """Graphe des relations entre PNJ (score -10 à +10), en mémoire et persisté dans Mongo.
+
+    Listes d'adjacence dans les deux sens : `neighbors` (ce que X pense des
+    autres) et `reverse_neighbors` (qui aime / déteste X) sans parcourir les
+    PNJ. La collection `relationships` stocke une arête par document
+    {source, target, score} ; sans collection, le graphe reste en mémoire.
+    """
+
+    def __init__(self, collection=None):
+        self.collection = collection
+        self._out: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._in: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.edge_count = 0
+        # Appelé à chaque modification en mémoire ("edges" / "remove_npc"), ex. journal du snapshot
+        self.listener: Optional[Callable[[str, Any], None]] = None
+
+    async def load(self) -> int:
+        """Charge toutes les arêtes depuis Mongo (au démarrage)"""
+        if self.collection is None:
+            return 0
+        await self.collection.create_index([("source", 1), ("target", 1)], unique=True)
+        await self.collection.create_index("target")
+        self._out.clear()
+        self._in.clear()
+        self.edge_count = 0
+        async for edge in self.collection.find({}, {"_id": 0, "source": 1, "target": 1, "score": 1}):
+            self._set(edge["source"], edge["target"], edge["score"])
+        return self.edge_count
+
+    def adjacency(self) -> Tuple[Dict[str, Dict[str, int]], Dict[str, Dict[str, int]]]:
+        """Listes d'adjacence sortantes et entrantes, en lecture seule (export du snapshot)"""
+        return self._out, self._in
+
+    def restore_adjacency(self, outgoing: Dict[str, Dict[str, int]], incoming: Dict[str, Dict[str, int]]) -> int:
+        """Remplace le graphe en mémoire (snapshot), sans écrire dans Mongo"""
+        self._out = defaultdict(dict, outgoing)
+        self._in = defaultdict(dict, incoming)
+        self.edge_count = sum(map(len, outgoing.values()))
+        return self.edge_count
+
+    def _set(self, source: str, target: str, score: int):
+        if target not in self._out[source]:
+            self.edge_count += 1
+        self._out[source][target] = score
+        self._in[target][source] = score
+
+    def score(self, source: str, target: str) -> Optional[int]:
+        return self._out.get(source, {}).get(target)
+
+    def apply(self, updates: Iterable[EdgeUpdate]) -> Dict[Tuple[str, str], int]:
+        """Applique un lot de mises à jour en mémoire, retourne les arêtes modifiées.
+
+        Plusieurs mises à jour d'une même arête dans le lot se cumulent.
+        """
+        changed: Dict[Tuple[str, str], int] = {}
+        for update in updates:
+            if update.source == update.target:
+                continue
+            if update.score is not None:
+                new_score = _clamp(update.score)
+            else:
+                new_score = _clamp((self.score(update.source, update.target) or 0) + update.delta)
+            if self.score(update.source, update.target) != new_score:
+                self._set(update.source, update.target, new_score)
+                changed[(update.source, update.target)] = new_score
+        if changed and self.listener:
+            self.listener("edges", [[source, target, score] for (source, target), score in changed.items()])
+        return changed
+
+    async def apply_and_persist(self, updates: Iterable[EdgeUpdate]) -> Dict[Tuple[str, str], int]:
+        """Mise à jour groupée : mémoire, puis une seule écriture groupée dans Mongo"""
+        changed = self.apply(updates)
+        if changed and self.collection is not None:
+            now = datetime.utcnow()
+            await self.collection.bulk_write([
+                UpdateOne(
+                    {"source": source, "target": target},
+                    {"$set": {"score": score, "updated_at": now}},
+                    upsert=True
+                )
+                for (source, target), score in changed.items()
+            ], ordered=False)
+        return changed
+
+    async def remove_node(self, npc_id: str) -> int:
+        """Supprime toutes les arêtes d'un PNJ (suppression du PNJ)"""
+        removed = self.forget(npc_id)
+        if self.listener:
+            self.listener("remove_npc", npc_id)
+        if removed and self.collection is not None:
+            await self.collection.delete_many({"$or": [{"source": npc_id}, {"target": npc_id}]})
+        return removed
+
+    def forget(self, npc_id: str) -> int:
+        """Retire les arêtes d'un PNJ en mémoire seulement"""
+        removed = 0
+        for target in self._out.pop(npc_id, {}):
+            self._in.get(target, {}).pop(npc_id, None)
+            removed += 1
+        for source in self._in.pop(npc_id, {}):
+            if self._out.get(source, {}).pop(npc_id, None) is not None:
+                removed += 1
+        self.edge_count -= removed
+        return removed
+
+    def neighbors(self, npc_id: str, min_score: int = MIN_SCORE, max_score: int = MAX_SCORE) -> Dict[str, int]:
+        """Ce que `npc_id` pense des autres PNJ (filtré par score)"""
+        return {t: s for t, s in self._out.get(npc_id, {}).items() if min_score <= s <= max_score}
+
+    def reverse_neighbors(self, npc_id: str, min_score: int = MIN_SCORE, max_score: int = MAX_SCORE) -> Dict[str, int]:
+        """Ce que les autres PNJ pensent de `npc_id` (ex. min_score=5 : qui l'apprécie)"""
+        return {s: v for s, v in self._in.get(npc_id, {}).items() if min_score <= v <= max_score}
+
+    def propagate(self, seeds: Dict[str, float], hops: int = 2, decay: float = 0.5,
+                  min_score: int = 1, threshold: float = 0.1) -> Dict[str, Tuple[float, int]]:
+        """Diffuse une information (crime vu, rumeur) sur k sauts, frontière par frontière.
+
+        Un PNJ qui sait transmet à ceux qu'il apprécie (score >= min_score) ;
+        l'intensité reçue est intensité * decay * score/10, on garde la plus
+        forte. Retourne {npc_id: (intensité, saut)} hors PNJ de départ.
+        """
+        best: Dict[str, float] = dict(seeds)
+        reached: Dict[str, Tuple[float, int]] = {}
+        frontier = dict(seeds)
+        for hop in range(1, hops + 1):
+            next_frontier: Dict[str, float] = {}
+            for source, intensity in frontier.items():
+                for target, score in self._out.get(source, {}).items():
+                    if score < min_score:
+                        continue
+                    received = intensity * decay * score / MAX_SCORE
+                    if received < threshold or received <= best.get(target, 0.0):
+                        continue
+                    best[target] = received
+                    next_frontier[target] = received
+            for npc_id, intensity in next_frontier.items():
+                if npc_id not in seeds:
+                    reached[npc_id] = (intensity, hop)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return reached
+
+    async def migrate_embedded(self, npcs_collection) -> int:
+        """Déplace les anciens dictionnaires NPC.relationships dans le graphe"""
+        updates: List[EdgeUpdate] = []
+        ids: List[str] = []
+        cursor = npcs_collection.find(
+            {"relationships": {"$exists": True, "$ne": {}}}, {"_id": 0, "id": 1, "relationships": 1}
+        )
+        async for npc_data in cursor:
+            ids.append(npc_data["id"])
+            for target, score in npc_data["relationships"].items():
+                updates.append(EdgeUpdate(npc_data["id"], target, score=score))
+        if not ids:
+            return 0
+        await self.apply_and_persist(updates)
+        await npcs_collection.update_many({"id": {"$in": ids}}, {"$set": {"relationships": {}}})
+        return len(updates)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "edges": self.edge_count,
+            "npcs_with_relationships": sum(1 for targets in self._out.values() if targets),
+        }
+
+
+def witness_updates(witness_ids: Iterable[str], participants: Iterable[str], severity: int) -> List[EdgeUpdate]:
+    """Arêtes modifiées par un événement : un témoin apprécie moins les participants d'un incident grave"""
+    if severity < 5:
+        return []
+    delta = -max(1, severity // 3)
+    participants = list(participants)
+    return [
+        EdgeUpdate(witness, participant, delta)
+        for witness in witness_ids
+        for participant in participants
+        if witness != participant
+    ]
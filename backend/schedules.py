@@ -0,0 +1,155 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .models import ActivityType, NPCSchedule, NPCType
+
+HOURS_PER_DAY = 24
+
+
+class ScheduleTemplate(NamedTuple):
+    id: str              # "<archétype>.v<version>", référencé par les PNJ
+    npc_type: NPCType
+    version: int
+    items: Tuple[NPCSchedule, ...]
+
+
+def _template(npc_type: NPCType, version: int, items: Iterable[Tuple[int, ActivityType, int]]) -> ScheduleTemplate:
+    return ScheduleTemplate(
+        f"{npc_type.value}.v{version}",
+        npc_type,
+        version,
+        tuple(NPCSchedule(hour=hour, activity=activity, priority=priority) for hour, activity, priority in items)
+    )
+
+
+# Plannings partagés par archétype. Un changement de planning crée une nouvelle
+# version (nouvel id) : les PNJ existants gardent la version qu'ils référencent.
+SCHEDULE_TEMPLATES: Dict[str, ScheduleTemplate] = {
+    template.id: template
+    for template in [
+        _template(NPCType.CIVILIAN, 1, [
+            (8, ActivityType.WORKING, 8),
+            (12, ActivityType.EATING, 6),
+            (14, ActivityType.WORKING, 8),
+            (18, ActivityType.SHOPPING, 5),
+            (20, ActivityType.SOCIALIZING, 4),
+            (23, ActivityType.SLEEPING, 9),
+        ]),
+        _template(NPCType.CRIMINAL, 1, [
+            (10, ActivityType.WALKING, 3),
+            (14, ActivityType.CRIMINAL_ACTIVITY, 7),
+            (22, ActivityType.CRIMINAL_ACTIVITY, 8),
+            (2, ActivityType.SLEEPING, 6),
+        ]),
+        _template(NPCType.POLICE, 1, [
+            (8, ActivityType.PATROLLING, 9),
+            (12, ActivityType.EATING, 5),
+            (13, ActivityType.PATROLLING, 9),
+            (20, ActivityType.PATROLLING, 8),
+        ]),
+        _template(NPCType.SHOPKEEPER, 1, [
+            (7, ActivityType.WORKING, 8),
+            (12, ActivityType.EATING, 5),
+            (13, ActivityType.WORKING, 8),
+            (21, ActivityType.SOCIALIZING, 4),
+            (23, ActivityType.SLEEPING, 9),
+        ]),
+        _template(NPCType.WORKER, 1, [
+            (6, ActivityType.DRIVING, 6),
+            (7, ActivityType.WORKING, 8),
+            (12, ActivityType.EATING, 6),
+            (13, ActivityType.WORKING, 8),
+            (17, ActivityType.DRIVING, 6),
+            (18, ActivityType.SOCIALIZING, 4),
+            (22, ActivityType.SLEEPING, 9),
+        ]),
+    ]
+}
+
+# Version courante de chaque archétype, attribuée aux nouveaux PNJ
+DEFAULT_TEMPLATES: Dict[NPCType, str] = {
+    NPCType.CIVILIAN: "civilian.v1",
+    NPCType.CRIMINAL: "criminal.v1",
+    NPCType.POLICE: "police.v1",
+    NPCType.SHOPKEEPER: "shopkeeper.v1",
+    NPCType.WORKER: "worker.v1",
+}
+
+
+class UnknownScheduleTemplate(ValueError):
+    """Le PNJ référence un modèle de planning absent de SCHEDULE_TEMPLATES"""
+
+
+def default_template_id(npc_type: NPCType) -> str:
+    return DEFAULT_TEMPLATES[npc_type]
+
+
+def checked_template_id(npc_type: NPCType, template_id: Optional[str] = None) -> str:
+    """Modèle à attribuer à un nouveau PNJ : celui demandé s'il existe, sinon le modèle courant du type"""
+    if template_id is None:
+        return default_template_id(npc_type)
+    if template_id not in SCHEDULE_TEMPLATES:
+        raise UnknownScheduleTemplate(f"Modèle de planning inconnu: {template_id}")
+    return template_id
+
+
+def build_activity_table(items: Iterable[NPCSchedule]) -> Tuple[Optional[ActivityType], ...]:
+    """Table à 24 cases : activité en cours à chaque heure.
+
+    Une activité dure jusqu'à l'entrée suivante du planning ; avant la
+    première entrée de la journée, c'est la dernière de la veille qui
+    s'applique. À heure égale, la priorité la plus haute l'emporte.
+    """
+    by_hour: Dict[int, NPCSchedule] = {}
+    for item in items:
+        current = by_hour.get(item.hour)
+        if current is None or item.priority >= current.priority:
+            by_hour[item.hour] = item
+    if not by_hour:
+        return (None,) * HOURS_PER_DAY
+
+    activity = by_hour[max(by_hour)].activity
+    table = []
+    for hour in range(HOURS_PER_DAY):
+        if hour in by_hour:
+            activity = by_hour[hour].activity
+        table.append(activity)
+    return tuple(table)
+
+
+@lru_cache(maxsize=1024)
+def _template_table(template_id: str, overrides: Tuple[Tuple[int, str, int], ...]) -> Tuple[Optional[ActivityType], ...]:
+    template = SCHEDULE_TEMPLATES.get(template_id)
+    items = {item.hour: item for item in (template.items if template else ())}
+    # Une surcharge remplace l'entrée du modèle à la même heure
+    for hour, activity, priority in overrides:
+        items[hour] = NPCSchedule(hour=hour, activity=ActivityType(activity), priority=priority)
+    return build_activity_table(items.values())
+
+
+def activity_table(template_id: Optional[str], overrides: Iterable[NPCSchedule] = (),
+                   legacy_schedule: Iterable[NPCSchedule] = ()) -> Tuple[Optional[ActivityType], ...]:
+    """Table d'activités d'un PNJ : modèle partagé + surcharges, ou ancien planning embarqué.
+
+    Les tables sont mises en cache par (modèle, surcharges) : tous les PNJ
+    d'un même modèle sans surcharge partagent la même table.
+    """
+    if template_id is None:
+        return build_activity_table(legacy_schedule)
+    key = tuple(sorted((item.hour, item.activity.value, item.priority) for item in overrides))
+    return _template_table(template_id, key)
+
+
+def resolve_activity(template_id: Optional[str], hour: int, overrides: Iterable[NPCSchedule] = (),
+                     legacy_schedule: Iterable[NPCSchedule] = ()) -> Optional[ActivityType]:
+    """Activité prévue à une heure quelconque, en O(1) une fois la table en cache"""
+    return activity_table(template_id, overrides, legacy_schedule)[hour % HOURS_PER_DAY]
+
+
+def template_matches(template_id: str, schedule: List[NPCSchedule]) -> bool:
+    """Indique si un planning embarqué est identique au modèle (migration des anciens documents)"""
+    template = SCHEDULE_TEMPLATES.get(template_id)
+    if template is None:
+        return False
+    normalize = lambda items: sorted((i.hour, i.activity.value, i.priority) for i in items)
+    return normalize(template.items) == normalize(schedule)
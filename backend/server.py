@@ -1,13 +1,21 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import json
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import asyncio
+import hmac
+import threading
+import time
+import weakref
+import httpx
 
 # Import nos modèles et classes
 from .models import (
@@ -15,21 +23,88 @@ from .models import (
     GameEvent, Memory, Location, NPCType, ActivityType
 )
 from .ai_engine import AIEngine
-from .npc_manager import NPCManager
+from .npc_manager import NPCManager, VersionConflict
+from .schedules import SCHEDULE_TEMPLATES, UnknownScheduleTemplate, activity_table
+from .relationships import EdgeUpdate, witness_updates
+from .event_store import EventStore, ROLLUP_DIMENSIONS, GAME_MINUTE_SECONDS
+from .sharding import ShardCoordinator, FORWARDED_HEADER, SECRET_HEADER, npc_id_from_path
+from .live_stream import LiveBroadcaster, TOPICS
+from .admission import AdmissionController, Overloaded
+from .timing import RequestTracing, TraceBuffer
+from .profiler import SamplingProfiler
+from .metrics import (
+    CONTENT_TYPE, ActiveNPCs, Histogram, MetricsRegistry, MongoCommandMetrics, RequestMetrics, counters, family, ratio
+)
 
 # Configuration
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-db_name = os.environ['DB_NAME']
-client = AsyncIOMotorClient(mongo_url)
+# MongoDB connection : aucune connexion à l'import, elle s'ouvre à la première opération
+mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+db_name = os.environ.get('DB_NAME', 'gta5_ai_mod')
+# Nombre et durée des commandes MongoDB par méthode de NPCManager (GET /metrics)
+mongo_metrics = MongoCommandMetrics()
+client = AsyncIOMotorClient(mongo_url, connect=False, event_listeners=[mongo_metrics])
 db = client[db_name]
 
 # Initialisation des systèmes IA
 ai_engine = AIEngine()
-npc_manager = NPCManager(db, ai_engine)
+event_store = EventStore(
+    db,
+    ttl_days=float(os.environ.get('EVENTS_TTL_DAYS', 7)),
+    rollup_ttl_days=float(os.environ.get('EVENT_ROLLUPS_TTL_DAYS', 90))
+)
+npc_manager = NPCManager(db, ai_engine, event_store=event_store)
+
+# Flux en direct du tableau de bord (GET /api/stream)
+live = LiveBroadcaster(
+    changes=npc_manager.get_changes,
+    stats=lambda: get_system_stats(),
+    flush_seconds=float(os.environ.get('LIVE_FLUSH_SECONDS', 1.0)),
+    stats_seconds=float(os.environ.get('LIVE_STATS_SECONDS', 10.0)),
+    queue_size=int(os.environ.get('LIVE_QUEUE_SIZE', 64))
+)
+# PNJ actifs (décision récente) exportés par GET /metrics
+active_npcs = ActiveNPCs(float(os.environ.get('ACTIVE_NPC_WINDOW_SECONDS', 300)))
+
+def on_npc_decision(npc: NPC, result: Dict[str, Any]):
+    active_npcs.touch(npc.id, npc.npc_type.value)
+    live.publish_decision(result, npc.current_location.area_name, npc.npc_type.value)
+
+npc_manager.on_decision = on_npc_decision
+
+# Contrôle d'admission devant les décisions IA : au-delà de la capacité, réponse immédiate plutôt que file sans fin
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', 2.0))
+decision_admission = AdmissionController(
+    "decision",
+    max_in_flight=int(os.environ.get('ADMISSION_DECISION_MAX_IN_FLIGHT', 64)),
+    max_queue=int(os.environ.get('ADMISSION_DECISION_MAX_QUEUE', 256)),
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
+bulk_admission = AdmissionController(
+    "bulk",
+    max_in_flight=int(os.environ.get('ADMISSION_BULK_MAX_IN_FLIGHT', 4)),
+    max_queue=int(os.environ.get('ADMISSION_BULK_MAX_QUEUE', 16)),
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
+# Requête délestée : décision de secours locale (sans LLM ni écriture) au lieu d'un refus
+ADMISSION_DEGRADE = os.environ.get('ADMISSION_DEGRADE', '0') == '1'
+
+# Mode réparti (SHARD_ID / SHARD_URLS) : chaque PNJ est traité par un seul processus
+shards = ShardCoordinator.from_env()
+
+# Snapshot local du graphe des relations et des événements récents (redémarrage à chaud)
+snapshot = None
+if os.environ.get('SNAPSHOT_PATH'):
+    from .world_snapshot import WorldSnapshot  # numpy n'est importé que si le snapshot est activé
+    snapshot = WorldSnapshot(
+        os.environ['SNAPSHOT_PATH'] + (f".{shards.shard_id}" if shards.enabled else ""),
+        npc_manager.relationships,
+        event_store.recent_index,
+        db_name,
+        max_age_seconds=float(os.environ.get('SNAPSHOT_MAX_AGE_SECONDS', 3600))
+    )
 
 # Configuration logging
 logging.basicConfig(
@@ -38,11 +113,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Taille maximale d'une population générée en un appel
+MAX_POPULATION = 200000
+
+# Délai maximal du ping MongoDB de la sonde de disponibilité
+READINESS_TIMEOUT_SECONDS = float(os.environ.get('READINESS_TIMEOUT_SECONDS', 2.0))
+
+# État de l'initialisation en arrière-plan (GET /api/health/ready)
+startup_state: Dict[str, Any] = {"ready": False, "attempts": 0, "error": None, "ready_in_ms": None}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Le serveur accepte les connexions tout de suite ; index, graphe et snapshot se chargent en arrière-plan"""
+    logger.info("🚀 Backend IA GTA 5 démarré")
+    logger.info(f"Base de données: {db_name}")
+    if shards.enabled:
+        logger.info(f"Mode réparti: shard {shards.shard_id} sur {len(shards.urls)}")
+        if not shards.secret:
+            logger.warning("SHARD_SECRET non défini : les diffusions des autres shards seront refusées")
+    # Thread de la boucle asyncio : celui que le profil par échantillonnage observe
+    app.state.profiler = SamplingProfiler(threading.get_ident())
+    initialization = asyncio.ensure_future(initialize_backend())
+    yield
+    logger.info("🛑 Arrêt du backend IA GTA 5")
+    initialization.cancel()
+    await live.close()
+    if snapshot and startup_state["ready"]:
+        app.state.snapshot_task.cancel()
+        snapshot.close()
+    await shards.close()
+    client.close()
+
 # FastAPI app
 app = FastAPI(
     title="GTA 5 AI NPCs Backend",
     description="Système IA pour contrôler les PNJ dans GTA 5",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Router avec préfixe /api
@@ -57,6 +164,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """File pleine : 429 ; attente trop longue : 503. Retry-After indique quand réessayer"""
+    status_code = 429 if exc.reason == "queue_full" else 503
+    return JSONResponse({"detail": str(exc), "reason": exc.reason}, status_code=status_code,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+@app.middleware("http")
+async def wait_until_ready(request: Request, call_next):
+    """Tant que l'initialisation n'est pas terminée, l'API répond 503.
+
+    Sauf les sondes /api/health et les messages entre shards /api/internal :
+    un pair qui démarre doit recevoir les diffusions des autres (structures
+    en mémoire, disponibles dès l'import), sinon elles sont perdues.
+    """
+    path = request.url.path
+    if (not startup_state["ready"] and path.startswith("/api/")
+            and not path.startswith(("/api/health/", "/api/internal/"))):
+        return JSONResponse({"detail": "Initialisation en cours"}, status_code=503, headers={"Retry-After": "1"})
+    return await call_next(request)
+
+@app.middleware("http")
+async def route_to_owner_shard(request: Request, call_next):
+    """Mode réparti : les requêtes qui visent un PNJ sont transmises au shard qui le possède"""
+    if shards.enabled and FORWARDED_HEADER not in request.headers:
+        npc_id = npc_id_from_path(request.url.path)
+        if npc_id and not shards.owns(npc_id):
+            return await shards.forward(request, shards.owner(npc_id))
+    return await call_next(request)
+
+@app.middleware("http")
+async def drop_untrusted_forwarding(request: Request, call_next):
+    """L'en-tête de transmission n'est cru que d'un pair authentifié (secret partagé), sinon il est retiré.
+    
+    Sans cela, n'importe quel client pourrait faire traiter un PNJ par un
+    shard qui ne le possède pas (cache de déduplication et budget de tokens
+    du propriétaire contournés). Ajouté après route_to_owner_shard : il
+    s'exécute avant.
+    """
+    headers = request.headers
+    if FORWARDED_HEADER in headers and not shards.is_peer(headers.get(FORWARDED_HEADER), headers.get(SECRET_HEADER)):
+        forwarded = FORWARDED_HEADER.encode("latin-1")
+        request.scope["headers"] = [(name, value) for name, value in request.scope["headers"] if name != forwarded]
+    return await call_next(request)
+
+# Latence par route : intercepteur ASGI le plus externe (ajouté en dernier), sans surcoût de BaseHTTPMiddleware
+http_latency = Histogram(
+    "gta5_http_request_duration_seconds", "Durée des requêtes HTTP par route", ("method", "route", "status")
+)
+app.add_middleware(RequestMetrics, histogram=http_latency)
+
+# Durée par étape de chaque requête /api : en-tête Server-Timing, traces lentes ou échantillonnées conservées
+trace_buffer = TraceBuffer(
+    size=int(os.environ.get('TRACE_BUFFER_SIZE', 1000)),
+    sample_rate=float(os.environ.get('TRACE_SAMPLE_RATE', 0.05)),
+    slow_ms=float(os.environ.get('TRACE_SLOW_MS', 1000))
+)
+app.add_middleware(RequestTracing, buffer=trace_buffer, server_timing=os.environ.get('SERVER_TIMING', '1') == '1')
+
+# ==================== SANTÉ ====================
+
+@api_router.get("/health/live")
+async def liveness():
+    """Sonde de vie : le processus répond, aucune dépendance n'est consultée"""
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Sonde de disponibilité : initialisation terminée et MongoDB joignable (503 sinon)"""
+    checks: Dict[str, Any] = {"initialized": startup_state["ready"]}
+    try:
+        await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT_SECONDS)
+        checks["mongo"] = True
+    except Exception as e:
+        checks["mongo"] = False
+        checks["mongo_error"] = str(e) or type(e).__name__
+    ready = checks["initialized"] and checks["mongo"]
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "checks": checks, "startup": startup_state},
+        status_code=200 if ready else 503
+    )
+
 # ==================== ENDPOINTS PNJ ====================
 
 @api_router.get("/")
@@ -75,20 +264,55 @@ async def create_npc(npc_data: NPCCreate):
         npc = await npc_manager.create_npc(npc_data)
         logger.info(f"Nouveau PNJ créé: {npc.name} ({npc.id})")
         return npc
+    except UnknownScheduleTemplate as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur création PNJ: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/npcs/batch")
+async def create_npcs_batch(npcs_data: List[NPCCreate]):
+    """Crée plusieurs PNJ en une seule insertion groupée"""
+    try:
+        npcs = await npc_manager.create_npcs(npcs_data)
+        logger.info(f"{len(npcs)} PNJ créés par lot")
+        return {
+            "message": f"{len(npcs)} PNJ créés",
+            "npcs": [{"id": npc.id, "name": npc.name, "type": npc.npc_type} for npc in npcs]
+        }
+    except UnknownScheduleTemplate as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur création PNJ par lot: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/npcs", response_model=List[NPC])
-async def get_all_npcs():
-    """Récupère tous les PNJ"""
+async def get_all_npcs(memory: bool = True):
+    """Récupère tous les PNJ (memory=false : sans la fenêtre mémoire, réponse plus légère)"""
     try:
-        npcs = await npc_manager.get_all_npcs()
+        npcs = await npc_manager.get_all_npcs(include_memory=memory)
         return npcs
     except Exception as e:
         logger.error(f"Erreur récupération PNJ: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/npcs/changes")
+async def get_npc_changes(since: Optional[int] = None, fields: Optional[str] = None, limit: int = 500):
+    """PNJ modifiés depuis le curseur `since` (fields : projection, ex. current_location,current_mood).
+    
+    Sans `since`, ou si le curseur est trop ancien, la réponse porte `resync` : recharger
+    GET /api/npcs puis reprendre depuis le `cursor` renvoyé.
+    """
+    if not 1 <= limit <= 5000:
+        raise HTTPException(status_code=400, detail="limit doit être entre 1 et 5000")
+    try:
+        return await npc_manager.get_changes(
+            since, [field for field in fields.split(",") if field] if fields else None, limit
+        )
+    except Exception as e:
+        logger.error(f"Erreur flux de modifications: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/npcs/{npc_id}", response_model=NPC)
 async def get_npc(npc_id: str):
     """Récupère un PNJ spécifique"""
@@ -98,9 +322,12 @@ async def get_npc(npc_id: str):
     return npc
 
 @api_router.put("/npcs/{npc_id}", response_model=NPC)
-async def update_npc(npc_id: str, updates: NPCUpdate):
-    """Met à jour un PNJ"""
-    npc = await npc_manager.update_npc(npc_id, updates)
+async def update_npc(npc_id: str, updates: NPCUpdate, version: Optional[int] = None):
+    """Met à jour un PNJ (version : n'applique la mise à jour que si le PNJ est toujours à cette version)"""
+    try:
+        npc = await npc_manager.update_npc(npc_id, updates, expected_version=version)
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if not npc:
         raise HTTPException(status_code=404, detail="PNJ non trouvé")
     return npc
@@ -108,29 +335,74 @@ async def update_npc(npc_id: str, updates: NPCUpdate):
 @api_router.delete("/npcs/{npc_id}")
 async def delete_npc(npc_id: str):
     """Supprime un PNJ"""
-    result = await db.npcs.delete_one({"id": npc_id})
-    if result.deleted_count == 0:
+    if not await npc_manager.delete_npc(npc_id):
         raise HTTPException(status_code=404, detail="PNJ non trouvé")
+    await shards.broadcast("remove_npc", npc_id)
     return {"message": "PNJ supprimé"}
 
 # ==================== ENDPOINTS IA & DECISIONS ====================
 
 @api_router.post("/npcs/{npc_id}/decision")
-async def make_npc_decision(npc_id: str, context: Dict[str, Any]):
-    """Fait prendre une décision IA à un PNJ"""
+async def make_npc_decision(npc_id: str, context: Dict[str, Any], stream: bool = False):
+    """Fait prendre une décision IA à un PNJ (stream=true : NDJSON, action dès qu'elle est connue)"""
+    try:
+        slot = await decision_admission.acquire()
+    except Overloaded:
+        if not ADMISSION_DEGRADE:
+            raise
+        return await _degraded_npc_decision(npc_id, context, stream)
+    
+    if stream:
+        body = _stream_npc_decision(npc_id, context, slot)
+        # Flux jamais démarré (client parti avant le premier envoi) : la place est rendue quand même
+        weakref.finalize(body, slot.release)
+        return StreamingResponse(body, media_type="application/x-ndjson")
+    
     try:
-        decision_result = await npc_manager.process_npc_decision(npc_id, context)
+        async with slot:
+            decision_result = await npc_manager.process_npc_decision(npc_id, context)
         if "error" in decision_result:
             raise HTTPException(status_code=404, detail=decision_result["error"])
         
+        # Budget IA restant : le mod s'en sert pour espacer ses demandes
+        decision_result = {**decision_result, "pacing": ai_engine.governor.pacing(npc_id)}
+        
         logger.info(f"Décision prise pour PNJ {npc_id}: {decision_result['decision']['action']}")
         return decision_result
     except HTTPException:
         raise
+    except VersionConflict as e:
+        logger.warning(f"Décision non enregistrée: {e}")
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Erreur décision IA: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _stream_npc_decision(npc_id: str, context: Dict[str, Any], slot):
+    """Une ligne JSON par champ partiel, puis la décision complète avec le rythme IA"""
+    try:
+        async for event in npc_manager.process_npc_decision_stream(npc_id, context):
+            if event["type"] == "decision" and "error" not in event:
+                event["pacing"] = ai_engine.governor.pacing(npc_id)
+            yield json.dumps(event, default=str) + "\n"
+    except Exception as e:
+        logger.error(f"Erreur décision IA (flux): {e}")
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+    finally:
+        slot.release()
+
+async def _degraded_npc_decision(npc_id: str, context: Dict[str, Any], stream: bool):
+    """Décision de secours d'une requête délestée (même forme de réponse que la décision normale)"""
+    decision_admission.degraded()
+    result = (await npc_manager.degraded_decisions([{"npc_id": npc_id, "context": context}]))[0]
+    if "error" in result:
+        raise HTTPException(status_code=404, detail=result["error"])
+    result["pacing"] = ai_engine.governor.pacing(npc_id)
+    if stream:
+        line = json.dumps({"type": "decision", **result}, default=str) + "\n"
+        return StreamingResponse(iter([line]), media_type="application/x-ndjson")
+    return result
+
 @api_router.post("/npcs/{npc_id}/memory")
 async def add_npc_memory(npc_id: str, memory_data: Dict[str, Any]):
     """Ajoute une mémoire à un PNJ"""
@@ -149,6 +421,19 @@ async def add_npc_memory(npc_id: str, memory_data: Dict[str, Any]):
         logger.error(f"Erreur ajout mémoire: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/npcs/{npc_id}/memories")
+async def get_npc_memories(npc_id: str, before: Optional[str] = None, limit: int = 50, min_importance: int = 1):
+    """Historique long terme d'un PNJ, du plus récent au plus ancien (`before` : curseur `next` de la page précédente)"""
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit doit être entre 1 et 500")
+    try:
+        return await npc_manager.get_memory_history(npc_id, before, limit, min_importance)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Curseur invalide: {before}")
+    except Exception as e:
+        logger.error(f"Erreur historique mémoire: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/npcs/{npc_id}/nearby")
 async def get_nearby_npcs(npc_id: str, radius: float = 100.0):
     """Trouve les PNJ à proximité"""
@@ -159,20 +444,60 @@ async def get_nearby_npcs(npc_id: str, radius: float = 100.0):
     nearby_npcs = await npc_manager.get_nearby_npcs(npc.current_location, radius)
     return [{"id": n.id, "name": n.name, "npc_type": n.npc_type} for n in nearby_npcs]
 
+@api_router.get("/npcs/{npc_id}/relationships")
+async def get_npc_relationships(npc_id: str, min_score: int = -10, max_score: int = 10):
+    """Relations d'un PNJ : ce qu'il pense des autres et ce que les autres pensent de lui"""
+    graph = npc_manager.relationships
+    return {
+        "npc_id": npc_id,
+        "outgoing": graph.neighbors(npc_id, min_score, max_score),
+        "incoming": graph.reverse_neighbors(npc_id, min_score, max_score)
+    }
+
+@api_router.post("/relationships/bulk")
+async def update_relationships(updates: List[Dict[str, Any]]):
+    """Met à jour un lot d'arêtes : {source, target, delta} ou {source, target, score}"""
+    try:
+        edges = [
+            EdgeUpdate(u["source"], u["target"], int(u.get("delta", 0)), u.get("score"))
+            for u in updates
+        ]
+        changed = await npc_manager.relationships.apply_and_persist(edges)
+        await _broadcast_edges(changed)
+        return {"message": f"{len(changed)} relations modifiées", "updated": len(changed)}
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"Champ manquant: {e}")
+    except Exception as e:
+        logger.error(f"Erreur mise à jour relations: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==================== SIMULATION & ROUTINES ====================
 
 @api_router.post("/simulation/daily-routine")
-async def run_daily_routine():
-    """Lance la routine quotidienne pour tous les PNJ"""
+async def run_daily_routine(request: Request):
+    """Lance la routine quotidienne pour tous les PNJ (en mode réparti : chaque shard traite ses PNJ)"""
     try:
         current_hour = datetime.now().hour
-        npcs = await npc_manager.get_all_npcs()
+        npcs = await npc_manager.get_all_npcs(include_memory=False)
         
         results = []
         for npc in npcs:
-            await npc_manager.simulate_daily_routine(npc.id, current_hour)
+            if not shards.owns(npc.id):
+                continue
+            try:
+                await npc_manager.simulate_daily_routine(npc.id, current_hour)
+            except VersionConflict:
+                # PNJ trop modifié en parallèle : routine reportée au prochain passage
+                results.append({"npc_id": npc.id, "name": npc.name, "processed": False, "error": "conflict"})
+                continue
             results.append({"npc_id": npc.id, "name": npc.name, "processed": True})
         
+        if shards.enabled and FORWARDED_HEADER not in request.headers:
+            for peer_result in await asyncio.gather(*[
+                shards.call(peer, "POST", "/api/simulation/daily-routine") for peer in shards.peers
+            ]):
+                results.extend(peer_result["processed_npcs"])
+        
         return {
             "message": f"Routine quotidienne exécutée pour {len(results)} PNJ",
             "hour": current_hour,
@@ -182,27 +507,121 @@ async def run_daily_routine():
         logger.error(f"Erreur routine quotidienne: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/simulation/activities")
+async def get_scheduled_activities(hour: Optional[int] = None):
+    """Ce que tous les PNJ sont censés faire à cette heure (heure courante par défaut)"""
+    try:
+        if hour is None:
+            hour = datetime.now().hour
+        return await npc_manager.scheduled_activities(hour % 24)
+    except Exception as e:
+        logger.error(f"Erreur activités planifiées: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/schedules")
+async def get_schedule_templates():
+    """Modèles de planning partagés, avec leur activité heure par heure"""
+    return [
+        {
+            "id": template.id,
+            "npc_type": template.npc_type,
+            "version": template.version,
+            "items": [item.model_dump() for item in template.items],
+            "hourly": [activity.value if activity else None for activity in activity_table(template.id)]
+        }
+        for template in SCHEDULE_TEMPLATES.values()
+    ]
+
+@api_router.post("/simulation/migrate-schedules")
+async def migrate_schedules():
+    """Remplace les plannings embarqués des anciens PNJ par une référence au modèle"""
+    try:
+        result = await npc_manager.migrate_schedules()
+        logger.info(f"Plannings migrés: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"Erreur migration plannings: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/simulation/bulk-decisions")
-async def process_bulk_decisions(npc_contexts: List[Dict[str, Any]]):
-    """Traite les décisions pour plusieurs PNJ en même temps"""
+async def process_bulk_decisions(npc_contexts: List[Dict[str, Any]], request: Request):
+    """Traite les décisions pour plusieurs PNJ en même temps (foules regroupées)"""
     try:
-        results = []
-        
-        for context_data in npc_contexts:
-            npc_id = context_data["npc_id"]
-            context = context_data["context"]
-            
-            decision_result = await npc_manager.process_npc_decision(npc_id, context)
-            results.append(decision_result)
+        slot = await bulk_admission.acquire()
+    except Overloaded:
+        if not ADMISSION_DEGRADE:
+            raise
+        bulk_admission.degraded()
+        results = await npc_manager.degraded_decisions(npc_contexts)
+        return {
+            "message": f"Décisions de secours pour {len(results)} PNJ (serveur saturé)",
+            "results": results,
+            "crowd": {"clusters": 0, "clustered_npcs": 0, "llm_calls_saved": 0},
+            "pacing": ai_engine.governor.pacing(),
+            "degraded": True
+        }
+    
+    try:
+        async with slot:
+            if shards.enabled and FORWARDED_HEADER not in request.headers:
+                bulk_result = await _sharded_bulk_decisions(npc_contexts)
+            else:
+                bulk_result = await npc_manager.process_bulk_decisions(npc_contexts)
+        results = bulk_result["results"]
         
         return {
             "message": f"Décisions traitées pour {len(results)} PNJ",
-            "results": results
+            "results": results,
+            "crowd": bulk_result["crowd"],
+            "pacing": ai_engine.governor.pacing()
         }
+    except Overloaded:
+        raise
     except Exception as e:
         logger.error(f"Erreur décisions groupées: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _sharded_bulk_decisions(npc_contexts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Un lot par shard propriétaire, traités en parallèle, résultats remis dans l'ordre de la requête"""
+    by_shard: Dict[int, List[int]] = {}
+    for index, item in enumerate(npc_contexts):
+        by_shard.setdefault(shards.owner(item["npc_id"]), []).append(index)
+    
+    async def run(shard: int, indexes: List[int]) -> Dict[str, Any]:
+        items = [npc_contexts[i] for i in indexes]
+        if shard == shards.shard_id:
+            return await npc_manager.process_bulk_decisions(items)
+        try:
+            return await shards.call(shard, "POST", "/api/simulation/bulk-decisions", json=items)
+        except httpx.HTTPStatusError as e:
+            # Shard propriétaire saturé : le lot entier est refusé avec son délai de nouvel essai
+            if e.response.status_code not in (429, 503):
+                raise
+            raise Overloaded(e.response.json().get("reason", "peer"), int(e.response.headers.get("Retry-After", 1)))
+    
+    shard_results = await asyncio.gather(*[run(shard, indexes) for shard, indexes in by_shard.items()])
+    results: List[Any] = [None] * len(npc_contexts)
+    crowd = {"clusters": 0, "clustered_npcs": 0, "llm_calls_saved": 0}
+    for indexes, shard_result in zip(by_shard.values(), shard_results):
+        for index, result in zip(indexes, shard_result["results"]):
+            results[index] = result
+        for key in crowd:
+            crowd[key] += shard_result["crowd"][key]
+    return {"results": results, "crowd": crowd}
+
+@api_router.post("/simulation/populate")
+async def populate_city(count: int = 10000, seed: int = 42, mix: Optional[Dict[NPCType, float]] = None):
+    """Peuple la ville avec `count` PNJ générés (mix : proportion par type de PNJ)"""
+    if not 1 <= count <= MAX_POPULATION:
+        raise HTTPException(status_code=400, detail=f"count doit être entre 1 et {MAX_POPULATION}")
+    try:
+        result = await npc_manager.populate(count, seed=seed, mix=mix)
+        logger.info(f"Population générée: {result['inserted']} PNJ (seed {seed})")
+        return {"message": f"{result['inserted']} PNJ générés", "seed": seed, **result}
+    except Exception as e:
+        logger.error(f"Erreur génération population: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==================== ÉVÉNEMENTS DU JEU ====================
 
 @api_router.post("/events")
@@ -217,25 +636,43 @@ async def create_game_event(event_data: Dict[str, Any]):
             severity=event_data.get("severity", 5)
         )
         
-        # Sauvegarder l'événement
-        await db.events.insert_one(event.model_dump())
+        # Sauvegarder l'événement (et ses agrégats horaires)
+        await event_store.insert(event)
         
-        # Notifier les PNJ à proximité
+        # Notifier les PNJ à proximité (une écriture groupée)
         nearby_npcs = await npc_manager.get_nearby_npcs(event.location, radius=200.0)
         
-        for npc in nearby_npcs:
-            memory = Memory(
+        await npc_manager.add_memories([
+            (npc.id, Memory(
                 event_type="witnessed_event",
                 description=f"A été témoin de: {event.description}",
                 location=event.location,
                 importance=min(event.severity, 8)
-            )
-            await npc_manager.add_memory(npc.id, memory)
+            ))
+            for npc in nearby_npcs
+        ])
+        
+        # Les témoins jugent les participants, puis l'information circule dans leur entourage
+        witness_ids = [npc.id for npc in nearby_npcs]
+        changed = await npc_manager.relationships.apply_and_persist(
+            witness_updates(witness_ids, event.participants, event.severity)
+        )
+        # Mode réparti : les autres shards mettent à jour leur index d'événements et leur graphe
+        live.publish_event(event.model_dump(mode="json"))
+        await shards.broadcast("event", event.model_dump(mode="json"))
+        await _broadcast_edges(changed)
+        rumors = await npc_manager.spread_information(
+            {npc_id: 1.0 for npc_id in witness_ids},
+            f"A entendu parler de: {event.description}",
+            location=event.location,
+            importance=min(event.severity, 8)
+        )
         
         return {
             "event_id": event.id,
             "message": "Événement créé",
-            "notified_npcs": len(nearby_npcs)
+            "notified_npcs": len(nearby_npcs),
+            "rumor_npcs": len(rumors)
         }
     except Exception as e:
         logger.error(f"Erreur création événement: {e}")
@@ -245,18 +682,84 @@ async def create_game_event(event_data: Dict[str, Any]):
 async def get_recent_events(limit: int = 50):
     """Récupère les événements récents"""
     try:
-        cursor = db.events.find().sort("timestamp", -1).limit(limit)
-        events = []
-        async for event_data in cursor:
-            # Convert ObjectId to string
-            if '_id' in event_data:
-                event_data['_id'] = str(event_data['_id'])
-            events.append(event_data)
-        return events
+        return await event_store.recent(limit)
     except Exception as e:
         logger.error(f"Erreur récupération événements: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/events/nearby")
+async def get_nearby_events(x: float, y: float, radius: float = 300.0, game_minutes: float = 10.0,
+                            seconds: Optional[float] = None, event_type: Optional[str] = None,
+                            min_severity: int = 1, limit: int = 50):
+    """Événements autour d'un point sur une fenêtre de temps (minutes de jeu, ou secondes réelles)"""
+    window = seconds if seconds is not None else game_minutes * GAME_MINUTE_SECONDS
+    try:
+        return await event_store.nearby(x, y, radius, window, event_type, min_severity, limit)
+    except Exception as e:
+        logger.error(f"Erreur événements à proximité: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/events/rollups")
+async def get_event_rollups(hours: int = 24, dimension: str = "total"):
+    """Agrégats horaires des événements (dimension : total, type ou area)"""
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"Dimension inconnue: {dimension}")
+    try:
+        return await event_store.rollup_series(hours, dimension)
+    except Exception as e:
+        logger.error(f"Erreur agrégats événements: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ==================== MODE RÉPARTI ====================
+
+async def _broadcast_edges(changed: Dict[Any, int]):
+    if changed:
+        await shards.broadcast("edges", [[source, target, score] for (source, target), score in changed.items()])
+
+def require_peer(x_shard_forwarded: Optional[str] = Header(None), x_shard_secret: Optional[str] = Header(None)):
+    """Endpoints /api/internal : réservés aux autres shards (désactivés hors mode réparti)"""
+    if not shards.enabled:
+        raise HTTPException(status_code=404, detail="Mode réparti désactivé")
+    if not shards.is_peer(x_shard_forwarded, x_shard_secret):
+        raise HTTPException(status_code=403, detail="Appel entre shards non authentifié")
+
+@api_router.post("/internal/sync", dependencies=[Depends(require_peer)])
+async def apply_shard_sync(message: Dict[str, Any]):
+    """Mise à jour d'état en mémoire diffusée par un autre shard (événement, relations, suppression)"""
+    kind, payload = message["kind"], message["payload"]
+    if kind == "event":
+        event_store.recent_index.add(GameEvent(**payload))
+        live.publish_event(payload)
+    elif kind == "edges":
+        npc_manager.relationships.apply(EdgeUpdate(source, target, score=score) for source, target, score in payload)
+    elif kind == "remove_npc":
+        await npc_manager.relationships.remove_node(payload)
+    else:
+        raise HTTPException(status_code=400, detail=f"Message inconnu: {kind}")
+    shards.counters["received"] += 1
+    return {"applied": kind}
+
+# ==================== FLUX EN DIRECT ====================
+
+@api_router.get("/stream")
+async def live_stream(topics: Optional[str] = None, area: Optional[str] = None,
+                      types: Optional[str] = None):
+    """Flux Server-Sent Events : états des PNJ, événements, décisions et statistiques.
+    
+    Filtres optionnels : topics (npcs,events,decisions,stats), area (nom de
+    zone, sous-chaîne) et types (types de PNJ, séparés par des virgules).
+    """
+    wanted = set(topics.split(",")) if topics else set(TOPICS)
+    unknown = wanted - set(TOPICS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Sujets inconnus: {', '.join(sorted(unknown))}")
+    subscriber = live.subscribe(wanted, area, set(types.split(",")) if types else None)
+    return StreamingResponse(
+        live.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ==================== STATISTIQUES ====================
 
 @api_router.get("/stats")
@@ -264,7 +767,7 @@ async def get_system_stats():
     """Statistiques du système"""
     try:
         total_npcs = await db.npcs.count_documents({})
-        total_events = await db.events.count_documents({})
+        total_events = await event_store.total()
         
         # Compter par type de PNJ
         npc_types = {}
@@ -272,15 +775,27 @@ async def get_system_stats():
             count = await db.npcs.count_documents({"npc_type": npc_type.value})
             npc_types[npc_type.value] = count
         
-        # Événements récents (dernières 24h)
-        yesterday = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        recent_events = await db.events.count_documents({"timestamp": {"$gte": yesterday}})
+        # Événements récents (dernières 24h), lus dans les agrégats horaires
+        events_24h = await event_store.summary(24)
         
         return {
             "total_npcs": total_npcs,
             "npc_types": npc_types,
             "total_events": total_events,
-            "recent_events_24h": recent_events,
+            "recent_events_24h": events_24h["total"],
+            "events_24h": events_24h,
+            "decision_dedup": npc_manager.decision_flight.stats(),
+            "decision_timings": npc_manager.decision_timings.stats(),
+            "crowd": npc_manager.crowd_stats,
+            "concurrency": npc_manager.write_stats_summary(),
+            "shards": shards.stats(),
+            "live": live.stats(),
+            "tracing": trace_buffer.stats(),
+            "admission": {"decision": decision_admission.stats(), "bulk": bulk_admission.stats()},
+            "snapshot": snapshot.stats() if snapshot else None,
+            "relationships": npc_manager.relationships.stats(),
+            "archived_memories": await npc_manager.memory_archive.count(),
+            "llm": ai_engine.stats(),
             "system_status": "operational",
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -288,6 +803,99 @@ async def get_system_stats():
         logger.error(f"Erreur statistiques: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==================== ADMINISTRATION ====================
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# Durée maximale d'un profil (le thread d'échantillonnage prend le GIL à chaque relevé)
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', 30))
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Endpoints d'administration : désactivés sans ADMIN_TOKEN, jeton exigé dans l'en-tête X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Administration désactivée (ADMIN_TOKEN non défini)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+
+@api_router.get("/admin/traces", dependencies=[Depends(require_admin)])
+async def get_traces(route: Optional[str] = None, min_ms: float = 0.0, limit: int = 50):
+    """Traces conservées (durée par étape), les plus récentes d'abord ; `route` : modèle de chemin"""
+    return {"buffer": trace_buffer.stats(), "traces": trace_buffer.query(route, min_ms, max(1, min(limit, 1000)))}
+
+@api_router.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_process(seconds: float = 5.0, interval_ms: float = 5.0, top: int = 25):
+    """Profil par échantillonnage du processus pendant `seconds` : piles et fonctions les plus chaudes"""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Durée entre 0 et {PROFILE_MAX_SECONDS:.0f} secondes")
+    profiler: SamplingProfiler = app.state.profiler
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="Un profil est déjà en cours")
+    interval = min(max(interval_ms, 1.0), 100.0) / 1000
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, profiler.profile, seconds, interval, max(1, min(top, 200))
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+# ==================== MÉTRIQUES ====================
+
+metrics_registry = MetricsRegistry()
+metrics_registry.histogram(http_latency)
+metrics_registry.histogram(mongo_metrics.latency)
+metrics_registry.histogram(ai_engine.call_latency)
+
+@metrics_registry.collector
+def collect_component_metrics() -> List[str]:
+    """Compteurs déjà tenus par les composants, lus à chaque collecte (rien de plus sur le chemin chaud)"""
+    governor = ai_engine.governor
+    tiers = ai_engine.router.stats()
+    dedup = npc_manager.decision_flight
+    bank = ai_engine.dialogue_bank
+    admissions = {"decision": decision_admission, "bulk": bulk_admission}
+    return [
+        *family("gta5_llm_decisions_total", "counter", "Décisions demandées au moteur IA", [({}, ai_engine.decisions)]),
+        *counters("gta5_llm_fallbacks_total", "Décisions de secours par raison (parse_error : réponse LLM illisible)",
+                  "reason", ai_engine.fallbacks),
+        *family("gta5_llm_fallback_ratio", "gauge", "Part des décisions servies par la décision de secours",
+                [({}, ratio(sum(ai_engine.fallbacks.values()), ai_engine.decisions))]),
+        *counters("gta5_llm_local_decisions_total", "Décisions locales sans LLM par raison (routeur, budget)",
+                  "reason", governor.local_decisions),
+        *family("gta5_llm_calls_total", "counter", "Appels LLM réussis par niveau de modèle",
+                (({"tier": name}, tier["llm_calls"]) for name, tier in tiers.items())),
+        *family("gta5_llm_tokens_total", "counter", "Tokens consommés",
+                [({"kind": "prompt"}, governor.prompt_tokens), ({"kind": "completion"}, governor.completion_tokens)]),
+        *family("gta5_llm_breaker_state", "gauge", "État du disjoncteur LLM (1 pour l'état courant)",
+                (({"state": state}, int(state == ai_engine.breaker.state))
+                 for state in (ai_engine.breaker.CLOSED, ai_engine.breaker.OPEN, ai_engine.breaker.HALF_OPEN))),
+        *family("gta5_cache_requests_total", "counter", "Consultations des caches",
+                [({"cache": "decision_dedup"}, dedup.calls), ({"cache": "dialogue_bank"}, bank.lookups)]),
+        *family("gta5_cache_hits_total", "counter", "Consultations servies par le cache",
+                [({"cache": "decision_dedup"}, dedup.coalesced + dedup.idempotent_hits),
+                 ({"cache": "dialogue_bank"}, bank.hits)]),
+        *family("gta5_cache_hit_ratio", "gauge", "Taux de succès des caches",
+                [({"cache": "decision_dedup"}, ratio(dedup.coalesced + dedup.idempotent_hits, dedup.calls)),
+                 ({"cache": "dialogue_bank"}, ratio(bank.hits, bank.lookups))]),
+        *family("gta5_active_npcs", "gauge",
+                f"PNJ ayant pris une décision dans les {active_npcs.window_seconds:.0f} dernières secondes",
+                (({"npc_type": npc_type}, count) for npc_type, count in sorted(active_npcs.by_type().items()))),
+        *family("gta5_admission_in_flight", "gauge", "Requêtes de décision en cours de traitement",
+                (({"endpoint": name}, admission.in_flight) for name, admission in admissions.items())),
+        *family("gta5_admission_queue_depth", "gauge", "Requêtes de décision en attente d'une place",
+                (({"endpoint": name}, admission.queue_depth) for name, admission in admissions.items())),
+        *family("gta5_admission_admitted_total", "counter", "Requêtes de décision acceptées",
+                (({"endpoint": name}, admission.counters["admitted"]) for name, admission in admissions.items())),
+        *family("gta5_admission_shed_total", "counter", "Requêtes de décision délestées par raison",
+                (({"endpoint": name, "reason": reason}, count)
+                 for name, admission in admissions.items() for reason, count in admission.counters["shed"].items())),
+        *family("gta5_admission_degraded_total", "counter", "Requêtes délestées servies par la décision de secours",
+                (({"endpoint": name}, admission.counters["degraded"]) for name, admission in admissions.items())),
+    ]
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métriques au format texte Prometheus (hors /api : disponible dès le démarrage, avant MongoDB)"""
+    return Response(metrics_registry.render(), media_type=CONTENT_TYPE)
+
 # ==================== UTILITAIRES ====================
 
 @api_router.post("/npcs/create-sample")
@@ -317,10 +925,8 @@ async def create_sample_npcs():
             )
         ]
         
-        created_npcs = []
-        for npc_data in sample_npcs:
-            npc = await npc_manager.create_npc(npc_data)
-            created_npcs.append({"id": npc.id, "name": npc.name, "type": npc.npc_type})
+        npcs = await npc_manager.create_npcs(sample_npcs)
+        created_npcs = [{"id": npc.id, "name": npc.name, "type": npc.npc_type} for npc in npcs]
         
         return {
             "message": f"{len(created_npcs)} PNJ d'exemple créés",
@@ -333,17 +939,60 @@ async def create_sample_npcs():
 # Inclure le router dans l'app
 app.include_router(api_router)
 
-# Event handlers
-@app.on_event("startup")
-async def startup_event():
-    logger.info("🚀 Backend IA GTA 5 démarré")
-    logger.info(f"Base de données: {db_name}")
+# Initialisation (lancée par lifespan)
+async def initialize_backend():
+    """Initialise en arrière-plan, en réessayant tant que MongoDB est injoignable"""
+    started = time.perf_counter()
+    delay = 1.0
+    while True:
+        startup_state["attempts"] += 1
+        try:
+            await _initialize()
+            break
+        except Exception as e:
+            startup_state["error"] = str(e)
+            logger.error(f"Initialisation impossible ({e}), nouvel essai dans {delay:.0f} s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    startup_state.update(ready=True, error=None, ready_in_ms=round((time.perf_counter() - started) * 1000, 1))
     logger.info("Système IA prêt pour les PNJ")
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    logger.info("🛑 Arrêt du backend IA GTA 5")
-    client.close()
+async def _initialize():
+    removed = await npc_manager.ensure_indexes()
+    if removed:
+        logger.warning(f"{removed} PNJ en double supprimés avant la création de l'index unique sur l'id")
+    await event_store.ensure_indexes()
+    await npc_manager.memory_archive.ensure_indexes()
+    await npc_manager.change_feed.ensure_indexes(db.npcs)
+    
+    restored = snapshot.restore() if snapshot else None
+    if restored and restored["edges"] != await db.relationships.estimated_document_count():
+        logger.info("Snapshot désynchronisé du graphe en base, chargement depuis MongoDB")
+        restored = None
+    if restored:
+        # Les migrations ont déjà tourné avant l'écriture du snapshot
+        logger.info(
+            f"Snapshot génération {restored['generation']}: {restored['edges']} arêtes, "
+            f"{restored['events']} événements récents, {restored['replayed']} modifications rejouées"
+        )
+    else:
+        event_store.recent_index.restore([])
+        warmed = await event_store.warm()
+        logger.info(f"{warmed} événements récents chargés en mémoire")
+        edges = await npc_manager.relationships.load()
+        migrated = await npc_manager.relationships.migrate_embedded(db.npcs)
+        logger.info(f"Graphe des relations: {edges} arêtes chargées, {migrated} migrées depuis les documents PNJ")
+        archived = await npc_manager.memory_archive.migrate_embedded(db.npcs)
+        if archived:
+            logger.info(f"{archived} souvenirs long terme déplacés vers l'archive")
+    
+    if snapshot:
+        if not restored:
+            snapshot.write()
+        snapshot.attach()
+        app.state.snapshot_task = asyncio.ensure_future(
+            snapshot.run(float(os.environ.get('SNAPSHOT_INTERVAL_SECONDS', 300)))
+        )
 
 if __name__ == "__main__":
     import uvicorn
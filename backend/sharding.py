@@ -0,0 +1,226 @@
+"""Exécution répartie : chaque PNJ appartient à un processus (shard) du serveur.
+
+Les ids de PNJ sont répartis par hachage cohérent entre les shards ; une
+requête qui vise un PNJ arrive sur n'importe quel shard et est transmise à
+son propriétaire, qui est le seul à exécuter ses décisions (déduplication,
+budget, état en mémoire cohérents). Les états en mémoire partagés par tous
+les shards (événements récents, graphe des relations) sont tenus à jour par
+diffusion aux pairs.
+
+Lancement de N shards sur des ports consécutifs :
+
+    python -m backend.sharding --shards 4 --port 8001
+"""
+import argparse
+import asyncio
+import bisect
+import hashlib
+import hmac
+import logging
+import os
+import re
+import secrets
+import signal
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+# En-tête posé sur les requêtes transmises entre shards (pas de seconde transmission)
+FORWARDED_HEADER = "x-shard-forwarded"
+# Secret partagé par les shards (SHARD_SECRET), exigé sur /api/internal
+SECRET_HEADER = "x-shard-secret"
+
+# Routes /api/npcs/<segment> qui ne désignent pas un PNJ
+NON_NPC_SEGMENTS = {"batch", "create-sample", "changes"}
+NPC_PATH = re.compile(r"^/api/npcs/([^/]+)")
+
+# En-têtes propres à une connexion, jamais recopiés
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host", "content-length"}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Anneau de hachage cohérent : ajouter un shard ne déplace qu'environ 1/N des PNJ"""
+
+    def __init__(self, shards: int, vnodes: int = 128):
+        self.shards = shards
+        points = sorted((_hash(f"shard-{shard}#{v}"), shard) for shard in range(shards) for v in range(vnodes))
+        self._keys = [key for key, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def owner(self, npc_id: str) -> int:
+        if self.shards <= 1:
+            return 0
+        index = bisect.bisect(self._keys, _hash(npc_id)) % len(self._keys)
+        return self._owners[index]
+
+
+def npc_id_from_path(path: str) -> Optional[str]:
+    """Id du PNJ visé par une route /api/npcs/{id}/..., sinon None"""
+    match = NPC_PATH.match(path)
+    if not match or match.group(1) in NON_NPC_SEGMENTS:
+        return None
+    return match.group(1)
+
+
+class ShardCoordinator:
+    """Appartenance des PNJ, transmission au shard propriétaire et diffusion aux pairs.
+
+    Sans `SHARD_URLS` (un seul processus), tous les PNJ sont locaux et rien
+    n'est transmis.
+    """
+
+    def __init__(self, shard_id: int = 0, urls: Optional[List[str]] = None, timeout: float = 30.0,
+                 secret: Optional[str] = None):
+        self.shard_id = shard_id
+        self.urls = [url.rstrip("/") for url in (urls or [])]
+        self.secret = secret
+        self.ring = HashRing(max(1, len(self.urls)))
+        self.timeout = timeout
+        self._http: Optional[httpx.AsyncClient] = None
+        self.counters = {"forwarded": 0, "forward_errors": 0, "broadcasts": 0, "broadcast_errors": 0, "received": 0}
+
+    @classmethod
+    def from_env(cls) -> "ShardCoordinator":
+        urls = [url for url in os.environ.get("SHARD_URLS", "").split(",") if url.strip()]
+        return cls(
+            shard_id=int(os.environ.get("SHARD_ID", 0)),
+            urls=urls,
+            timeout=float(os.environ.get("SHARD_TIMEOUT_SECONDS", 30.0)),
+            secret=os.environ.get("SHARD_SECRET") or None
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.urls) > 1
+
+    @property
+    def peers(self) -> List[int]:
+        return [shard for shard in range(len(self.urls)) if shard != self.shard_id]
+
+    def owner(self, npc_id: str) -> int:
+        return self.ring.owner(npc_id)
+
+    def owns(self, npc_id: str) -> bool:
+        return not self.enabled or self.owner(npc_id) == self.shard_id
+
+    def is_peer(self, forwarded: Optional[str], secret: Optional[str]) -> bool:
+        """L'appel vient d'un autre shard : mode réparti, en-tête de transmission et secret partagé"""
+        if not self.enabled or not self.secret or forwarded is None or secret is None:
+            return False
+        return hmac.compare_digest(secret.encode(), self.secret.encode())
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            headers = {FORWARDED_HEADER: str(self.shard_id)}
+            if self.secret:
+                headers[SECRET_HEADER] = self.secret
+            self._http = httpx.AsyncClient(timeout=self.timeout, headers=headers)
+        return self._http
+
+    async def forward(self, request: Request, shard: int):
+        """Transmet la requête telle quelle au shard `shard` et relaie sa réponse (flux compris)"""
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS | {SECRET_HEADER}}
+        headers[FORWARDED_HEADER] = str(self.shard_id)
+        client = self._client()
+        upstream = client.build_request(
+            request.method, self.urls[shard] + request.url.path,
+            params=request.query_params, headers=headers, content=await request.body()
+        )
+        try:
+            response = await client.send(upstream, stream=True)
+        except httpx.HTTPError as e:
+            self.counters["forward_errors"] += 1
+            logger.error(f"Shard {shard} injoignable: {e}")
+            return JSONResponse({"detail": f"Shard {shard} indisponible"}, status_code=503)
+        self.counters["forwarded"] += 1
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS},
+            background=BackgroundTask(response.aclose)
+        )
+
+    async def call(self, shard: int, method: str, path: str, **kwargs) -> Any:
+        """Appel direct d'un pair (requêtes réparties), réponse JSON"""
+        response = await self._client().request(method, self.urls[shard] + path, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def broadcast(self, kind: str, payload: Any):
+        """Diffuse une mise à jour d'état en mémoire à tous les pairs (POST /api/internal/sync)"""
+        if not self.enabled:
+            return
+        self.counters["broadcasts"] += 1
+        body = {"kind": kind, "payload": payload, "origin": self.shard_id}
+        results = await asyncio.gather(
+            *[self._client().post(self.urls[peer] + "/api/internal/sync", json=body) for peer in self.peers],
+            return_exceptions=True
+        )
+        for peer, result in zip(self.peers, results):
+            if isinstance(result, Exception) or result.status_code >= 400:
+                self.counters["broadcast_errors"] += 1
+                logger.error(f"Diffusion {kind} vers le shard {peer} échouée: {result}")
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"shard_id": self.shard_id, "shards": max(1, len(self.urls)), **self.counters}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    urls = [f"http://{args.host}:{args.port + shard}" for shard in range(args.shards)]
+    # Le budget global de tokens est partagé entre les shards
+    tokens_per_minute = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 200000)) // args.shards
+    # Secret des appels entre shards : tiré au lancement s'il n'est pas fourni
+    secret = os.environ.get("SHARD_SECRET") or secrets.token_hex(32)
+    processes = []
+    for shard in range(args.shards):
+        env = {
+            **os.environ,
+            "SHARD_ID": str(shard),
+            "SHARD_URLS": ",".join(urls),
+            "SHARD_SECRET": secret,
+            "LLM_TOKENS_PER_MINUTE": str(tokens_per_minute),
+        }
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.server:app", "--host", args.host, "--port", str(args.port + shard)],
+            env=env
+        ))
+    print(f"{args.shards} shards : {', '.join(urls)}")
+
+    def stop(*_):
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        stop()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def context_hash(context: Dict[str, Any]) -> str:
+    """Empreinte stable d'un contexte de décision (ordre des clés ignoré)"""
+    payload = json.dumps(context, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class LeaderCancelled(RuntimeError):
+    """Le calcul partagé s'est arrêté sans issue (appelant meneur annulé ou client parti)"""
+
+
+class SingleFlight:
+    """Coalesce les calculs concurrents pour une même clé (un PNJ).
+
+    - Un seul calcul en vol par clé : les appels concurrents attendent et
+      partagent le même résultat.
+    - Une fenêtre d'idempotence courte : un appel identique (même clé et même
+      empreinte de contexte) qui arrive juste après réutilise le résultat.
+    - Si le meneur est annulé, le premier appelant en attente reprend le
+      calcul (les autres l'attendent) au lieu de recevoir l'annulation.
+    """
+
+    def __init__(self, idempotency_window: float = 2.0, max_cached: int = 10000):
+        self.idempotency_window = idempotency_window
+        self.max_cached = max_cached
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._recent: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+
+        # Compteurs exposés via stats()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.idempotent_hits = 0
+        self.takeovers = 0
+
+    async def run(self, key: str, fingerprint: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Exécute func une seule fois pour les appels concurrents sur key"""
+        found, result = await self.join(key, fingerprint)
+        if found:
+            return result
+
+        future = self.lead(key)
+        try:
+            result = await func()
+        except BaseException as e:
+            self.finish(key, fingerprint, future, error=e)
+            raise
+        self.finish(key, fingerprint, future, result=result)
+        return result
+
+    async def join(self, key: str, fingerprint: str) -> Tuple[bool, Any]:
+        """Partage un résultat récent ou en vol : (True, résultat), sinon (False, None)"""
+        self.calls += 1
+
+        cached = self._get_recent(key, fingerprint)
+        if cached is not None:
+            self.idempotent_hits += 1
+            return True, cached
+
+        future = self._in_flight.get(key)
+        while future is not None:
+            try:
+                # shield: l'annulation d'un appelant ne doit pas annuler le calcul partagé
+                result = await asyncio.shield(future)
+            except LeaderCancelled:
+                # Le premier réveillé ne trouve plus de calcul en vol et le reprend ; les suivants le rejoignent
+                future = self._in_flight.get(key)
+                if future is None:
+                    self.takeovers += 1
+                continue
+            self.coalesced += 1
+            return True, result
+
+        return False, None
+
+    def lead(self, key: str) -> asyncio.Future:
+        """Déclare un calcul en vol pour key ; l'appelant doit ensuite appeler finish()"""
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.executions += 1
+        return future
+
+    def finish(self, key: str, fingerprint: str, future: asyncio.Future, result: Any = None,
+               error: Optional[BaseException] = None):
+        """Publie le résultat (ou l'erreur) du calcul en vol aux appelants en attente"""
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if future.done():
+            return
+        if error is not None and not isinstance(error, Exception):
+            # Annulation ou GeneratorExit du meneur : propre à lui, pas aux appelants en attente
+            error = LeaderCancelled(f"Calcul interrompu pour {key}")
+        if error is not None:
+            future.set_exception(error)
+            # Évite le warning "exception never retrieved" sans attente
+            future.exception()
+        else:
+            future.set_result(result)
+            self._remember(key, fingerprint, result)
+
+    def _get_recent(self, key: str, fingerprint: str) -> Optional[Any]:
+        entry = self._recent.get((key, fingerprint))
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.idempotency_window:
+            del self._recent[(key, fingerprint)]
+            return None
+        return result
+
+    def _remember(self, key: str, fingerprint: str, result: Any):
+        if self.idempotency_window <= 0:
+            return
+        if len(self._recent) >= self.max_cached:
+            self._evict_expired()
+            if len(self._recent) >= self.max_cached:
+                # Toujours plein : on retire l'entrée la plus ancienne
+                self._recent.pop(next(iter(self._recent)))
+        self._recent[(key, fingerprint)] = (time.monotonic(), result)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [k for k, (t, _) in self._recent.items() if now - t > self.idempotency_window]
+        for k in expired:
+            del self._recent[k]
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs de déduplication"""
+        deduplicated = self.coalesced + self.idempotent_hits
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced_in_flight": self.coalesced,
+            "idempotent_hits": self.idempotent_hits,
+            "leader_takeovers": self.takeovers,
+            "deduplicated": deduplicated,
+            "dedup_ratio": round(deduplicated / self.calls, 4) if self.calls else 0.0,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,190 @@
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+
+class StageTimer:
+    """Chronomètre les étapes successives d'un traitement (en millisecondes)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            # Même étape dans la trace de la requête HTTP (Server-Timing)
+            record_span(name, elapsed)
+
+    def finish(self) -> Dict[str, float]:
+        """Retourne les durées par étape, plus le total"""
+        timings = {name: round(ms, 3) for name, ms in self.stages.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 3)
+        return timings
+
+
+class StageStats:
+    """Agrège les durées par étape sur l'ensemble des traitements"""
+
+    def __init__(self):
+        self.count = 0
+        self._totals: Dict[str, float] = {}
+        self._max: Dict[str, float] = {}
+
+    def record(self, timings: Dict[str, float]):
+        self.count += 1
+        for name, ms in timings.items():
+            self._totals[name] = self._totals.get(name, 0.0) + ms
+            self._max[name] = max(self._max.get(name, 0.0), ms)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Moyenne, maximum et part du temps total par étape"""
+        if not self.count:
+            return {}
+        total = self._totals.get("total") or 1.0
+        return {
+            name: {
+                "avg_ms": round(value / self.count, 3),
+                "max_ms": round(self._max[name], 3),
+                "share": round(value / total, 4),
+            }
+            for name, value in self._totals.items()
+        }
+
+
+# ==================== TRACES PAR REQUÊTE ====================
+
+# Trace de la requête HTTP en cours (posée par RequestTracing) ; None hors requête
+CURRENT_TRACE: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+class Trace:
+    """Durées cumulées par étape d'une requête : {nom: [millisecondes, nombre d'occurrences]}"""
+    __slots__ = ("started", "spans")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}
+
+    def add(self, name: str, ms: float):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [ms, 1]
+        else:
+            entry[0] += ms
+            entry[1] += 1
+
+    def server_timing(self, total_ms: float) -> str:
+        """Valeur de l'en-tête Server-Timing (étapes terminées avant l'envoi des en-têtes)"""
+        parts = []
+        for name, (ms, count) in self.spans.items():
+            parts.append(f"{name};dur={ms:.2f}" + (f';desc="x{count}"' if count > 1 else ""))
+        parts.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(parts)
+
+
+def record_span(name: str, ms: float):
+    """Ajoute une durée à la trace courante (appelable depuis les threads de motor, contexte recopié)"""
+    trace = CURRENT_TRACE.get()
+    if trace is not None:
+        trace.add(name, ms)
+
+
+@contextmanager
+def span(name: str):
+    """Chronomètre un bloc dans la trace de la requête courante (sans effet hors requête)"""
+    trace = CURRENT_TRACE.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, (time.perf_counter() - started) * 1000)
+
+
+class TraceBuffer:
+    """Dernières traces conservées : toutes les requêtes lentes, un échantillon des autres"""
+
+    def __init__(self, size: int = 1000, sample_rate: float = 0.05, slow_ms: float = 1000.0):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._traces: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self.seen = 0
+        self.kept = 0
+
+    def offer(self, entry: Dict[str, Any]):
+        self.seen += 1
+        if entry["duration_ms"] >= self.slow_ms or random.random() < self.sample_rate:
+            self.kept += 1
+            self._traces.append(entry)
+
+    def query(self, route: Optional[str] = None, min_ms: float = 0.0, limit: int = 50) -> List[Dict[str, Any]]:
+        """Traces les plus récentes d'abord, filtrées par route et durée minimale"""
+        result = []
+        for entry in reversed(self._traces):
+            if (route is None or entry["route"] == route) and entry["duration_ms"] >= min_ms:
+                result.append(entry)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {"buffered": len(self._traces), "seen": self.seen, "kept": self.kept,
+                "sample_rate": self.sample_rate, "slow_ms": self.slow_ms}
+
+
+class RequestTracing:
+    """Intercepteur ASGI : une trace par requête /api, en-tête Server-Timing et conservation échantillonnée"""
+
+    def __init__(self, app, buffer: TraceBuffer, server_timing: bool = True):
+        self.app = app
+        self.buffer = buffer
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            return await self.app(scope, receive, send)
+        trace = Trace()
+        token = CURRENT_TRACE.set(trace)
+        response = {"status": 500, "stream": False}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                response["stream"] = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream") for name, value in headers
+                )
+                if self.server_timing:
+                    total_ms = (time.perf_counter() - trace.started) * 1000
+                    headers.append((b"server-timing", trace.server_timing(total_ms).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            CURRENT_TRACE.reset(token)
+            # Flux de longue durée (SSE) et administration : pas conservés
+            if not response["stream"] and not scope["path"].startswith("/api/admin/"):
+                route = scope.get("route")
+                self.buffer.offer({
+                    "method": scope["method"],
+                    "route": getattr(route, "path_format", None) or "other",
+                    "path": scope["path"],
+                    "status": response["status"],
+                    "at": datetime.utcnow().isoformat(),
+                    "duration_ms": round((time.perf_counter() - trace.started) * 1000, 3),
+                    "spans": {name: {"ms": round(ms, 3), "count": count} for name, (ms, count) in trace.spans.items()},
+                })
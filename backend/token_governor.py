@@ -0,0 +1,175 @@
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation grossière (~4 caractères par token), suffisante pour le budget"""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Seau à jetons rechargé en continu (capacité = tokens par minute)"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.refill_per_second = tokens_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def remaining(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_consume(self, tokens: int) -> bool:
+        self._refill()
+        if tokens > self._tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+    def adjust(self, delta: float):
+        """Corrige le solde (delta > 0 rend des jetons, delta < 0 en retire)"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + delta)
+
+
+class BudgetLevel(NamedTuple):
+    min_ratio: float          # solde relatif minimal pour ce niveau
+    max_tokens: int           # budget de complétion par appel
+    min_interval: float       # secondes minimales entre deux décisions LLM d'un même PNJ
+    high_priority_only: bool  # PNJ peu prioritaires -> décision locale
+
+
+DEFAULT_LEVELS: List[BudgetLevel] = [
+    BudgetLevel(0.50, 500, 0.0, False),
+    BudgetLevel(0.25, 300, 10.0, False),
+    BudgetLevel(0.10, 200, 20.0, True),
+    BudgetLevel(0.00, 150, 30.0, True),
+]
+
+
+class DecisionPlan(NamedTuple):
+    use_llm: bool
+    max_tokens: int
+    level: int
+    reserved: int
+    reason: Optional[str] = None
+
+
+PRUNE_MIN_SIZE = 1024
+
+
+class TokenGovernor:
+    """Régule la consommation de tokens LLM (prompt + complétion) par minute.
+
+    Plus le solde baisse, plus le niveau monte : fréquence de décision par
+    PNJ réduite, max_tokens réduit, puis PNJ peu prioritaires en décision
+    locale. On dégrade progressivement au lieu d'échouer d'un coup.
+    """
+
+    def __init__(self, tokens_per_minute: int = 200000, levels: Optional[List[BudgetLevel]] = None):
+        self.bucket = TokenBucket(tokens_per_minute)
+        self.levels = levels or DEFAULT_LEVELS
+        # Dernière décision LLM par PNJ, purgée au-delà du plus long intervalle minimal
+        self._last_llm_decision: Dict[str, float] = {}
+        self._max_interval = max(level.min_interval for level in self.levels)
+        self._prune_at = PRUNE_MIN_SIZE
+
+        self.prompt_tokens = 0
+        self.hedges_refused = 0
+        self.completion_tokens = 0
+        self.local_decisions: Dict[str, int] = {}
+
+    def remaining_ratio(self) -> float:
+        return self.bucket.remaining() / self.bucket.capacity
+
+    def current_level(self) -> int:
+        ratio = self.remaining_ratio()
+        for index, level in enumerate(self.levels):
+            if ratio >= level.min_ratio:
+                return index
+        return len(self.levels) - 1
+
+    def plan(self, npc_id: str, prompt_tokens: int, high_priority: bool,
+             max_tokens: Optional[int] = None) -> DecisionPlan:
+        """Décide si ce PNJ peut appeler le LLM maintenant, et avec quel budget"""
+        index = self.current_level()
+        level = self.levels[index]
+        completion_budget = min(level.max_tokens, max_tokens) if max_tokens else level.max_tokens
+
+        if level.high_priority_only and not high_priority:
+            return self._local(index, "low_priority")
+
+        last = self._last_llm_decision.get(npc_id)
+        if last is not None and time.monotonic() - last < level.min_interval:
+            return self._local(index, "rate_limited")
+
+        reserved = prompt_tokens + completion_budget
+        if not self.bucket.try_consume(reserved):
+            return self._local(index, "budget_exhausted")
+
+        now = time.monotonic()
+        self._last_llm_decision[npc_id] = now
+        if len(self._last_llm_decision) >= self._prune_at:
+            self._prune(now)
+        return DecisionPlan(True, completion_budget, index, reserved)
+
+    def _prune(self, now: float):
+        """Oublie les PNJ dont la dernière décision ne limite plus aucun niveau (coût amorti constant)"""
+        horizon = now - self._max_interval
+        self._last_llm_decision = {
+            npc_id: last for npc_id, last in self._last_llm_decision.items() if last > horizon
+        }
+        self._prune_at = max(PRUNE_MIN_SIZE, 2 * len(self._last_llm_decision))
+
+    def hedge(self, plan: DecisionPlan) -> Optional[DecisionPlan]:
+        """Réserve une requête doublée de `plan`, seulement tant que le budget reste au premier niveau"""
+        if self.current_level() != 0 or not self.bucket.try_consume(plan.reserved):
+            self.hedges_refused += 1
+            return None
+        return plan
+
+    def _local(self, level: int, reason: str) -> DecisionPlan:
+        self.local_decisions[reason] = self.local_decisions.get(reason, 0) + 1
+        return DecisionPlan(False, 0, level, 0, reason)
+
+    def commit(self, plan: DecisionPlan, prompt_tokens: int, completion_tokens: int):
+        """Remplace la réservation par la consommation réelle rapportée par le fournisseur"""
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.bucket.adjust(plan.reserved - (prompt_tokens + completion_tokens))
+
+    def release(self, plan: DecisionPlan):
+        """Rend la réservation d'un appel qui n'a rien consommé"""
+        self.bucket.adjust(plan.reserved)
+
+    def pacing(self, npc_id: Optional[str] = None) -> Dict:
+        """Informations de rythme renvoyées aux clients (le mod s'y cale)"""
+        index = self.current_level()
+        level = self.levels[index]
+        next_in = 0.0
+        last = self._last_llm_decision.get(npc_id) if npc_id else None
+        if last is not None:
+            next_in = max(0.0, level.min_interval - (time.monotonic() - last))
+        return {
+            "budget_remaining_ratio": round(self.remaining_ratio(), 4),
+            "level": index,
+            "min_decision_interval_s": level.min_interval,
+            "next_decision_in_s": round(next_in, 2),
+        }
+
+    def stats(self) -> Dict:
+        return {
+            **self.pacing(),
+            "tokens_per_minute": int(self.bucket.capacity),
+            "remaining_tokens": int(self.bucket.remaining()),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "local_decisions": dict(self.local_decisions),
+            "hedges_refused": self.hedges_refused,
+        }
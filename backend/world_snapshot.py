@@ -0,0 +1,268 @@
+import asyncio
+import gc
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .event_store import SpatialTimeIndex
+from .relationships import EdgeUpdate, RelationshipGraph
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GTAWLD01"
+# Signature, longueur des métadonnées JSON
+HEADER = struct.Struct("<8sI")
+ALIGNMENT = 8
+
+
+class WorldSnapshot:
+    """Snapshot binaire de l'état tenu en mémoire et journal des modifications.
+
+    L'état reconstruit au démarrage est le graphe des relations et l'index
+    des événements récents. Le snapshot stocke les ids de PNJ une seule
+    fois (table de noms) et les arêtes en tableaux d'entiers (codes source
+    et cible, score) ; il est relu par mmap sans copie. Chaque modification
+    en mémoire faite après le snapshot est ajoutée au journal
+    (`<fichier>.log`, une ligne JSON par modification, précédée de la
+    génération du snapshot qu'elle complète) et rejouée au démarrage.
+
+    Le snapshot n'est utilisé que s'il vient de la même base et si le
+    journal a été écrit il y a moins de `max_age_seconds` ; sinon on repart
+    de MongoDB.
+    """
+
+    def __init__(self, path, graph: RelationshipGraph, event_index: SpatialTimeIndex, db_name: str,
+                 max_age_seconds: float = 3600.0):
+        self.path = Path(path)
+        self.log_path = self.path.with_name(self.path.name + ".log")
+        self.graph = graph
+        self.event_index = event_index
+        self.db_name = db_name
+        self.max_age_seconds = max_age_seconds
+        self.generation = 0
+        self.pending = 0
+        self._log = None
+        self.counters = {"writes": 0, "last_write_ms": 0.0, "size_bytes": 0, "restored": False, "replayed": 0}
+
+    def attach(self):
+        """Branche le journal sur les structures en mémoire (après restauration ou chargement)"""
+        self.graph.listener = self.record
+        self.event_index.listener = self.record
+
+    def record(self, kind: str, payload: Any):
+        if self._log is None:
+            return
+        self._log.write(json.dumps([kind, payload], separators=(",", ":")) + "\n")
+        self._log.flush()
+        self.pending += 1
+
+    def write(self) -> Dict[str, Any]:
+        """Écrit un nouveau snapshot puis repart d'un journal vide.
+
+        Tout se fait sans rendre la main à la boucle : aucune modification ne
+        peut se glisser entre la lecture de l'état et la remise à zéro du journal.
+        """
+        started = time.perf_counter()
+        outgoing, incoming = self.graph.adjacency()
+        names = list(outgoing.keys() | incoming.keys())
+        codes = dict(zip(names, range(len(names))))
+        sources: List[int] = []
+        targets: List[int] = []
+        scores: List[int] = []
+        for source, neighbors in outgoing.items():
+            sources.extend([codes[source]] * len(neighbors))
+            targets.extend(map(codes.__getitem__, neighbors))
+            scores.extend(neighbors.values())
+
+        sections = [
+            ("sources", np.asarray(sources, dtype=np.int32).tobytes()),
+            ("targets", np.asarray(targets, dtype=np.int32).tobytes()),
+            ("scores", np.asarray(scores, dtype=np.int8).tobytes()),
+            ("names", "\n".join(names).encode("utf-8")),
+            ("events", json.dumps(self.event_index.entries(), separators=(",", ":")).encode("utf-8")),
+        ]
+        layout: Dict[str, Tuple[int, int]] = {}
+        offset = 0
+        for name, data in sections:
+            layout[name] = (offset, len(data))
+            offset += _padded(len(data))
+        generation = self.generation + 1
+        meta = json.dumps({
+            "generation": generation,
+            "db": self.db_name,
+            "created_at": time.time(),
+            "npcs": len(names),
+            "edges": len(scores),
+            "sections": layout,
+        }).encode("utf-8")
+        meta += b" " * (_padded(HEADER.size + len(meta)) - HEADER.size - len(meta))
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(meta)))
+            f.write(meta)
+            for _, data in sections:
+                f.write(data)
+                f.write(b"\0" * (_padded(len(data)) - len(data)))
+        os.replace(temporary, self.path)
+
+        # Journal remis à zéro : il ne complète plus que la nouvelle génération
+        self.generation = generation
+        self._open_log(truncate=True)
+        self.pending = 0
+
+        self.counters["writes"] += 1
+        self.counters["last_write_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self.counters["size_bytes"] = self.path.stat().st_size
+        return {"generation": generation, "npcs": len(names), "edges": len(scores)}
+
+    def restore(self) -> Optional[Dict[str, Any]]:
+        """Recharge le graphe et l'index depuis le snapshot et le journal ; None si inutilisable"""
+        if not self.path.exists():
+            return None
+        last_write = max(self.path.stat().st_mtime, self.log_path.stat().st_mtime if self.log_path.exists() else 0)
+        if time.time() - last_write > self.max_age_seconds:
+            logger.info("Snapshot trop ancien, chargement depuis MongoDB")
+            return None
+
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, meta_length = HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC:
+                logger.warning(f"Snapshot {self.path} illisible, ignoré")
+                return None
+            meta = json.loads(mapped[HEADER.size:HEADER.size + meta_length])
+            if meta["db"] != self.db_name:
+                return None
+            base = HEADER.size + meta_length
+
+            def section(name: str, dtype=None):
+                offset, length = meta["sections"][name]
+                if dtype is None:
+                    return mapped[base + offset:base + offset + length]
+                if not length:
+                    return np.zeros(0, dtype=dtype)
+                # Copie hors du mmap : il ne peut être fermé tant qu'un tableau y fait référence
+                return np.frombuffer(mapped, dtype=dtype, count=length // np.dtype(dtype).itemsize,
+                                     offset=base + offset).copy()
+
+            names = np.array(section("names").decode("utf-8").split("\n") if meta["npcs"] else [], dtype=object)
+            sources = section("sources", np.int32)
+            targets = section("targets", np.int32)
+            scores = section("scores", np.int8)
+            events = json.loads(section("events"))
+
+        with _gc_paused():
+            self.graph.restore_adjacency(
+                _grouped(names, sources, targets, scores),
+                _grouped(names, targets, sources, scores)
+            )
+        self.generation = meta["generation"]
+        replayed = self._replay(events)
+        self.event_index.restore(events)
+        self._open_log(truncate=False)
+
+        self.counters["restored"] = True
+        self.counters["replayed"] = replayed
+        return {"generation": self.generation, "npcs": meta["npcs"], "edges": self.graph.edge_count,
+                "events": len(self.event_index), "replayed": replayed}
+
+    def _replay(self, events: List[Any]) -> int:
+        """Rejoue le journal de la génération courante ; une dernière ligne incomplète est coupée"""
+        if not self.log_path.exists():
+            return 0
+        replayed = 0
+        valid_end = 0
+        with open(self.log_path, "rb") as f:
+            lines = f.read().split(b"\n")
+        for line in lines[:-1]:  # la dernière entrée n'est pas terminée par un saut de ligne
+            try:
+                kind, payload = json.loads(line)
+            except ValueError:
+                break
+            if kind == "base":
+                if payload != self.generation:
+                    # Journal d'une génération déjà incluse dans le snapshot
+                    break
+            elif kind == "edges":
+                self.graph.apply(EdgeUpdate(source, target, score=score) for source, target, score in payload)
+                replayed += 1
+            elif kind == "remove_npc":
+                self.graph.forget(payload)
+                replayed += 1
+            elif kind == "event":
+                events.append(payload)
+                replayed += 1
+            valid_end += len(line) + 1
+        if valid_end == 0:
+            self.log_path.unlink()
+        else:
+            os.truncate(self.log_path, valid_end)
+        return replayed
+
+    def _open_log(self, truncate: bool):
+        if self._log is not None:
+            self._log.close()
+        fresh = truncate or not self.log_path.exists()
+        self._log = open(self.log_path, "w" if truncate else "a", encoding="utf-8")
+        if fresh:
+            self._log.write(json.dumps(["base", self.generation]) + "\n")
+            self._log.flush()
+
+    async def run(self, interval_seconds: float):
+        """Écrit un snapshot tous les `interval_seconds` s'il y a eu des modifications"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            if self.pending:
+                try:
+                    self.write()
+                except OSError as e:
+                    logger.error(f"Écriture du snapshot échouée: {e}")
+
+    def close(self):
+        if self.pending:
+            self.write()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"generation": self.generation, "pending": self.pending, **self.counters}
+
+
+def _grouped(names: np.ndarray, keys: np.ndarray, others: np.ndarray, scores: np.ndarray) -> Dict[str, Dict[str, int]]:
+    """Listes d'adjacence {nom: {voisin: score}} regroupées par `keys` (tri numpy, dictionnaires construits en bloc)"""
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    neighbors = names[others[order]].tolist()
+    values = scores[order].tolist()
+    starts = np.flatnonzero(np.r_[True, np.diff(keys) != 0]) if len(keys) else np.zeros(0, dtype=np.int64)
+    ends = np.r_[starts[1:], len(keys)].tolist()
+    return {
+        name: dict(zip(neighbors[start:end], values[start:end]))
+        for name, start, end in zip(names[keys[starts]].tolist(), starts.tolist(), ends)
+    }
+
+
+@contextmanager
+def _gc_paused():
+    """Suspend le ramasse-miettes pendant la création en masse des dictionnaires d'adjacence"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _padded(length: int) -> int:
+    return (length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
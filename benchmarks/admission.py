@@ -0,0 +1,100 @@
+"""Surcharge des décisions : file sans limite contre contrôle d'admission.
+
+Usage (depuis la racine du dépôt, sans MongoDB ni LLM) :
+
+    python -m benchmarks.admission --rate 500 --duration 10 --capacity 32 --service-ms 100
+
+Des requêtes arrivent à `--rate` par seconde (Poisson) sur un service
+capable d'en traiter `--capacity` à la fois en `--service-ms` chacune,
+soit une capacité de capacity / service secondes. Sans contrôle, toutes
+les requêtes attendent leur tour et la latence grimpe tant que dure la
+surcharge ; avec AdmissionController, le surplus est refusé tout de suite
+(429/503 côté HTTP) et les requêtes acceptées gardent une latence bornée.
+Une réponse arrivée après `--deadline-ms` est comptée comme inutile (le
+mod a déjà abandonné la demande).
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from backend.admission import AdmissionController, Overloaded
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+async def run(args, admission) -> dict:
+    rng = random.Random(args.seed)
+    backend = asyncio.Semaphore(args.capacity)
+    served, shed = [], []
+
+    async def request():
+        started = time.perf_counter()
+        try:
+            slot = await admission.acquire() if admission else None
+        except Overloaded:
+            shed.append(time.perf_counter() - started)
+            return
+        try:
+            async with backend:
+                await asyncio.sleep(rng.expovariate(1000 / args.service_ms))
+        finally:
+            if slot:
+                slot.release()
+        served.append(time.perf_counter() - started)
+
+    tasks = []
+    started = time.perf_counter()
+    arrival = 0.0
+    while arrival < args.duration:
+        # Arrivées planifiées en temps absolu : le débit ne dépend pas de la précision de sleep()
+        arrival += rng.expovariate(args.rate)
+        delay = started + arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(request()))
+    await asyncio.gather(*tasks)
+    deadline = args.deadline_ms / 1000
+    return {
+        "sent": len(tasks),
+        "served": len(served),
+        "useful": sum(1 for latency in served if latency <= deadline),
+        "shed": len(shed),
+        "p50": statistics.median(served) * 1000 if served else 0.0,
+        "p99": percentile(served, 99) * 1000,
+        "shed_p99": percentile(shed, 99) * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=500.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--capacity", type=int, default=32)
+    parser.add_argument("--service-ms", type=float, default=100.0)
+    parser.add_argument("--max-in-flight", type=int, default=32)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--queue-timeout", type=float, default=0.5)
+    parser.add_argument("--deadline-ms", type=float, default=2000.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    capacity = args.capacity / (args.service_ms / 1000)
+    print(f"arrivées {args.rate:.0f}/s pour une capacité de {capacity:.0f}/s pendant {args.duration:.0f} s")
+    admission = AdmissionController("bench", args.max_in_flight, args.max_queue, args.queue_timeout)
+    for label, controller in (("file sans limite", None), ("admission", admission)):
+        result = await run(args, controller)
+        print(f"{label:<17} | servies {result['served']:>6}/{result['sent']:<6} "
+              f"(dans le délai {result['useful']:>6}) | p50 {result['p50']:8.1f} ms p99 {result['p99']:8.1f} ms | "
+              f"refusées {result['shed']:>6} (p99 {result['shed_p99']:6.1f} ms)")
+    print(f"compteurs : {admission.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Coût d'un rafraîchissement client : liste complète / flux de modifications.
+
+Usage (depuis la racine du dépôt, MongoDB local requis) :
+
+    python -m benchmarks.change_feed --npcs 1000 10000 --churn 0.01
+
+Pour chaque population, `--churn` (part des PNJ modifiés entre deux
+rafraîchissements) est appliqué, puis on compare GET /api/npcs (lecture de
+tous les PNJ + JSON) avec GET /api/npcs/changes depuis le curseur
+précédent : octets envoyés et temps serveur.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from backend.models import NPCMood, NPCUpdate
+from backend.npc_manager import NPCManager
+
+
+def payload_size(data) -> int:
+    return len(json.dumps(data, default=str).encode("utf-8"))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="gta5_ai_bench_changes")
+    parser.add_argument("--npcs", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--churn", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    client = AsyncIOMotorClient(args.mongo_url)
+    for count in args.npcs:
+        await client.drop_database(args.db)
+        manager = NPCManager(client[args.db], ai_engine=None)
+        manager.change_feed.settle = timedelta(0)  # curseur immédiatement à jour
+        await manager.change_feed.ensure_indexes(manager.npcs_collection)
+        await manager.populate(count, seed=args.seed)
+        ids = [doc["id"] async for doc in manager.npcs_collection.find({}, {"id": 1})]
+        cursor = (await manager.get_changes(None))["cursor"]
+
+        for npc_id in rng.sample(ids, max(1, int(count * args.churn))):
+            await manager.update_npc(npc_id, NPCUpdate(current_mood=rng.choice(list(NPCMood))))
+
+        started = time.perf_counter()
+        full = [npc.model_dump() for npc in await manager.get_all_npcs()]
+        full_size = payload_size(full)
+        full_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        delta = await manager.get_changes(cursor)
+        delta_size = payload_size(delta)
+        delta_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{count:>7} PNJ, {len(delta['changes'])} modifiés | liste : {full_size / 1024:9.1f} Ko {full_ms:8.1f} ms | "
+              f"flux : {delta_size / 1024:7.1f} Ko {delta_ms:6.1f} ms")
+
+    await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
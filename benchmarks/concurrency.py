@@ -0,0 +1,96 @@
+"""Mises à jour perdues et taux de conflit, écritures aveugles / conditionnelles.
+
+Usage (depuis la racine du dépôt, MongoDB local requis) :
+
+    python -m benchmarks.concurrency --npcs 50 --workers 64 --writes 2000
+
+`--workers` coroutines lisent un PNJ tiré au hasard, attendent un peu (le
+temps d'une décision) puis augmentent son stress de 1 ; d'autres ajoutent
+des mémoires en parallèle. "avant" : $set aveugle de la valeur lue + 1 ;
+"après" : NPCManager.update_versioned. Le stress final devrait valoir le
+nombre d'incréments : l'écart est le nombre de mises à jour perdues.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from backend.models import Location, Memory, NPCCreate, NPCType
+from backend.npc_manager import NPCManager, VersionConflict
+
+
+async def run(manager: NPCManager, ids: list, args, versioned: bool, rng: random.Random):
+    await manager.npcs_collection.update_many({}, {"$set": {"stress_level": 0}})
+    queue = asyncio.Queue()
+    for _ in range(args.writes):
+        queue.put_nowait(rng.choice(ids))
+    failed = 0
+
+    async def worker():
+        nonlocal failed
+        while not queue.empty():
+            npc_id = queue.get_nowait()
+            npc = await manager.get_npc(npc_id)
+            await asyncio.sleep(rng.uniform(0, args.think_ms / 1000))
+            if rng.random() < 0.3:
+                await manager.add_memory(npc_id, Memory(event_type="bench", description="témoin"))
+            if versioned:
+                try:
+                    await manager.update_versioned(
+                        npc_id, lambda current: {"$set": {"stress_level": min(100, current.stress_level + 1)}}, npc=npc
+                    )
+                except VersionConflict:
+                    failed += 1
+            else:
+                await manager.npcs_collection.update_one(
+                    {"id": npc_id}, {"$set": {"stress_level": min(100, npc.stress_level + 1)}}
+                )
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.workers)])
+    duration = time.perf_counter() - started
+
+    total = 0
+    async for npc_data in manager.npcs_collection.find({}, {"stress_level": 1}):
+        total += npc_data["stress_level"]
+    return args.writes - total - failed, failed, args.writes / duration
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="gta5_ai_bench_concurrency")
+    parser.add_argument("--npcs", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--think-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    client = AsyncIOMotorClient(args.mongo_url)
+    await client.drop_database(args.db)
+    manager = NPCManager(client[args.db], ai_engine=None)
+    npcs = await manager.create_npcs([
+        NPCCreate(name=f"Bench {i}", npc_type=NPCType.CIVILIAN, current_location=Location(x=i, y=0, z=30.0))
+        for i in range(args.npcs)
+    ])
+    ids = [npc.id for npc in npcs]
+
+    print(f"{args.npcs} PNJ, {args.workers} coroutines, {args.writes} incréments")
+    lost, _, rate = await run(manager, ids, args, versioned=False, rng=rng)
+    print(f"avant : {lost:5d} mises à jour perdues | {rate:8.0f} écritures/s")
+    lost, failed, rate = await run(manager, ids, args, versioned=True, rng=rng)
+    stats = manager.write_stats_summary()
+    print(f"après : {lost:5d} mises à jour perdues | {rate:8.0f} écritures/s | "
+          f"conflits {stats['conflict_rate']:.1%} | abandons {failed}")
+
+    await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""Appels LLM économisés par les décisions de foule, selon la taille des foules.
+
+Usage (depuis la racine du dépôt, sans MongoDB ni LLM) :
+
+    python -m benchmarks.crowd_decisions --npcs 2000 --sweeps 20
+
+Chaque balayage place des foules de PNJ similaires (même type, humeur,
+activité) au milieu d'une population dispersée, puis compte les appels LLM
+nécessaires avec et sans regroupement (cluster_npcs), ainsi que le temps de
+regroupement lui-même.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from backend.crowd import cluster_npcs
+from backend.models import NPC, NPCType, NPCMood, NPCPersonality, ActivityType, Location
+
+
+def make_npc(rng: random.Random, x: float, y: float, npc_type: NPCType = None,
+             mood: NPCMood = None, activity: ActivityType = None) -> NPC:
+    return NPC(
+        name="Bench",
+        npc_type=npc_type or rng.choice(list(NPCType)),
+        personality=NPCPersonality(),
+        current_location=Location(x=x, y=y, z=30.0),
+        current_mood=mood or rng.choice(list(NPCMood)),
+        current_activity=activity or rng.choice(list(ActivityType)),
+        stress_level=rng.randint(0, 100)
+    )
+
+
+def population(rng: random.Random, count: int, crowd_size: int) -> list:
+    """Population dispersée dont ~50 % des PNJ appartiennent à des foules de crowd_size"""
+    npcs = []
+    crowded = count // 2 if crowd_size > 1 else 0
+    while len(npcs) < crowded:
+        cx, cy = rng.uniform(-3000, 3000), rng.uniform(-3000, 3000)
+        npc_type = rng.choice(list(NPCType))
+        mood = rng.choice(list(NPCMood))
+        activity = rng.choice(list(ActivityType))
+        stress = rng.randint(0, 3) * 25 + 10
+        for _ in range(min(crowd_size, crowded - len(npcs))):
+            npc = make_npc(rng, cx + rng.uniform(-5, 5), cy + rng.uniform(-5, 5), npc_type, mood, activity)
+            npc.stress_level = stress
+            npcs.append(npc)
+    while len(npcs) < count:
+        npcs.append(make_npc(rng, rng.uniform(-3000, 3000), rng.uniform(-3000, 3000)))
+    return npcs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--npcs", type=int, default=2000)
+    parser.add_argument("--sweeps", type=int, default=20)
+    parser.add_argument("--radius", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{args.npcs} PNJ par balayage, {args.sweeps} balayages, rayon {args.radius} m")
+    for crowd_size in (1, 5, 10, 25, 50):
+        calls, durations = [], []
+        for _ in range(args.sweeps):
+            npcs = population(rng, args.npcs, crowd_size)
+            started = time.perf_counter()
+            clusters = cluster_npcs(npcs, args.radius)
+            durations.append((time.perf_counter() - started) * 1000)
+            calls.append(len(clusters))
+        llm_calls = statistics.mean(calls)
+        print(f"foules de {crowd_size:>2}: appels LLM {llm_calls:8.1f} / {args.npcs} | "
+              f"économisés {1 - llm_calls / args.npcs:6.1%} | regroupement {statistics.mean(durations):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Part de la base de données dans la latence d'une décision, avant / après.
+
+Usage (depuis la racine du dépôt, MongoDB local requis) :
+
+    python -m benchmarks.decision_db --npcs 2000 --decisions 200
+
+Le chemin "avant" rejoue la séquence historique (get_npc, get_nearby_npcs,
+add_memory en lecture + $set complet, update_npc + relecture) ; le chemin
+"après" est NPCManager.process_npc_decision. Le LLM est remplacé par un stub
+à latence fixe pour isoler le coût MongoDB.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from backend.models import (
+    NPC, NPCCreate, NPCUpdate, NPCType, Location, Memory, DecisionRequest, DecisionResponse
+)
+from backend.npc_manager import NPCManager
+
+
+class StubAIEngine:
+    """Décision constante après une latence simulée"""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    async def make_decision(self, npc: NPC, request: DecisionRequest, memories=None) -> DecisionResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return DecisionResponse(
+            action="marcher",
+            target_location=Location(
+                x=npc.current_location.x + 1, y=npc.current_location.y, z=npc.current_location.z
+            ),
+            reasoning="benchmark"
+        )
+
+
+async def legacy_decision(manager: NPCManager, npc_id: str, context: dict) -> dict:
+    """Séquence d'appels d'origine, pour comparaison"""
+    timings = {"db": 0.0, "llm": 0.0}
+
+    started = time.perf_counter()
+    npc = await manager.get_npc(npc_id)
+    nearby = await manager.get_nearby_npcs(npc.current_location)
+    timings["db"] += time.perf_counter() - started
+
+    request = DecisionRequest(
+        npc_id=npc_id, context=context, nearby_npcs=[n.id for n in nearby if n.id != npc_id],
+        time_of_day=12
+    )
+    started = time.perf_counter()
+    decision = await manager.ai_engine.make_decision(npc, request)
+    timings["llm"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    # add_memory d'origine : relecture puis réécriture complète des tableaux
+    npc = await manager.get_npc(npc_id)
+    npc.short_term_memory.append(Memory(event_type="decision", description=decision.action))
+    if len(npc.short_term_memory) > 20:
+        old_memory = npc.short_term_memory.pop(0)
+        if old_memory.importance >= 7:
+            npc.long_term_memory.append(old_memory)
+    await manager.npcs_collection.update_one({"id": npc_id}, {"$set": {
+        "short_term_memory": [m.model_dump() for m in npc.short_term_memory],
+        "long_term_memory": [m.model_dump() for m in npc.long_term_memory],
+    }})
+    # update_npc d'origine : mise à jour puis relecture
+    await manager.npcs_collection.update_one(
+        {"id": npc_id}, {"$set": {"current_location": decision.target_location.model_dump()}}
+    )
+    await manager.get_npc(npc_id)
+    timings["db"] += time.perf_counter() - started
+    return timings
+
+
+async def seed(manager: NPCManager, count: int, rng: random.Random):
+    await manager.npcs_collection.delete_many({})
+    ids = []
+    for i in range(count):
+        npc = await manager.create_npc(NPCCreate(
+            name=f"Bench {i}",
+            npc_type=rng.choice(list(NPCType)),
+            current_location=Location(x=rng.uniform(-3000, 3000), y=rng.uniform(-3000, 3000), z=30.0)
+        ))
+        ids.append(npc.id)
+    # Mémoires existantes pour que les documents aient une taille réaliste
+    for npc_id in ids:
+        for j in range(20):
+            await manager.add_memory(npc_id, Memory(event_type="seed", description=f"Souvenir {j}", importance=rng.randint(1, 10)))
+    return ids
+
+
+def report(label: str, samples: list):
+    db = [s["db"] * 1000 for s in samples]
+    llm = [s["llm"] * 1000 for s in samples]
+    total = [d + l for d, l in zip(db, llm)]
+    print(f"{label:>6}: total moyen {statistics.mean(total):8.2f} ms | "
+          f"DB moyen {statistics.mean(db):8.2f} ms | DB p95 {sorted(db)[int(len(db) * 0.95) - 1]:8.2f} ms | "
+          f"part DB {sum(db) / sum(total):6.1%}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="gta5_ai_bench")
+    parser.add_argument("--npcs", type=int, default=2000)
+    parser.add_argument("--decisions", type=int, default=200)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    client = AsyncIOMotorClient(args.mongo_url)
+    manager = NPCManager(client[args.db], StubAIEngine(args.llm_latency_ms))
+    # Pas de fenêtre d'idempotence : chaque appel doit réellement s'exécuter
+    manager.decision_flight.idempotency_window = 0
+
+    ids = await seed(manager, args.npcs, rng)
+    targets = [rng.choice(ids) for _ in range(args.decisions)]
+
+    before = [await legacy_decision(manager, npc_id, {"bench": i}) for i, npc_id in enumerate(targets)]
+
+    after = []
+    for i, npc_id in enumerate(targets):
+        timings = (await manager.process_npc_decision(npc_id, {"bench": i}))["timings_ms"]
+        after.append({"db": (timings["db_read"] + timings["db_write"]) / 1000, "llm": timings["llm"] / 1000})
+
+    print(f"{args.npcs} PNJ, {args.decisions} décisions, latence LLM simulée {args.llm_latency_ms} ms")
+    report("avant", before)
+    report("après", after)
+
+    await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
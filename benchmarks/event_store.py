@@ -0,0 +1,109 @@
+"""Latence des requêtes d'événements selon le volume, avant / après agrégats.
+
+Usage (depuis la racine du dépôt, MongoDB local requis) :
+
+    python -m benchmarks.event_store --volumes 10000 100000 1000000
+
+"avant" : tri sur timestamp sans index et count_documents sur les
+événements bruts, comme l'ancien /api/stats ; "après" : EventStore
+(index timestamp, agrégats horaires). Les événements sont répartis sur
+les 72 dernières heures.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne
+
+from backend.event_store import EventStore, hour_bucket
+from backend.models import GameEvent, Location
+
+EVENT_TYPES = ["crime", "accident", "fusillade", "bagarre", "vol"]
+AREAS = ["Downtown Los Santos", "Grove Street", "Vinewood", "Vespucci Beach", "Mission Row"]
+
+
+async def timed(coro_factory, repeat: int = 20) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await coro_factory()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def fill(store: EventStore, target: int, current: int, rng: random.Random):
+    """Ajoute des événements jusqu'à `target`, agrégats compris, par lots"""
+    now = datetime.utcnow()
+    while current < target:
+        events, rollups = [], {}
+        for _ in range(min(10000, target - current)):
+            event = GameEvent(
+                event_type=rng.choice(EVENT_TYPES),
+                location=Location(x=rng.uniform(-3000, 3000), y=rng.uniform(-3000, 3000), z=30.0,
+                                  area_name=rng.choice(AREAS)),
+                participants=[], description="bench", severity=rng.randint(1, 10),
+                timestamp=now - timedelta(seconds=rng.uniform(0, 72 * 3600))
+            )
+            document = event.model_dump()
+            document["hour_bucket"] = hour_bucket(event.timestamp)
+            events.append(InsertOne(document))
+            for dimension, value in (("total", "all"), ("type", event.event_type), ("area", event.location.area_name)):
+                key = (document["hour_bucket"], dimension, value)
+                rollups[key] = rollups.get(key, 0) + 1
+            current += 1
+        await store.events.bulk_write(events, ordered=False)
+        await store.rollups.bulk_write([
+            UpdateOne({"_id": f"{bucket.isoformat()}|{dimension}|{value}"},
+                      {"$setOnInsert": {"bucket": bucket, "dimension": dimension, "value": value},
+                       "$inc": {"count": count}}, upsert=True)
+            for (bucket, dimension, value), count in rollups.items()
+        ], ordered=False)
+    return current
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--volumes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    client = AsyncIOMotorClient(args.mongo_url)
+    legacy_db, indexed_db = client["gta5_ai_bench_legacy"], client["gta5_ai_bench_events"]
+    for db in (legacy_db, indexed_db):
+        await db.events.drop()
+        await db.event_rollups.drop()
+
+    store = EventStore(indexed_db, ttl_days=30)
+    await store.ensure_indexes()
+    legacy = EventStore(legacy_db)  # mêmes données, aucun index
+
+    count = 0
+    for volume in sorted(args.volumes):
+        # Remplissage identique des deux bases (même seed)
+        state = rng.getstate()
+        await fill(legacy, volume, count, rng)
+        rng.setstate(state)
+        count = await fill(store, volume, count, rng)
+
+        yesterday = datetime.utcnow() - timedelta(hours=24)
+        before_recent = await timed(lambda: legacy_db.events.find().sort("timestamp", -1).limit(50).to_list(50))
+        before_stats = await timed(lambda: legacy_db.events.count_documents({"timestamp": {"$gte": yesterday}}))
+        after_recent = await timed(lambda: store.recent(50))
+        after_stats = await timed(lambda: store.summary(24))
+        print(f"{volume:>9} événements | récents : avant {before_recent:8.2f} ms, après {after_recent:6.2f} ms | "
+              f"stats 24h : avant {before_stats:8.2f} ms, après {after_stats:6.2f} ms")
+
+    await client.drop_database("gta5_ai_bench_legacy")
+    await client.drop_database("gta5_ai_bench_events")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
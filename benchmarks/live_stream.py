@@ -0,0 +1,96 @@
+"""Coût d'un envoi du flux en direct selon le nombre d'abonnés.
+
+Usage (depuis la racine du dépôt, sans MongoDB ni LLM) :
+
+    python -m benchmarks.live_stream --subscribers 10 100 1000 --changes 200
+
+À chaque envoi, `--changes` PNJ ont été modifiés ; la moitié des abonnés
+suit tout, l'autre moitié filtre sur un type de PNJ. On compare un
+encodage JSON par abonné (sérialisation dans chaque connexion) avec
+LiveBroadcaster (un encodage par mise à jour, morceaux partagés) : temps
+d'un envoi et nombre d'encodages.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from backend.live_stream import LiveBroadcaster, sse_frame
+from backend.models import NPC, NPCType, NPCPersonality, Location
+
+
+def changed_npcs(rng: random.Random, count: int, first_seq: int) -> list:
+    return [
+        {**NPC(
+            name=f"Bench {i}",
+            npc_type=rng.choice(list(NPCType)),
+            personality=NPCPersonality(),
+            current_location=Location(x=rng.uniform(-3000, 3000), y=rng.uniform(-3000, 3000), z=30.0,
+                                      area_name=rng.choice(["Vinewood", "Downtown", "Del Perro"]))
+        ).model_dump(mode="json"), "change_seq": first_seq + i}
+        for i in range(count)
+    ]
+
+
+def subscriber_filters(count: int) -> list:
+    return [set() if i % 2 == 0 else {list(NPCType)[i % len(NPCType)].value} for i in range(count)]
+
+
+def per_subscriber(npcs: list, filters: list) -> int:
+    """Référence : chaque connexion filtre et encode elle-même les mises à jour"""
+    encodes = 0
+    for types in filters:
+        chunk = []
+        for npc in npcs:
+            if not types or npc["npc_type"] in types:
+                chunk.append(sse_frame("npc", npc))
+                encodes += 1
+        b"".join(chunk)
+    return encodes
+
+
+async def shared(npcs: list, filters: list) -> tuple:
+    """LiveBroadcaster : un encodage par PNJ, puis un morceau par abonné"""
+    feed = {"resync": False, "cursor": npcs[-1]["change_seq"], "more": False, "changes": npcs, "deleted": []}
+
+    async def changes(since, fields=None, limit=500):
+        return feed
+
+    async def stats():
+        return {}
+
+    live = LiveBroadcaster(changes, stats, queue_size=2)
+    live._cursor = npcs[0]["change_seq"] - 1
+    subscribers = [live.subscribe({"npcs"}, None, types) for types in filters]
+    live._task.cancel()
+    started = time.perf_counter()
+    live._dispatch(await live._npc_frames())
+    duration = time.perf_counter() - started
+    assert all(not subscriber.queue.empty() for subscriber in subscribers)
+    return duration, live.counters["frames_encoded"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--changes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    npcs = changed_npcs(rng, args.changes, first_seq=1)
+    size = len(json.dumps(npcs).encode("utf-8"))
+    print(f"{args.changes} PNJ modifiés par envoi ({size / 1024:.0f} Ko de JSON)")
+    for count in args.subscribers:
+        filters = subscriber_filters(count)
+        started = time.perf_counter()
+        naive_encodes = per_subscriber(npcs, filters)
+        naive_ms = (time.perf_counter() - started) * 1000
+        shared_s, shared_encodes = await shared(npcs, filters)
+        print(f"{count:>6} abonnés | par abonné : {naive_ms:9.1f} ms {naive_encodes:>8} encodages | "
+              f"partagé : {shared_s * 1000:7.1f} ms {shared_encodes:>5} encodages")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,420 @@
+"""Charge mixte reproductible sur l'API complète, hors ligne (remplace backend_test.py).
+
+Usage (depuis la racine du dépôt, sans clé OpenAI ni serveur lancé) :
+
+    python -m benchmarks.load --duration 30 --concurrency 32 --output load.json
+    python -m benchmarks.load --memory --duration 10           # sans MongoDB
+    python -m benchmarks.load --output new.json --compare load.json
+
+L'application tourne dans le processus (ASGI, sans réseau) avec le
+fournisseur LLM `fake` (latence `--llm-latency-ms`, graine `--seed`), sur
+un MongoDB local (`--mongo-url`, base `--db` vidée au départ) ou, avec
+`--memory`, sur mongomock-motor (dépendance de développement, à installer
+à part). En mémoire, chaque requête parcourt toute la collection (pas
+d'index) et la lecture PNJ + voisins d'une décision passe par deux
+requêtes au lieu d'une agrégation ($lookup à pipeline non géré) : les
+chiffres servent à comparer deux versions du code sur la même machine,
+pas à dimensionner MongoDB.
+
+`--concurrency` clients tournent en boucle fermée pendant `--duration`
+secondes (les `--warmup` premières ne sont pas comptées) ; chacun tire à
+chaque tour un scénario selon les poids de `--mix` :
+- tick : tick du mod, décisions de `--tick-npcs` PNJ proches les uns des autres
+- event : rafale de `--burst` crimes au même endroit (POST /api/events)
+- dashboard : rafraîchissement du tableau de bord (flux de modifications, stats, événements récents)
+- bulk : décisions groupées de `--bulk-size` PNJ
+
+Le rapport donne le débit et les p50/p95/p99 par endpoint (modèle de
+route) et par scénario. `--output` l'écrit en JSON ; `--compare` le
+compare à un résultat précédent et sort en erreur (code 1) si un p95, un
+p99 ou un débit se dégrade de plus de `--threshold` %.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+SCENARIOS = ("tick", "event", "dashboard", "bulk")
+DEFAULT_MIX = "tick=70,event=5,dashboard=20,bulk=5"
+WEATHERS = ("sunny", "cloudy", "rainy", "foggy")
+TIME_CONTEXTS = ("morning", "afternoon", "evening", "night")
+CRIMES = ("vol à l'arraché", "agression", "vol de voiture", "cambriolage")
+# En dessous, un endpoint n'est pas comparé (percentiles trop bruités)
+MIN_COMPARE_SAMPLES = 20
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def parse_mix(text: str) -> dict:
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"scénario inconnu : {name.strip()} (attendus : {', '.join(SCENARIOS)})")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def summarize(latencies: list, statuses: dict, elapsed: float) -> dict:
+    return {
+        "count": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+class Recorder:
+    """Latences et codes de réponse par endpoint et par scénario, hors échauffement"""
+
+    def __init__(self):
+        self.recording = False
+        self.endpoints = {}
+        self.scenarios = {}
+
+    def add(self, table: dict, key: str, seconds: float, status: str):
+        if not self.recording:
+            return
+        latencies, statuses = table.setdefault(key, ([], {}))
+        latencies.append(seconds)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            name: {key: summarize(latencies, statuses, elapsed) for key, (latencies, statuses) in sorted(table.items())}
+            for name, table in (("endpoints", self.endpoints), ("scenarios", self.scenarios))
+        }
+
+
+class LoadClient:
+    """Un client (mod, tableau de bord...) : scénarios tirés avec sa propre graine"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, npcs: list, args, index: int):
+        self.client = client
+        self.recorder = recorder
+        self.npcs = npcs
+        self.args = args
+        self.rng = random.Random(args.seed * 1000 + index)
+        self.cursor = None
+
+    async def request(self, method: str, route: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError:
+            response, status = None, "error"
+        self.recorder.add(self.recorder.endpoints, f"{method} {route}", time.perf_counter() - started, status)
+        return response
+
+    async def run(self, until: float):
+        names = list(self.args.mix)
+        weights = list(self.args.mix.values())
+        while time.perf_counter() < until:
+            name = self.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            await getattr(self, name)()
+            self.recorder.add(self.recorder.scenarios, name, time.perf_counter() - started, "200")
+            if self.args.think_ms:
+                await asyncio.sleep(self.rng.expovariate(1000 / self.args.think_ms))
+
+    def neighbourhood(self, count: int) -> list:
+        """PNJ les plus proches d'un PNJ tiré au hasard (là où se trouve le joueur)"""
+        center = self.rng.choice(self.npcs)["current_location"]
+        return sorted(self.npcs, key=lambda npc: (npc["current_location"]["x"] - center["x"]) ** 2
+                      + (npc["current_location"]["y"] - center["y"]) ** 2)[:count]
+
+    def decision_context(self) -> dict:
+        return {
+            "weather": self.rng.choice(WEATHERS),
+            "traffic_density": round(self.rng.random(), 2),
+            "police_presence": round(self.rng.random(), 2),
+            "time_context": self.rng.choice(TIME_CONTEXTS),
+            "nearby_player": self.rng.random() < 0.3,
+        }
+
+    async def tick(self):
+        await asyncio.gather(*(
+            self.request("POST", "/api/npcs/{npc_id}/decision", f"/api/npcs/{npc['id']}/decision",
+                         json=self.decision_context())
+            for npc in self.neighbourhood(self.args.tick_npcs)
+        ))
+
+    async def event(self):
+        location = dict(self.rng.choice(self.npcs)["current_location"])
+        participants = [npc["id"] for npc in self.rng.sample(self.npcs, 2)]
+        await asyncio.gather(*(
+            self.request("POST", "/api/events", "/api/events", json={
+                "event_type": "crime",
+                "location": {**location, "x": location["x"] + self.rng.uniform(-20, 20),
+                             "y": location["y"] + self.rng.uniform(-20, 20)},
+                "participants": participants,
+                "description": f"{self.rng.choice(CRIMES)} commis par PNJ",
+                "severity": self.rng.randint(3, 7),
+            })
+            for _ in range(self.args.burst)
+        ))
+
+    async def dashboard(self):
+        async def sync():
+            params = {"since": self.cursor} if self.cursor is not None else {}
+            response = await self.request("GET", "/api/npcs/changes", "/api/npcs/changes", params=params)
+            if response is not None and response.status_code == 200:
+                self.cursor = response.json()["cursor"]
+
+        await asyncio.gather(
+            sync(),
+            self.request("GET", "/api/stats", "/api/stats"),
+            self.request("GET", "/api/events", "/api/events", params={"limit": 20}),
+        )
+
+    async def bulk(self):
+        await self.request("POST", "/api/simulation/bulk-decisions", "/api/simulation/bulk-decisions", json=[
+            {"npc_id": npc["id"], "context": self.decision_context()}
+            for npc in self.neighbourhood(self.args.bulk_size)
+        ])
+
+
+def configure_environment(args):
+    """Variables lues à l'import du serveur : à poser avant `import backend.server`"""
+    os.environ.update({
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.db,
+        "LLM_PROVIDER": "fake",
+        "LLM_FAKE_SEED": str(args.seed),
+        "LLM_FAKE_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_FAKE_JITTER_MS": str(args.llm_jitter_ms),
+    })
+    for name in ("SNAPSHOT_PATH", "SHARD_ID", "SHARD_URLS", "ADMIN_TOKEN"):
+        os.environ.pop(name, None)
+    if args.memory:
+        use_memory_database()
+
+
+def use_memory_database():
+    """Remplace le client motor par mongomock-motor (à appeler avant `import backend.server`)"""
+    try:
+        import mongomock_motor
+    except ImportError:
+        sys.exit("--memory demande mongomock-motor : pip install mongomock-motor")
+    import motor.motor_asyncio
+
+    def client(*args, **kwargs):
+        return mongomock_motor.AsyncMongoMockClient()
+
+    motor.motor_asyncio.AsyncIOMotorClient = client
+    patch_mongomock()
+
+
+_mongomock_patched = False
+
+
+def patch_mongomock():
+    """Comble ce que mongomock ne gère pas (aussi utilisé par les tests) ; sans effet au second appel"""
+    global _mongomock_patched
+    if _mongomock_patched:
+        return
+    _mongomock_patched = True
+    import mongomock
+
+    from backend.npc_manager import NPCManager
+    from backend.models import NPC
+
+    def geo_within(value, search):
+        """$geoWithin avec $center sur une paire [x, y] (index 2d)"""
+        if "$center" not in search or not isinstance(value, list) or len(value) != 2:
+            return False
+        (x, y), radius = search["$center"]
+        return math.hypot(value[0] - x, value[1] - y) <= radius
+
+    mongomock.filtering._filterer_inst._operator_map["$geoWithin"] = geo_within
+
+    async def load_decision_state(self, npc_id, radius=100.0):
+        data = await self.npcs_collection.find_one({"id": npc_id}, {"long_term_memory": 0, "position": 0})
+        if not data:
+            return None, []
+        npc = NPC(**data)
+        location = npc.current_location
+        # Même résultat que le $lookup ($geoNear) : ids des PNJ dans la sphère, le PNJ lui-même exclu
+        disc = {"$geoWithin": {"$center": [[location.x, location.y], radius]}}
+        nearby_ids = []
+        async for other in self.npcs_collection.find({"position": disc, "id": {"$ne": npc_id}},
+                                                     {"_id": 0, "id": 1, "current_location": 1}):
+            if sum((other["current_location"][axis] - getattr(location, axis)) ** 2
+                   for axis in ("x", "y", "z")) <= radius ** 2:
+                nearby_ids.append(other["id"])
+        return npc, nearby_ids
+
+    NPCManager._load_decision_state = load_decision_state
+
+    # mongomock relit le document renvoyé avec le filtre d'origine quand une projection est
+    # demandée : après une écriture conditionnelle sur la version, il ne le retrouve plus
+    find_one_and_update = mongomock.collection.Collection.find_one_and_update
+
+    def find_one_and_update_projected(self, filter, update, projection=None, *args, **kwargs):
+        document = find_one_and_update(self, filter, update, None, *args, **kwargs)
+        if document is None or not projection:
+            return document
+        excluded = {field for field, keep in projection.items() if not keep}
+        return {field: value for field, value in document.items() if field not in excluded}
+
+    mongomock.collection.Collection.find_one_and_update = find_one_and_update_projected
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or "inconnue"
+    except OSError:
+        return "inconnue"
+
+
+async def run(args) -> dict:
+    from backend import server
+    # Une ligne de journal par décision fausserait la mesure
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if not args.memory:
+        await server.client.drop_database(args.db)
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=60.0) as client:
+            deadline = time.perf_counter() + 30
+            while (await client.get("/api/health/ready")).status_code != 200:
+                if time.perf_counter() > deadline:
+                    sys.exit(f"Serveur pas prêt après 30 s : {server.startup_state['error']}")
+                await asyncio.sleep(0.1)
+
+            await client.post("/api/simulation/populate", params={"count": args.npcs, "seed": args.seed})
+            npcs = (await client.get("/api/npcs", params={"memory": "false"})).json()
+            print(f"{len(npcs)} PNJ, {args.concurrency} clients, {args.duration:.0f} s "
+                  f"(dont {args.warmup:.0f} s d'échauffement), base {'mémoire' if args.memory else args.mongo_url}")
+
+            recorder = Recorder()
+            started = time.perf_counter()
+            until = started + args.duration
+            clients = [LoadClient(client, recorder, npcs, args, index) for index in range(args.concurrency)]
+            tasks = [asyncio.ensure_future(load_client.run(until)) for load_client in clients]
+            await asyncio.sleep(min(args.warmup, args.duration))
+            recorder.recording = True
+            measured_from = time.perf_counter()
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - measured_from
+            stats = (await client.get("/api/stats")).json()
+
+    report = recorder.report(elapsed)
+    total = sum(endpoint["count"] for endpoint in report["endpoints"].values())
+    return {
+        "date": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "revision": git_revision(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "database": "memory" if args.memory else "mongodb"},
+        "config": {name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+        "measured_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        **report,
+        # Compteurs du serveur en fin de course (déduplication, foules, admission, LLM)
+        "server": {name: stats.get(name) for name in ("decision_dedup", "decision_timings", "crowd", "admission", "llm")},
+    }
+
+
+def print_report(result: dict):
+    print(f"{result['requests']} requêtes en {result['measured_s']:.1f} s : {result['throughput_rps']:.1f} req/s")
+    for title in ("endpoints", "scenarios"):
+        print(f"\n{'endpoint' if title == 'endpoints' else 'scénario':<40} {'n':>7} {'req/s':>8} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+        for key, row in result[title].items():
+            print(f"{key:<40} {row['count']:>7} {row['throughput_rps']:>8.1f} {row['p50_ms']:>9.1f} "
+                  f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['errors']:>8}")
+    failing = {key: row["statuses"] for key, row in result["endpoints"].items() if row["errors"]}
+    if failing:
+        print(f"\nCodes de réponse des endpoints en erreur : {failing}")
+
+
+def compare(previous: dict, current: dict, threshold: float) -> list:
+    """Affiche les écarts par endpoint ; retourne les dégradations au-delà du seuil"""
+    print(f"\nComparaison avec {previous.get('revision', '?')} du {previous.get('date', '?')} "
+          f"(seuil {threshold:.0f} %)")
+    if previous.get("config") != current["config"]:
+        changed = sorted(name for name in set(previous.get("config", {})) | set(current["config"])
+                         if previous.get("config", {}).get(name) != current["config"].get(name))
+        print(f"Attention : configuration différente ({', '.join(changed)})")
+    regressions = []
+    for key, row in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(key)
+        if not before or min(before["count"], row["count"]) < MIN_COMPARE_SAMPLES:
+            continue
+        cells = []
+        for metric, higher_is_worse in (("throughput_rps", False), ("p50_ms", True), ("p95_ms", True),
+                                        ("p99_ms", True)):
+            change = (row[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            worse = change if higher_is_worse else -change
+            flag = ""
+            if metric != "p50_ms" and worse > threshold:
+                flag = " !"
+                regressions.append(f"{key} {metric} {before[metric]} -> {row[metric]} ({change:+.1f} %)")
+            cells.append(f"{metric.replace('_ms', '').replace('throughput_rps', 'req/s')} {change:+6.1f} %{flag}")
+        print(f"{key:<40} " + " | ".join(cells))
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="gta5_ai_bench_load")
+    parser.add_argument("--memory", action="store_true", help="base en mémoire (mongomock-motor) au lieu de MongoDB")
+    parser.add_argument("--npcs", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause moyenne d'un client entre deux scénarios")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--tick-npcs", type=int, default=8)
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--bulk-size", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    parser.add_argument("--compare", help="résultat JSON précédent à comparer")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    configure_environment(args)
+    result = await run(args)
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nRésultats écrits dans {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), result, args.threshold)
+        if regressions:
+            print("\nDégradations :\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
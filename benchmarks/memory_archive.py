@@ -0,0 +1,77 @@
+"""Taille des documents PNJ et coût de la liste, mémoire embarquée / archivée.
+
+Usage (depuis la racine du dépôt, en mémoire, sans MongoDB) :
+
+    python -m benchmarks.memory_archive --npcs 10000
+
+"avant" : fenêtre courte de 20 souvenirs et 100 souvenirs long terme dans
+chaque document ; "après" : fenêtre courte de 10 souvenirs, long terme dans
+l'archive. Mesure la taille BSON moyenne et le décodage + validation d'une
+liste complète (GET /api/npcs), avec et sans la fenêtre mémoire.
+"""
+import argparse
+import random
+import statistics
+import time
+
+import bson
+
+from backend.memory_archive import LONG_TERM_MEMORY_IMPORTANCE
+from backend.models import NPC, Location, Memory
+from backend.npc_manager import LIGHT_PROJECTION, SHORT_TERM_MEMORY_SIZE
+from backend.population import generate_population
+
+
+def memory(rng: random.Random, important: bool = False) -> dict:
+    return Memory(
+        event_type=rng.choice(["decision", "witnessed_event", "rumor", "routine"]),
+        description=f"A été témoin de: incident {rng.randint(0, 10**6)} près de Grove Street",
+        location=Location(x=rng.uniform(-3000, 3000), y=rng.uniform(-3000, 3000), z=30.0, area_name="Grove Street"),
+        importance=rng.randint(LONG_TERM_MEMORY_IMPORTANCE, 10) if important else rng.randint(1, 10)
+    ).model_dump()
+
+
+def list_cost(encoded: list, projection: dict, repeat: int) -> float:
+    """Décodage BSON + validation pydantic de toute la liste, en ms"""
+    excluded = {field for field, keep in projection.items() if not keep}
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for raw in encoded:
+            document = bson.decode(raw)
+            NPC(**{k: v for k, v in document.items() if k not in excluded})
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--npcs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    base = generate_population(args.npcs, seed=args.seed)
+    before, after = [], []
+    for document in base:
+        legacy = dict(document)
+        legacy["short_term_memory"] = [memory(rng) for _ in range(20)]
+        legacy["long_term_memory"] = [memory(rng, important=True) for _ in range(100)]
+        before.append(bson.encode(legacy))
+        current = dict(document)
+        current["short_term_memory"] = legacy["short_term_memory"][-SHORT_TERM_MEMORY_SIZE:]
+        after.append(bson.encode(current))
+
+    size_before = statistics.mean(len(raw) for raw in before)
+    size_after = statistics.mean(len(raw) for raw in after)
+    print(f"{args.npcs} PNJ")
+    print(f"taille moyenne : avant {size_before / 1024:7.1f} Ko | après {size_after / 1024:5.1f} Ko "
+          f"({size_before / size_after:.1f}x)")
+    print(f"liste complète : avant {list_cost(before, {'_id': 0}, args.repeat):8.1f} ms | "
+          f"après {list_cost(after, {'_id': 0}, args.repeat):7.1f} ms | "
+          f"sans mémoire {list_cost(after, LIGHT_PROJECTION, args.repeat):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
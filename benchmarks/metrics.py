@@ -0,0 +1,119 @@
+"""Surcoût des métriques sur le chemin chaud.
+
+Usage (depuis la racine du dépôt, sans MongoDB ni LLM) :
+
+    python -m benchmarks.metrics --iterations 200000 --requests 5000
+
+Mesure le coût unitaire d'une observation d'histogramme (avec et sans
+verrou), du décorateur db_operation, d'un événement de l'écouteur de
+commandes MongoDB et d'une étape de trace (span, hors requête et dans
+une requête), puis la latence d'une requête HTTP sur une route
+triviale avec et sans l'intercepteur RequestMetrics, et le temps d'un
+rendu de /metrics.
+"""
+import argparse
+import asyncio
+import time
+import types
+
+import httpx
+from fastapi import FastAPI
+
+from backend.metrics import Histogram, MetricsRegistry, MongoCommandMetrics, RequestMetrics, db_operation
+from backend.timing import CURRENT_TRACE, Trace, span
+
+
+def per_call_ns(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+async def per_await_ns(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await func()
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+async def request_us(app: FastAPI, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get("/api/npcs/abc")
+        started = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/api/npcs/abc")
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def make_app(histogram=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/npcs/{npc_id}")
+    async def get_npc(npc_id: str):
+        return {"id": npc_id}
+
+    if histogram is not None:
+        app.add_middleware(RequestMetrics, histogram=histogram)
+    return app
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    plain = Histogram("bench_seconds", "bench", ("route",))
+    locked = Histogram("bench_locked_seconds", "bench", ("route",), threadsafe=True)
+    listener = MongoCommandMetrics()
+    event = types.SimpleNamespace(command={"find": "npcs"}, command_name="find", request_id=1,
+                                  connection_id=("localhost", 27017), duration_micros=800)
+
+    async def noop():
+        return None
+
+    wrapped = db_operation(noop)
+
+    def command():
+        listener.started(event)
+        listener.succeeded(event)
+
+    print(f"observe()                 : {per_call_ns(lambda: plain.observe(0.012, '/api/npcs'), args.iterations):7.0f} ns")
+    print(f"observe() avec verrou     : {per_call_ns(lambda: locked.observe(0.012, '/api/npcs'), args.iterations):7.0f} ns")
+    print(f"commande MongoDB écoutée  : {per_call_ns(command, args.iterations):7.0f} ns")
+
+    def timed_block():
+        with span("bench"):
+            pass
+
+    print(f"span() hors requête       : {per_call_ns(timed_block, args.iterations):7.0f} ns")
+    token = CURRENT_TRACE.set(Trace())
+    print(f"span() dans une requête   : {per_call_ns(timed_block, args.iterations):7.0f} ns")
+    CURRENT_TRACE.reset(token)
+    bare_ns = await per_await_ns(noop, args.iterations)
+    wrapped_ns = await per_await_ns(wrapped, args.iterations)
+    print(f"db_operation              : {wrapped_ns - bare_ns:7.0f} ns de plus par appel")
+
+    histogram = Histogram("gta5_http_request_duration_seconds", "bench", ("method", "route", "status"))
+    bare_app, measured_app = make_app(), make_app(histogram)
+    # Essais alternés, meilleur temps de chaque côté (bruit de la boucle et du client)
+    without = with_metrics = float("inf")
+    for _ in range(3):
+        without = min(without, await request_us(bare_app, args.requests))
+        with_metrics = min(with_metrics, await request_us(measured_app, args.requests))
+    print(f"requête HTTP              : {without:7.1f} µs sans, {with_metrics:7.1f} µs avec RequestMetrics "
+          f"({with_metrics - without:+.1f} µs)")
+
+    registry = MetricsRegistry()
+    for histogram in (plain, locked, listener.latency, histogram):
+        registry.histogram(histogram)
+    started = time.perf_counter()
+    body = registry.render()
+    print(f"rendu /metrics            : {(time.perf_counter() - started) * 1000:7.2f} ms ({len(body)} octets)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
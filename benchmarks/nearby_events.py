@@ -0,0 +1,55 @@
+"""Coût d'une requête « événements autour d'ici » dans le chemin de décision.
+
+Usage (depuis la racine du dépôt, en mémoire, sans MongoDB) :
+
+    python -m benchmarks.nearby_events --events 100000
+
+Remplit l'index en mémoire avec `--events` événements répartis sur la
+dernière heure dans toute la ville, puis mesure la requête utilisée pour le
+contexte de décision (300 m, 10 minutes de jeu) et une fenêtre plus large.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from backend.event_store import GAME_MINUTE_SECONDS, SpatialTimeIndex, epoch_seconds
+from backend.models import GameEvent, Location
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = SpatialTimeIndex(horizon_seconds=3600)
+    now = datetime.utcnow()
+    for i in range(args.events):
+        index.add(GameEvent(
+            event_type=rng.choice(["crime", "accident", "fusillade"]),
+            location=Location(x=rng.uniform(-4000, 4000), y=rng.uniform(-4000, 4000), z=30.0),
+            participants=[], description="bench", severity=rng.randint(1, 10),
+            timestamp=now - timedelta(seconds=3600 * (1 - i / args.events))
+        ))
+    print(f"{len(index)} événements en mémoire")
+
+    current = epoch_seconds(datetime.utcnow())
+    for label, seconds in (("10 min de jeu", 10 * GAME_MINUTE_SECONDS), ("10 min réelles", 600), ("1 h", 3600)):
+        samples, found = [], []
+        for _ in range(args.queries):
+            x, y = rng.uniform(-4000, 4000), rng.uniform(-4000, 4000)
+            started = time.perf_counter()
+            results = index.query(x, y, 300.0, current - seconds, min_severity=1, limit=5, now=current)
+            samples.append((time.perf_counter() - started) * 1e6)
+            found.append(len(results))
+        samples.sort()
+        print(f"{label:>15} : médiane {statistics.median(samples):7.1f} µs | p99 {samples[int(len(samples) * 0.99)]:7.1f} µs | "
+              f"{statistics.mean(found):.1f} résultats")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Temps de génération (et d'insertion) d'une population de PNJ.
+
+Usage (depuis la racine du dépôt) :
+
+    python -m benchmarks.population --npcs 100000
+    python -m benchmarks.population --npcs 100000 --insert   # MongoDB local requis
+
+Compare aussi, sur un échantillon, le chemin historique : un create_npc
+(objets pydantic + insert_one) par PNJ.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from backend.models import NPCCreate, NPCType, Location
+from backend.npc_manager import NPCManager
+from backend.population import generate_population
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--npcs", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--insert", action="store_true", help="insère aussi dans MongoDB")
+    parser.add_argument("--legacy-sample", type=int, default=1000, help="PNJ créés un par un pour comparaison")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="gta5_ai_bench")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    documents = generate_population(args.npcs, seed=args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"génération : {args.npcs} PNJ en {elapsed:.2f} s ({args.npcs / elapsed:,.0f} PNJ/s)")
+
+    if not args.insert:
+        return
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    manager = NPCManager(client[args.db], ai_engine=None)
+    await manager.npcs_collection.delete_many({})
+
+    result = await manager.populate(args.npcs, seed=args.seed)
+    print(f"populate   : {result['inserted']} PNJ | génération {result['generation_ms']:.0f} ms | "
+          f"insertion {result['insert_ms']:.0f} ms")
+
+    started = time.perf_counter()
+    for i in range(args.legacy_sample):
+        await manager.create_npc(NPCCreate(name=f"Bench {i}", npc_type=NPCType.CIVILIAN,
+                                           current_location=Location(x=0.0, y=0.0, z=30.0)))
+    per_npc = (time.perf_counter() - started) / args.legacy_sample
+    print(f"avant      : {per_npc * 1000:.2f} ms par PNJ (create_npc), soit {per_npc * args.npcs:.0f} s pour {args.npcs} PNJ")
+
+    await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
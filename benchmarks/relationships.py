@@ -0,0 +1,67 @@
+"""Graphe des relations : mises à jour groupées, requêtes de voisinage et propagation.
+
+Usage (depuis la racine du dépôt, en mémoire, sans MongoDB) :
+
+    python -m benchmarks.relationships --npcs 10000 --edges 100000
+
+Compare aussi la requête inverse ("qui déteste X") sur le graphe avec le
+parcours des dictionnaires NPC.relationships embarqués, seul moyen d'y
+répondre avant.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from backend.relationships import EdgeUpdate, RelationshipGraph
+
+
+def timed(func, repeat: int) -> float:
+    """Durée moyenne d'un appel, en microsecondes"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--npcs", type=int, default=10000)
+    parser.add_argument("--edges", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ids = [f"npc-{i}" for i in range(args.npcs)]
+    updates = [EdgeUpdate(rng.choice(ids), rng.choice(ids), score=rng.randint(-10, 10)) for _ in range(args.edges)]
+
+    graph = RelationshipGraph()
+    started = time.perf_counter()
+    graph.apply(updates)
+    print(f"{graph.edge_count} arêtes, {args.npcs} PNJ")
+    print(f"chargement         : {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+    # Lot d'événement : 50 témoins x 3 participants
+    batch = [EdgeUpdate(rng.choice(ids), rng.choice(ids), -2) for _ in range(150)]
+    print(f"lot de 150 arêtes  : {timed(lambda: graph.apply(batch), 100):8.1f} µs")
+
+    target = rng.choice(ids)
+    print(f"voisins            : {timed(lambda: graph.neighbors(target), 1000):8.1f} µs")
+    print(f"voisins inverses   : {timed(lambda: graph.reverse_neighbors(target, max_score=-5), 1000):8.1f} µs")
+
+    # Avant : dictionnaires embarqués, requête inverse = parcours de tous les PNJ
+    embedded = {npc_id: graph.neighbors(npc_id) for npc_id in ids}
+    scan = lambda: [s for s, rel in embedded.items() if rel.get(target, 0) <= -5 and target in rel]
+    print(f"inverse (embarqué) : {timed(scan, 20):8.1f} µs")
+
+    for hops in (1, 2, 3):
+        seeds = {npc_id: 1.0 for npc_id in rng.sample(ids, 20)}
+        reached = graph.propagate(seeds, hops=hops)
+        duration = timed(lambda: graph.propagate(seeds, hops=hops), 20)
+        print(f"propagation {hops} saut(s): {duration / 1000:8.2f} ms, {len(reached)} PNJ atteints")
+
+
+if __name__ == "__main__":
+    main()
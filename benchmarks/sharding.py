@@ -0,0 +1,69 @@
+"""Débit de décisions d'un serveur, à un ou plusieurs shards.
+
+Usage (depuis la racine du dépôt, serveurs déjà lancés avec LLM_PROVIDER=fake) :
+
+    uvicorn backend.server:app --port 8000                # 1 processus
+    python -m backend.sharding --shards 4 --port 8001     # 4 shards
+    python -m benchmarks.sharding --urls http://127.0.0.1:8000
+    python -m benchmarks.sharding --urls http://127.0.0.1:8001 http://127.0.0.1:8002 \\
+        http://127.0.0.1:8003 http://127.0.0.1:8004
+
+Les requêtes sont envoyées à tour de rôle aux URLs données (comme derrière
+un répartiteur de charge) ; chaque shard transmet au propriétaire du PNJ.
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+
+import httpx
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", nargs="+", default=["http://127.0.0.1:8000"])
+    parser.add_argument("--npcs", type=int, default=200)
+    parser.add_argument("--decisions", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=128)
+    args = parser.parse_args()
+
+    urls = itertools.cycle(args.urls)
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        created = await client.post(f"{args.urls[0]}/api/npcs/batch", json=[
+            {"name": f"Bench {i}", "npc_type": "civilian",
+             "current_location": {"x": i * 50.0, "y": 0.0, "z": 30.0}}
+            for i in range(args.npcs)
+        ])
+        ids = [npc["id"] for npc in created.json()["npcs"]]
+
+        queue = asyncio.Queue()
+        for i in range(args.decisions):
+            queue.put_nowait((ids[i % len(ids)], i))
+        latencies, errors = [], 0
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                npc_id, i = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post(f"{next(urls)}/api/npcs/{npc_id}/decision", json={"bench": i})
+                if response.status_code != 200:
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        duration = time.perf_counter() - started
+
+        for npc_id in ids:
+            await client.delete(f"{next(urls)}/api/npcs/{npc_id}")
+
+    latencies.sort()
+    print(f"{len(args.urls)} URL(s), {args.decisions} décisions, {args.concurrency} en parallèle")
+    print(f"débit {args.decisions / duration:8.0f} décisions/s | médiane {statistics.median(latencies):6.1f} ms | "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:6.1f} ms | erreurs {errors}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""Budget de démarrage : import du serveur + première requête, dans un processus neuf.
+
+Usage (depuis la racine du dépôt, sans MongoDB ni clé OpenAI) :
+
+    python -m benchmarks.startup --runs 5 --budget-ms 1500
+
+Chaque essai lance un interpréteur neuf qui importe `backend.server`,
+démarre l'application (lifespan) et sert GET /api/health/live via ASGI,
+MongoDB pointant vers une adresse injoignable : le démarrage ne doit ni
+attendre ni échouer à cause d'une dépendance. Le script sort en erreur
+(code 1) si la médiane dépasse `--budget-ms`. `--imports` affiche les
+modules les plus coûteux (python -X importtime).
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+UNREACHABLE_MONGO = "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=500"
+
+
+async def child():
+    """Mesure faite dans le processus neuf"""
+    started = time.perf_counter()
+    import httpx
+    from backend import server
+    imported = time.perf_counter()
+
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            response = await client.get("/api/health/live")
+            first_request = time.perf_counter()
+            ready = (await client.get("/api/health/ready")).status_code
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "first_request_ms": (first_request - imported) * 1000,
+        "status": response.status_code,
+        "ready_status": ready,
+    }))
+
+
+def slowest_imports(env, count: int = 10):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.server"],
+        env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    for cumulative, module in sorted(rows, reverse=True)[:count]:
+        print(f"  {cumulative / 1000:8.1f} ms {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--provider", default="openai", help="LLM_PROVIDER des essais (client créé à la demande)")
+    parser.add_argument("--imports", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(child())
+        return
+
+    env = {
+        **os.environ,
+        "MONGO_URL": UNREACHABLE_MONGO,
+        "DB_NAME": "gta5_ai_bench_startup",
+        "LLM_PROVIDER": args.provider,
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-startup-bench"),
+    }
+    env.pop("SNAPSHOT_PATH", None)
+    env.pop("SHARD_URLS", None)
+
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(result.stderr[-2000:])
+            sys.exit(1)
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        assert sample["status"] == 200 and sample["ready_status"] == 503
+        samples.append(sample)
+
+    import_ms = statistics.median(s["import_ms"] for s in samples)
+    first_ms = statistics.median(s["first_request_ms"] for s in samples)
+    total = import_ms + first_ms
+    print(f"import {import_ms:7.1f} ms | première requête {first_ms:6.1f} ms | total {total:7.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms)")
+    if args.imports:
+        print("Imports les plus coûteux (cumulés) :")
+        slowest_imports(env)
+    if total > args.budget_ms:
+        print("Budget de démarrage dépassé")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
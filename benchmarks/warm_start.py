@@ -0,0 +1,107 @@
+"""Démarrage à froid (MongoDB) / à chaud (snapshot + journal) de l'état en mémoire.
+
+Usage (depuis la racine du dépôt, MongoDB local requis) :
+
+    python -m benchmarks.warm_start --npcs 100000 --edges 500000 --events 2000
+
+Après peuplement (PNJ, relations, événements récents), mesure le travail
+de démarrage du serveur : à froid, rechargement de l'index des événements
+et du graphe depuis MongoDB et passes de migration sur les PNJ ; à chaud,
+relecture du snapshot et du journal (`--log` modifications rejouées) plus
+le contrôle du nombre d'arêtes en base.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne
+
+from backend.event_store import EventStore
+from backend.memory_archive import MemoryArchive
+from backend.models import GameEvent, Location
+from backend.npc_manager import NPCManager
+from backend.relationships import EdgeUpdate, RelationshipGraph
+from backend.world_snapshot import WorldSnapshot
+
+
+async def cold_start(db) -> tuple:
+    started = time.perf_counter()
+    events = EventStore(db)
+    graph = RelationshipGraph(db.relationships)
+    await events.warm()
+    await graph.load()
+    await graph.migrate_embedded(db.npcs)
+    await MemoryArchive(db.memories).migrate_embedded(db.npcs)
+    return time.perf_counter() - started, graph, events
+
+
+async def warm_start(db, path: str, db_name: str) -> tuple:
+    started = time.perf_counter()
+    graph = RelationshipGraph(db.relationships)
+    events = EventStore(db)
+    restored = WorldSnapshot(path, graph, events.recent_index, db_name).restore()
+    assert restored and restored["edges"] == await db.relationships.estimated_document_count()
+    return time.perf_counter() - started, restored
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="gta5_ai_bench_warm_start")
+    parser.add_argument("--npcs", type=int, default=100000)
+    parser.add_argument("--edges", type=int, default=500000)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--log", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    client = AsyncIOMotorClient(args.mongo_url)
+    await client.drop_database(args.db)
+    db = client[args.db]
+
+    manager = NPCManager(db, ai_engine=None)
+    await manager.populate(args.npcs, seed=args.seed)
+    ids = [doc["id"] async for doc in db.npcs.find({}, {"id": 1})]
+    await manager.relationships.apply_and_persist(
+        EdgeUpdate(rng.choice(ids), rng.choice(ids), score=rng.randint(-10, 10)) for _ in range(args.edges)
+    )
+    now = datetime.utcnow()
+    await db.events.bulk_write([
+        InsertOne(GameEvent(
+            event_type="crime",
+            location=Location(x=rng.uniform(-3000, 3000), y=rng.uniform(-3000, 3000), z=30.0),
+            participants=[],
+            description="Bench",
+            timestamp=now - timedelta(seconds=rng.uniform(0, 3000))
+        ).model_dump())
+        for _ in range(args.events)
+    ])
+    await EventStore(db).ensure_indexes()
+
+    cold, graph, events = await cold_start(db)
+    path = os.path.join(tempfile.mkdtemp(), "world.snap")
+    snapshot = WorldSnapshot(path, graph, events.recent_index, args.db)
+    written = snapshot.write()
+    snapshot.attach()
+    # Modifications après le snapshot, rejouées depuis le journal au démarrage à chaud
+    for _ in range(args.log):
+        await graph.apply_and_persist([EdgeUpdate(rng.choice(ids), rng.choice(ids), score=rng.randint(-10, 10))])
+
+    warm, restored = await warm_start(db, path, args.db)
+    print(f"{args.npcs} PNJ, {written['edges']} arêtes, {len(events.recent_index)} événements récents")
+    print(f"à froid (MongoDB)   : {cold * 1000:8.1f} ms")
+    print(f"à chaud (snapshot)  : {warm * 1000:8.1f} ms  ({restored['replayed']} modifications rejouées, "
+          f"snapshot {os.path.getsize(path) / 1024:.0f} Ko, écrit en {snapshot.counters['last_write_ms']} ms)")
+
+    await client.drop_database(args.db)
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
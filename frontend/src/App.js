@@ -1,10 +1,24 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import "./App.css";
 import axios from "axios";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Applique un lot du flux de modifications à la liste locale (ordre conservé, nouveaux PNJ à la fin)
+const applyNpcChanges = (npcs, changes, deleted) => {
+  const changedById = new Map(changes.map((npc) => [npc.id, npc]));
+  const removed = new Set(deleted);
+  const merged = npcs
+    .filter((npc) => !removed.has(npc.id))
+    .map((npc) => {
+      const changed = changedById.get(npc.id);
+      changedById.delete(npc.id);
+      return changed ? { ...npc, ...changed } : npc;
+    });
+  return merged.concat([...changedById.values()]);
+};
+
 // Composant principal de gestion des PNJ
 const NPCManager = () => {
   const [npcs, setNpcs] = useState([]);
@@ -13,24 +27,56 @@ const NPCManager = () => {
   const [events, setEvents] = useState([]);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState("dashboard");
+  // Curseur du flux /npcs/changes (null : liste complète à charger)
+  const npcCursor = useRef(null);
 
-  // Chargement initial des données
+  // Chargement complet à chaque (re)connexion au flux en direct, puis mises à jour poussées par le serveur
   useEffect(() => {
-    loadInitialData();
-    // Rafraîchir les données toutes les 10 secondes
-    const interval = setInterval(loadInitialData, 10000);
-    return () => clearInterval(interval);
+    const stream = new EventSource(`${API}/stream?topics=npcs,events,stats`);
+    const parse = (handler) => (message) => handler(JSON.parse(message.data));
+    const reload = () => {
+      npcCursor.current = null;
+      loadInitialData();
+    };
+    stream.addEventListener("hello", reload);
+    // Trop de modifications d'un coup (populate, routine) ou curseur perdu côté serveur
+    stream.addEventListener("resync", reload);
+    stream.addEventListener("npc", parse((npc) => setNpcs((current) => applyNpcChanges(current, [npc], []))));
+    stream.addEventListener("npc_deleted", parse(({ id }) => setNpcs((current) => applyNpcChanges(current, [], [id]))));
+    stream.addEventListener("event", parse((event) => setEvents((current) => [event, ...current].slice(0, 20))));
+    stream.addEventListener("stats", parse(setStats));
+    // "dropped" (client trop lent) : le serveur ferme le flux, le navigateur se reconnecte seul
+    return () => stream.close();
   }, []);
 
+  // Seuls les PNJ modifiés depuis le dernier appel sont téléchargés ; liste complète au premier
+  // chargement ou quand le serveur demande une resynchronisation
+  const syncNpcs = async () => {
+    if (npcCursor.current !== null) {
+      const { data } = await axios.get(`${API}/npcs/changes`, { params: { since: npcCursor.current } });
+      if (!data.resync) {
+        npcCursor.current = data.cursor;
+        if (data.changes.length || data.deleted.length) {
+          setNpcs((current) => applyNpcChanges(current, data.changes, data.deleted));
+        }
+        return;
+      }
+    }
+    // Curseur lu avant la liste : les modifications faites entre les deux seront renvoyées
+    const { data: feed } = await axios.get(`${API}/npcs/changes`);
+    const { data: allNpcs } = await axios.get(`${API}/npcs`);
+    npcCursor.current = feed.cursor;
+    setNpcs(allNpcs);
+  };
+
   const loadInitialData = async () => {
     try {
-      const [npcsRes, statsRes, eventsRes] = await Promise.all([
-        axios.get(`${API}/npcs`),
+      const [, statsRes, eventsRes] = await Promise.all([
+        syncNpcs(),
         axios.get(`${API}/stats`),
         axios.get(`${API}/events?limit=20`)
       ]);
       
-      setNpcs(npcsRes.data);
       setStats(statsRes.data);
       setEvents(eventsRes.data);
       setLoading(false);
@@ -213,7 +259,7 @@ const NPCManager = () => {
                         </div>
                         <div>
                           <p><strong>Position:</strong> {npc.current_location.area_name || "Zone inconnue"}</p>
-                          <p><strong>Mémoires:</strong> {npc.short_term_memory.length}</p>
+                          <p><strong>Mémoires:</strong> {(npc.short_term_memory || []).length}</p>
                           <p><strong>Relations:</strong> {Object.keys(npc.relationships).length}</p>
                         </div>
                       </div>
@@ -342,7 +388,7 @@ const NPCManager = () => {
               <div>
                 <h3 className="font-semibold text-green-400 mb-2">Mémoires Récentes</h3>
                 <div className="space-y-1 max-h-32 overflow-y-auto">
-                  {selectedNpc.short_term_memory.slice(-5).map((memory, index) => (
+                  {(selectedNpc.short_term_memory || []).slice(-5).map((memory, index) => (
                     <p key={index} className="text-gray-300">
                       • {memory.description}
                     </p>
@@ -19,6 +19,7 @@ namespace LivingLosSantosAI
         private readonly string backendUrl = "https://7c9a49cc-fad5-4687-bd9e-904acccadd50.preview.emergentagent.com/api";
         private readonly Dictionary<int, string> npcToBackendId = new Dictionary<int, string>();
         private readonly List<Ped> managedNpcs = new List<Ped>();
+        private readonly Dictionary<string, DateTime> nextDecisionAllowed = new Dictionary<string, DateTime>();
         private readonly Random random = new Random();
         
         private DateTime lastRoutineCheck = DateTime.Now;
@@ -243,6 +244,11 @@ namespace LivingLosSantosAI
                     if (npcToBackendId.ContainsKey(ped.Handle))
                     {
                         var backendId = npcToBackendId[ped.Handle];
+                        
+                        // Respecter le rythme imposé par le budget IA du backend
+                        if (nextDecisionAllowed.TryGetValue(backendId, out var allowedAt) && DateTime.Now < allowedAt)
+                            continue;
+                        
                         await ProcessNpcDecision(ped, backendId);
                     }
                 }
@@ -275,6 +281,12 @@ namespace LivingLosSantosAI
                     var decisionData = await response.Content.ReadAsStringAsync();
                     var decision = JsonConvert.DeserializeObject<dynamic>(decisionData);
                     
+                    if (decision.pacing != null)
+                    {
+                        double interval = (double)decision.pacing.min_decision_interval_s;
+                        nextDecisionAllowed[backendId] = DateTime.Now.AddSeconds(interval);
+                    }
+                    
                     // Appliquer la décision au PNJ
                     await ApplyDecisionToNpc(ped, decision);
                 }
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from backend.admission import AdmissionController, Overloaded
+
+
+def test_admits_up_to_max_in_flight_then_queues():
+    async def scenario():
+        controller = AdmissionController("test", max_in_flight=2, max_queue=4, queue_timeout=1.0)
+        first, second = await controller.acquire(), await controller.acquire()
+        assert controller.in_flight == 2
+
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 1
+        # Place transmise telle quelle : in_flight ne bouge pas
+        first.release()
+        third = await waiting
+        assert controller.in_flight == 2 and controller.queue_depth == 0
+
+        for slot in (second, third, third):
+            slot.release()
+        assert controller.in_flight == 0
+        assert controller.stats()["admitted"] == 3 and controller.stats()["queued"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_queue_full_is_shed_immediately():
+    async def scenario():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=1, queue_timeout=1.0)
+        slot = await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        assert shed.value.reason == "queue_full"
+        assert shed.value.retry_after >= 1
+        assert controller.counters["shed"] == {"queue_full": 1, "queue_timeout": 0}
+
+        slot.release()
+        (await waiting).release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_drops_the_waiter():
+    async def scenario():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=4, queue_timeout=0.05)
+        slot = await controller.acquire()
+        with pytest.raises(Overloaded) as shed:
+            await controller.acquire()
+        assert shed.value.reason == "queue_timeout"
+        assert controller.queue_depth == 0
+        assert controller.counters["shed"]["queue_timeout"] == 1
+
+        slot.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=4, queue_timeout=1.0)
+        slot = await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert controller.queue_depth == 0
+
+        slot.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_handed_to_cancelled_waiter_is_passed_on():
+    async def scenario():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=4, queue_timeout=1.0)
+        slot = await controller.acquire()
+        abandoned = asyncio.ensure_future(controller.acquire())
+        next_in_line = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 2
+
+        # Annulation en route quand la place lui est transmise
+        abandoned.cancel()
+        slot.release()
+        with pytest.raises(asyncio.CancelledError):
+            await abandoned
+        passed_on = await asyncio.wait_for(next_in_line, 0.5)
+        assert controller.in_flight == 1 and controller.queue_depth == 0
+
+        passed_on.release()
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_context_manager_releases_on_error():
+    async def scenario():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=0)
+        with pytest.raises(RuntimeError):
+            async with await controller.acquire():
+                raise RuntimeError("traitement en échec")
+        assert controller.in_flight == 0
+        (await controller.acquire()).release()
+
+    asyncio.run(scenario())
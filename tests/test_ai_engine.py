@@ -0,0 +1,180 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.ai_engine import AIEngine
+from backend.llm_providers import FakeProvider, LLMProviderError, LLMStream
+from backend.models import NPC, DecisionRequest, DecisionResponse, Location, NPCPersonality, NPCType
+
+
+def make_engine(response=None) -> AIEngine:
+    """Moteur dont toutes les décisions partent vers le LLM ; `response` remplace la réponse simulée"""
+    provider = FakeProvider(latency_ms=1, latency_dist="constant")
+    if response is not None:
+        provider.render = lambda rng: response
+    engine = AIEngine(provider)
+    engine.router.score = lambda npc, request: 10.0
+    return engine
+
+
+def make_request():
+    npc = NPC(name="Test", npc_type=NPCType.CIVILIAN, personality=NPCPersonality(),
+              current_location=Location(x=0.0, y=0.0, z=30.0))
+    return npc, DecisionRequest(npc_id=npc.id, context={"situation": "test"}, time_of_day=12)
+
+
+async def collect(engine: AIEngine, npc: NPC, request: DecisionRequest):
+    return [event async for event in engine.stream_decision(npc, request)]
+
+
+def test_stream_emits_fields_then_the_same_decision_as_complete():
+    async def scenario():
+        engine = make_engine()
+        npc, request = make_request()
+        events = await collect(engine, npc, request)
+        fields = {event[1]: event[2] for event in events if event[0] == "field"}
+        assert "action" in fields
+        assert events[-1][0] == "decision"
+        decision = events[-1][1]
+        assert isinstance(decision, DecisionResponse)
+        assert decision.action == fields["action"]
+        # Dialogue d'ambiance tiré au hasard : comparé hors dialogue
+        complete = await engine.make_decision(npc, request)
+        assert decision.model_dump(exclude={"dialogue"}) == complete.model_dump(exclude={"dialogue"})
+        assert not engine.fallbacks
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("target_location", [
+    "derrière la voiture",
+    {"x": "loin", "y": 0.0, "z": 30.0},
+    {"x": 1.0},
+])
+def test_stream_malformed_fields_fall_back_to_parse_error(target_location):
+    async def scenario():
+        response = json.dumps({"action": "fuir", "target_location": target_location, "reasoning": "danger"})
+        engine = make_engine(response)
+        npc, request = make_request()
+        events = await collect(engine, npc, request)
+        assert [event[0] for event in events].count("decision") == 1
+        assert isinstance(events[-1][1], DecisionResponse)
+        assert engine.fallbacks == {"parse_error": 1}
+
+        # Même issue sans flux
+        decision = await engine.make_decision(npc, request)
+        assert isinstance(decision, DecisionResponse)
+        assert engine.fallbacks == {"parse_error": 2}
+
+    asyncio.run(scenario())
+
+
+def test_stream_cut_after_malformed_fields_falls_back_to_parse_error():
+    async def scenario():
+        engine = make_engine()
+
+        def broken_stream(model, messages, max_tokens, temperature):
+            async def chunks():
+                yield '{"action": "fuir", "target_location": "ici", '
+                raise LLMProviderError("connexion coupée")
+            return LLMStream(chunks())
+
+        engine.provider.stream = broken_stream
+        npc, request = make_request()
+        events = await collect(engine, npc, request)
+        assert events[-1][0] == "decision"
+        assert isinstance(events[-1][1], DecisionResponse)
+        assert engine.fallbacks == {"parse_error": 1}
+
+    asyncio.run(scenario())
+
+
+def make_hedging_engine(first_delay: float):
+    """Première requête lente, la suivante immédiate ; les mouvements du budget sont relevés"""
+    engine = make_engine()
+    engine.hedging = True
+    for _ in range(10):
+        engine.latencies.add(True, 0.01)
+    calls, moves = [], []
+
+    async def call_provider(call):
+        calls.append(call)
+        if len(calls) == 1:
+            await asyncio.sleep(first_delay)
+        return json.dumps({"action": "marcher", "reasoning": "calme"}), (100, 50)
+
+    engine._call_provider = call_provider
+    governor = engine.governor
+    commit, release = governor.commit, governor.release
+
+    def recording_commit(plan, prompt_tokens, completion_tokens):
+        moves.append(("commit", plan.reserved, prompt_tokens, completion_tokens))
+        commit(plan, prompt_tokens, completion_tokens)
+
+    def recording_release(plan):
+        moves.append(("release", plan.reserved))
+        release(plan)
+
+    governor.commit, governor.release = recording_commit, recording_release
+    return engine, calls, moves
+
+
+def test_hedge_is_reserved_and_charged_through_the_governor():
+    async def scenario():
+        engine, calls, moves = make_hedging_engine(first_delay=0.5)
+        npc, request = make_request()
+        decision = await engine.make_decision(npc, request)
+        assert decision.action == "marcher"
+        assert len(calls) == 2 and engine.hedges_won == 1
+        plan = calls[0].plan
+        # Requête doublée perdante coupée en vol : réservation conservée ; gagnante : consommation réelle
+        assert sorted(moves) == sorted([
+            ("commit", plan.reserved, calls[0].prompt_tokens, plan.max_tokens),
+            ("commit", plan.reserved, 100, 50),
+        ])
+
+    asyncio.run(scenario())
+
+
+def test_no_hedge_once_the_budget_drops():
+    async def scenario():
+        engine, calls, moves = make_hedging_engine(first_delay=0.1)
+        npc, request = make_request()
+        plan = engine.governor.plan
+
+        def plan_then_drain(*args, **kwargs):
+            result = plan(*args, **kwargs)
+            engine.governor.bucket._tokens = 0
+            return result
+
+        engine.governor.plan = plan_then_drain
+        decision = await engine.make_decision(npc, request)
+        assert decision.action == "marcher"
+        assert len(calls) == 1 and engine.hedges_launched == 0
+        assert engine.governor.hedges_refused == 1
+        assert moves == [("commit", calls[0].plan.reserved, 100, 50)]
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_call_releases_the_hedge_reservation():
+    async def scenario():
+        engine, calls, moves = make_hedging_engine(first_delay=0.5)
+
+        async def slow(call):
+            calls.append(call)
+            await asyncio.sleep(0.5)
+
+        engine._call_provider = slow
+        npc, request = make_request()
+        task = asyncio.ensure_future(engine.make_decision(npc, request))
+        await asyncio.sleep(0.1)
+        assert len(calls) == 2
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        reserved = calls[0].plan.reserved
+        assert moves == [("release", reserved), ("release", reserved)]
+
+    asyncio.run(scenario())
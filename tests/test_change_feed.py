@@ -0,0 +1,189 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from backend.change_feed import ChangeFeed
+
+
+def make_feed(settle_seconds: float = 0.0):
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    return ChangeFeed(db, tombstone_retention_hours=1, settle_seconds=settle_seconds), db.npcs
+
+
+async def write(feed: ChangeFeed, npcs, npc_id: str, age_seconds: float = 60.0) -> int:
+    """Écriture d'un PNJ datée de `age_seconds` dans le passé, retourne son numéro"""
+    stamp = await feed.stamp()
+    stamp["changed_at"] = datetime.utcnow() - timedelta(seconds=age_seconds)
+    await npcs.update_one({"id": npc_id}, {"$set": {"id": npc_id, "version": 1, **stamp}}, upsert=True)
+    return stamp["change_seq"]
+
+
+def test_resync_without_cursor():
+    async def scenario():
+        feed, npcs = make_feed()
+        await write(feed, npcs, "a")
+        result = await feed.changes(npcs, None)
+        assert result["resync"]
+        assert result["cursor"] == 1
+        assert result["changes"] == [] and result["deleted"] == []
+
+    asyncio.run(scenario())
+
+
+def test_resync_when_cursor_below_floor():
+    async def scenario():
+        feed, npcs = make_feed()
+        await write(feed, npcs, "a")
+        await feed.record_deletion("a")
+        # Pierre tombale expirée : le plancher passe à son numéro
+        await feed.tombstones.update_many({}, {"$set": {"changed_at": datetime.utcnow() - timedelta(hours=2)}})
+        await write(feed, npcs, "b")
+        result = await feed.changes(npcs, 1)
+        assert result["resync"]
+        assert result["cursor"] == 3
+        assert (await feed.current())["floor"] == 2
+        assert await feed.tombstones.count_documents({}) == 0
+
+        # Curseur au plancher : toujours valide
+        result = await feed.changes(npcs, 2)
+        assert not result["resync"]
+        assert [document["id"] for document in result["changes"]] == ["b"]
+
+    asyncio.run(scenario())
+
+
+def test_resync_when_cursor_ahead_of_counter():
+    async def scenario():
+        feed, npcs = make_feed()
+        await write(feed, npcs, "a")
+        # Curseur d'une autre base (au-delà du bloc réservé)
+        result = await feed.changes(npcs, feed.block_size + 1)
+        assert result["resync"]
+        assert result["cursor"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_resync_cursor_stays_before_unsettled_writes():
+    async def scenario():
+        feed, npcs = make_feed(settle_seconds=5.0)
+        await write(feed, npcs, "a", age_seconds=60)
+        await write(feed, npcs, "b", age_seconds=0)
+        result = await feed.changes(npcs, None)
+        assert result["resync"]
+        # Ni le compteur (bloc réservé), ni « b », pas encore stable
+        assert result["cursor"] == 1
+        assert [document["id"] for document in (await feed.changes(npcs, result["cursor"]))["changes"]] == ["b"]
+
+    asyncio.run(scenario())
+
+
+def test_stamps_reserve_numbers_by_block(monkeypatch):
+    async def scenario():
+        feed, npcs = make_feed()
+        feed.block_size = 10
+        reserve = feed.reserve
+        reserved = []
+
+        async def counting(count=1):
+            reserved.append(count)
+            return await reserve(count)
+
+        monkeypatch.setattr(feed, "reserve", counting)
+        seqs = [(await feed.stamp())["change_seq"] for _ in range(12)]
+        seqs += [stamp["change_seq"] for stamp in await feed.stamps(3)]
+        assert seqs == list(range(1, 16))
+        assert reserved == [10, 10]
+
+        # Bloc trop vieux : le reste est abandonné
+        feed._block_reserved_at -= feed.block_seconds
+        assert (await feed.stamp())["change_seq"] == 21
+        assert reserved == [10, 10, 10]
+
+        # Lot plus grand qu'un bloc : une réservation à sa taille
+        stamps = await feed.stamps(25)
+        assert [stamp["change_seq"] for stamp in stamps] == list(range(31, 56))
+        assert reserved[-1] == 25
+
+    asyncio.run(scenario())
+
+
+def test_changes_and_tombstones_in_sequence_order():
+    async def scenario():
+        feed, npcs = make_feed()
+        await write(feed, npcs, "a")
+        await write(feed, npcs, "b")
+        await feed.record_deletion("c")
+        await write(feed, npcs, "a")
+        result = await feed.changes(npcs, 0)
+        assert not result["resync"]
+        assert [document["id"] for document in result["changes"]] == ["b", "a"]
+        assert result["deleted"] == ["c"]
+        assert result["cursor"] == 4
+        assert not result["more"]
+
+        # Rien de nouveau depuis le curseur
+        result = await feed.changes(npcs, 4)
+        assert result["changes"] == [] and result["deleted"] == []
+        assert result["cursor"] == 4
+
+    asyncio.run(scenario())
+
+
+def test_cursor_stops_before_unsettled_entries():
+    async def scenario():
+        feed, npcs = make_feed(settle_seconds=5.0)
+        await write(feed, npcs, "a", age_seconds=60)
+        await write(feed, npcs, "b", age_seconds=0)
+        await write(feed, npcs, "c", age_seconds=60)
+        result = await feed.changes(npcs, 0)
+        # Tout est envoyé, mais le curseur ne dépasse pas « b »
+        assert [document["id"] for document in result["changes"]] == ["a", "b", "c"]
+        assert result["cursor"] == 1
+
+        result = await feed.changes(npcs, result["cursor"])
+        assert [document["id"] for document in result["changes"]] == ["b", "c"]
+        assert result["cursor"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_paging_with_more():
+    async def scenario():
+        feed, npcs = make_feed()
+        for index in range(5):
+            await write(feed, npcs, f"npc-{index}")
+        await feed.record_deletion("gone")
+
+        seen, deleted, cursor, pages = [], [], 0, 0
+        while True:
+            result = await feed.changes(npcs, cursor, limit=2)
+            seen += [document["id"] for document in result["changes"]]
+            deleted += result["deleted"]
+            cursor = result["cursor"]
+            pages += 1
+            if not result["more"]:
+                break
+        assert pages == 3
+        assert seen == [f"npc-{index}" for index in range(5)]
+        assert deleted == ["gone"]
+        assert cursor == 6
+
+    asyncio.run(scenario())
+
+
+def test_fields_projection_keeps_feed_fields():
+    async def scenario():
+        feed, npcs = make_feed()
+        await write(feed, npcs, "a")
+        await npcs.update_one({"id": "a"}, {"$set": {"health": 80, "name": "Témoin"}})
+        result = await feed.changes(npcs, 0, fields=["health"])
+        document = result["changes"][0]
+        assert document["health"] == 80
+        assert "name" not in document and "_id" not in document
+        assert document["id"] == "a" and document["version"] == 1 and document["change_seq"] == 1
+
+    asyncio.run(scenario())
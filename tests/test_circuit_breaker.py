@@ -0,0 +1,147 @@
+import asyncio
+import types
+
+import pytest
+
+from backend import circuit_breaker
+from backend.ai_engine import AIEngine
+from backend.circuit_breaker import CircuitBreaker
+from backend.llm_providers import FakeProvider
+from backend.models import NPC, DecisionRequest, Location, NPCPersonality, NPCType
+from backend.token_governor import TokenGovernor
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge du disjoncteur avancée à la main"""
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_opens_on_error_rate(clock):
+    breaker = CircuitBreaker(min_calls=4, error_rate_threshold=0.5)
+    for _ in range(2):
+        breaker.record_success(0.1)
+    breaker.record_failure(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure(0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_opens_on_p95_latency(clock):
+    breaker = CircuitBreaker(min_calls=10, p95_latency_threshold=2.0)
+    for _ in range(9):
+        breaker.record_success(3.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_success(3.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def opened(clock, **kwargs) -> CircuitBreaker:
+    breaker = CircuitBreaker(min_calls=1, open_seconds=15.0, **kwargs)
+    breaker.record_failure(0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_half_open_after_open_seconds(clock):
+    breaker = opened(clock)
+    clock[0] += 14.9
+    assert not breaker.allow()
+    clock[0] += 0.2
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Une seule sonde à la fois
+    assert not breaker.allow()
+
+
+def test_probe_success_closes(clock):
+    breaker = opened(clock)
+    clock[0] += 15.0
+    assert breaker.allow()
+    breaker.record_success(0.2)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_probe_failure_reopens(clock):
+    breaker = opened(clock)
+    clock[0] += 15.0
+    assert breaker.allow()
+    breaker.record_failure(0.2)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock[0] += 15.0
+    assert breaker.allow()
+
+
+def test_released_probe_can_be_retaken(clock):
+    breaker = opened(clock)
+    clock[0] += 15.0
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+def make_engine(latency_ms: float) -> AIEngine:
+    """Moteur dont toutes les décisions partent vers le LLM, disjoncteur prêt à sonder"""
+    engine = AIEngine(FakeProvider(latency_ms=latency_ms, latency_dist="constant"))
+    engine.router.score = lambda npc, request: 10.0
+    engine.breaker = CircuitBreaker(min_calls=1, open_seconds=0.0)
+    engine.breaker.record_failure(0.1)
+    # Petit budget : une réservation non rendue se voit sur le solde
+    engine.governor = TokenGovernor(6000)
+    return engine
+
+
+def make_request():
+    npc = NPC(name="Test", npc_type=NPCType.CIVILIAN, personality=NPCPersonality(),
+              current_location=Location(x=0.0, y=0.0, z=30.0))
+    return npc, DecisionRequest(npc_id=npc.id, context={"situation": "test"}, time_of_day=12)
+
+
+def test_cancelled_probe_releases_slot_and_reservation():
+    async def scenario():
+        engine = make_engine(latency_ms=10000)
+        npc, request = make_request()
+        task = asyncio.ensure_future(engine.make_decision(npc, request))
+        await asyncio.sleep(0.05)
+        assert engine.breaker.state == CircuitBreaker.HALF_OPEN
+        assert engine.governor.remaining_ratio() < 0.99
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert engine.governor.remaining_ratio() > 0.99
+        assert engine.breaker.allow()
+
+    asyncio.run(scenario())
+
+
+def test_probe_decision_closes_breaker():
+    async def scenario():
+        engine = make_engine(latency_ms=1)
+        npc, request = make_request()
+        await engine.make_decision(npc, request)
+        assert engine.breaker.state == CircuitBreaker.CLOSED
+        assert not engine.fallbacks
+
+    asyncio.run(scenario())
+
+
+def test_stream_closed_mid_response_releases_probe():
+    async def scenario():
+        engine = make_engine(latency_ms=1)
+        npc, request = make_request()
+        events = engine.stream_decision(npc, request)
+        async for event in events:
+            assert event[0] == "field"
+            break
+        assert engine.breaker.state == CircuitBreaker.HALF_OPEN
+        # Client parti après le premier champ
+        await events.aclose()
+        assert engine.governor.remaining_ratio() > 0.99
+        assert engine.breaker.allow()
+
+    asyncio.run(scenario())
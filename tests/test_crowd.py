@@ -0,0 +1,73 @@
+import math
+
+from backend.crowd import assign_role, cluster_npcs, derive_member_decision
+from backend.models import NPC, ActivityType, DecisionResponse, Location, NPCMood, NPCPersonality, NPCType
+
+
+def make_npc(name: str, x: float, y: float = 0.0, z: float = 30.0, npc_type: NPCType = NPCType.CIVILIAN,
+             mood: NPCMood = NPCMood.NEUTRAL, stress_level: int = 0) -> NPC:
+    return NPC(name=name, npc_type=npc_type, personality=NPCPersonality(), current_mood=mood,
+               stress_level=stress_level, current_activity=ActivityType.WALKING,
+               current_location=Location(x=x, y=y, z=z))
+
+
+def names(clusters):
+    return sorted(sorted(npc.name for npc in cluster) for cluster in clusters)
+
+
+def test_chain_of_neighbours_forms_one_group_across_cells():
+    # Chaque voisin à 10 m du précédent, les extrémités à 40 m : une seule chaîne
+    npcs = [make_npc(f"n{index}", x=-20.0 + index * 10) for index in range(5)]
+    npcs.append(make_npc("isolé", x=200.0))
+    assert names(cluster_npcs(npcs, radius=15.0)) == [["isolé"], ["n0", "n1", "n2", "n3", "n4"]]
+
+
+def test_distance_is_three_dimensional():
+    npcs = [make_npc("sol", x=0.0), make_npc("toit", x=0.0, z=60.0)]
+    assert len(cluster_npcs(npcs, radius=15.0)) == 2
+
+
+def test_only_npcs_in_the_same_state_are_grouped():
+    npcs = [
+        make_npc("a", x=0.0),
+        make_npc("policier", x=1.0, npc_type=NPCType.POLICE),
+        make_npc("apeuré", x=2.0, mood=NPCMood.SCARED),
+        make_npc("stressé", x=3.0, stress_level=80),
+        make_npc("b", x=4.0, stress_level=20),
+    ]
+    assert names(cluster_npcs(npcs)) == [["a", "b"], ["apeuré"], ["policier"], ["stressé"]]
+
+
+def test_leader_is_the_member_closest_to_the_centre():
+    npcs = [make_npc("bord", x=0.0), make_npc("centre", x=5.0), make_npc("autre bord", x=10.0)]
+    (group,) = cluster_npcs(npcs)
+    assert group[0].name == "centre"
+
+
+def test_roles_cycle_after_the_leader():
+    assert assign_role(NPCType.POLICE, 0) == "chef_d_equipe"
+    assert [assign_role(NPCType.CRIMINAL, index) for index in range(1, 5)] == \
+        ["complice", "guetteur", "complice", "guetteur"]
+
+
+def test_member_targets_spread_in_rings_and_only_the_leader_speaks():
+    decision = DecisionResponse(action="fuir", target_location=Location(x=100.0, y=50.0, z=30.0, area_name="Port"),
+                                dialogue="Courez !", reasoning="explosion")
+    members = [make_npc(f"m{index}", x=float(index)) for index in range(10)]
+    derived = [derive_member_decision(decision, member, index, len(members), spacing=2.5)
+               for index, member in enumerate(members)]
+
+    assert derived[0].target_location == decision.target_location
+    assert derived[0].dialogue == "Courez !"
+    assert all(d.dialogue is None and d.action == "fuir" for d in derived[1:])
+    distances = [math.hypot(d.target_location.x - 100.0, d.target_location.y - 50.0) for d in derived[1:]]
+    assert [round(distance, 6) for distance in distances] == [2.5] * 8 + [5.0]
+    assert len({(round(d.target_location.x, 6), round(d.target_location.y, 6)) for d in derived}) == 10
+    assert all(d.target_location.area_name == "Port" for d in derived)
+    assert "10 PNJ, rôle: participant" in derived[1].reasoning
+
+
+def test_member_without_target_keeps_none():
+    decision = DecisionResponse(action="dormir", reasoning="nuit")
+    member = make_npc("m", x=0.0)
+    assert derive_member_decision(decision, member, 3, 4).target_location is None
@@ -0,0 +1,94 @@
+import json
+
+from backend.ai_engine import AIEngine
+from backend.dialogue_bank import DialogueBank, area_class, build_from_records, key_from_prompt, time_bucket
+from backend.llm_providers import FakeProvider
+from backend.models import NPC, DecisionRequest, Location, NPCMood, NPCPersonality, NPCType
+
+
+def test_time_buckets_and_area_classes():
+    assert [time_bucket(hour) for hour in (3, 7, 12, 18, 21)] == \
+        ["night", "morning_rush", "day", "evening_rush", "evening"]
+    assert area_class("Downtown Los Santos") == "downtown"
+    assert area_class("Vinewood Hills") == "vinewood"
+    assert area_class("") == "other"
+
+
+def test_most_specific_level_wins():
+    bank = DialogueBank(seed=1)
+    bank.add(("civilian", "happy", "marcher", "day", "downtown"), "Belle journée.")
+    bank.add(("civilian", "*", "marcher", "*", "*"), "On avance.")
+    bank.add(("civilian", "*", "*", "*", "*"), "Hm.")
+
+    assert bank.pick("a", "civilian", "happy", "marcher", 12, "Downtown") == "Belle journée."
+    # Humeur différente : un seul champ en joker ne suffit pas, deux non plus, trois oui
+    assert bank.pick("a", "civilian", "angry", "marcher", 12, "Downtown") == "On avance."
+    assert bank.pick("a", "civilian", "angry", "dormir", 3, "Grove") == "Hm."
+    assert bank.pick("a", "police", "happy", "marcher", 12, "Downtown") is None
+    assert bank.stats()["hit_rate"] == 0.75
+
+
+def test_recent_lines_are_not_repeated_while_others_remain():
+    bank = DialogueBank(recent_window=2, seed=3)
+    key = ("civilian", "*", "*", "*", "*")
+    for line in ("Un.", "Deux.", "Trois."):
+        bank.add(key, line)
+    picks = [bank.pick("a", "civilian", "neutral", "marcher", 12, "") for _ in range(30)]
+    assert all(len({*picks[i:i + 3]}) == 3 for i in range(len(picks) - 2))
+    assert bank.repeats == 0
+
+    bank = DialogueBank(recent_window=5, seed=3)
+    bank.add(key, "Seule.")
+    bank.add(key, "Autre.")
+    first, second = (bank.pick("b", "civilian", "neutral", "marcher", 12, "") for _ in range(2))
+    # Tout a été dit : la plus ancienne revient
+    assert bank.pick("b", "civilian", "neutral", "marcher", 12, "") == first
+    assert bank.repeats == 1
+
+
+def test_tracked_npcs_are_bounded():
+    bank = DialogueBank(max_tracked_npcs=2)
+    bank.add(("civilian", "*", "*", "*", "*"), "Salut.")
+    for npc_id in ("a", "b", "c"):
+        bank.pick(npc_id, "civilian", "neutral", "marcher", 12, "")
+    assert list(bank._recent) == ["b", "c"]
+
+
+def test_lines_are_deduplicated_and_survive_a_round_trip(tmp_path):
+    bank = DialogueBank()
+    bank.add(("civilian", "happy", "marcher", "day", "beach"), "  Quel soleil !  ")
+    bank.add(("worker", "*", "*", "*", "*"), "Quel soleil !")
+    bank.add(("worker", "*", "*", "*", "*"), "")
+    assert bank.lines == ["Quel soleil !"]
+
+    path = tmp_path / "bank.json"
+    bank.save(path)
+    loaded = DialogueBank.load(path)
+    assert loaded.lines == bank.lines and loaded.index == bank.index
+    assert DialogueBank.load(tmp_path / "absent.json").lines == []
+
+
+def record(prompt: str, response: dict) -> str:
+    return json.dumps({"messages": [{"role": "user", "content": prompt}], "response": json.dumps(response)})
+
+
+def test_build_from_recorded_prompts(tmp_path):
+    engine = AIEngine(FakeProvider(latency_ms=1))
+    npc = NPC(name="Témoin", npc_type=NPCType.SHOPKEEPER, personality=NPCPersonality(), current_mood=NPCMood.HAPPY,
+              current_location=Location(x=0.0, y=0.0, z=30.0, area_name="Vinewood Hills"))
+    ambient = engine._build_context_prompt(npc, DecisionRequest(npc_id=npc.id, context={}, time_of_day=20), [])
+    player = engine._build_context_prompt(
+        npc, DecisionRequest(npc_id=npc.id, context={"player_interaction": True}, time_of_day=20), []
+    )
+    assert key_from_prompt(ambient, "acheter") == ("shopkeeper", "happy", "acheter", "evening", "vinewood")
+
+    path = tmp_path / "records.jsonl"
+    path.write_text("\n".join([
+        record(ambient, {"action": "acheter", "dialogue": "Bonne soirée !", "reasoning": "client"}),
+        record(ambient, {"action": "acheter", "reasoning": "sans réplique"}),
+        record(player, {"action": "parler", "dialogue": "Vous désirez ?", "reasoning": "joueur"}),
+        "",
+    ]), encoding="utf-8")
+    bank = build_from_records([str(path)])
+    assert bank.lines == ["Bonne soirée !"]
+    assert list(bank.index) == [("shopkeeper", "happy", "acheter", "evening", "vinewood")]
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.event_store import EventStore, SpatialTimeIndex, epoch_seconds, hour_bucket
+from backend.models import GameEvent, Location
+
+
+def make_event(x: float, y: float, age_seconds: float = 0.0, event_type: str = "crime", severity: int = 5,
+               area: str = "Downtown", now: datetime = None) -> GameEvent:
+    now = now or datetime.utcnow()
+    return GameEvent(event_type=event_type, description=event_type, participants=[], severity=severity,
+                     location=Location(x=x, y=y, z=30.0, area_name=area),
+                     timestamp=now - timedelta(seconds=age_seconds))
+
+
+def test_epoch_seconds_and_hour_bucket():
+    assert epoch_seconds(datetime(1970, 1, 2)) == 86400
+    assert hour_bucket(datetime(2024, 5, 1, 13, 45, 12, 7)) == datetime(2024, 5, 1, 13)
+
+
+def test_query_filters_by_distance_age_type_and_severity():
+    index = SpatialTimeIndex(cell_size=50.0)
+    now = datetime.utcnow()
+    events = {
+        "proche": make_event(10.0, 0.0, age_seconds=30, now=now),
+        "autre case": make_event(-60.0, 40.0, age_seconds=10, now=now),
+        "trop loin": make_event(120.0, 0.0, age_seconds=5, now=now),
+        "trop vieux": make_event(5.0, 5.0, age_seconds=600, now=now),
+        "accident": make_event(0.0, 20.0, age_seconds=20, event_type="accident", severity=2, now=now),
+    }
+    # Arrivée dans l'ordre chronologique, comme en jeu
+    for event in sorted(events.values(), key=lambda event: event.timestamp):
+        index.add(event)
+    by_id = {event.id: name for name, event in events.items()}
+
+    results = index.query(0.0, 0.0, 100.0, since=epoch_seconds(now) - 300, now=epoch_seconds(now))
+    # Les plus récents d'abord, toutes cases confondues
+    assert [by_id[result["id"]] for result in results] == ["autre case", "accident", "proche"]
+    assert results[2]["distance_m"] == 10.0 and results[2]["age_s"] == 30.0
+
+    since = epoch_seconds(now) - 300
+    assert [by_id[r["id"]] for r in index.query(0.0, 0.0, 100.0, since, event_type="crime")] == ["autre case", "proche"]
+    assert [by_id[r["id"]] for r in index.query(0.0, 0.0, 100.0, since, min_severity=3, limit=1)] == ["autre case"]
+
+
+def test_events_older_than_the_horizon_are_pruned():
+    index = SpatialTimeIndex(horizon_seconds=60.0)
+    now = datetime.utcnow()
+    index.add(make_event(0.0, 0.0, age_seconds=120, now=now))
+    index.add(make_event(500.0, 0.0, age_seconds=90, now=now))
+    assert len(index) == 2
+    index.add(make_event(0.0, 0.0, now=now))
+    assert len(index) == 1
+    assert len(index._cells) == 1
+
+
+def test_entries_restore_into_another_index():
+    index = SpatialTimeIndex()
+    seen = []
+    index.listener = lambda kind, payload: seen.append(kind)
+    for age in (30, 10, 20):
+        index.add(make_event(float(age), 0.0, age_seconds=age))
+    entries = index.entries()
+    assert [ts for ts, _ in entries] == sorted(ts for ts, _ in entries)
+    assert seen == ["event"] * 3
+
+    copy = SpatialTimeIndex()
+    assert copy.restore(entries) == 3
+    assert copy.entries() == entries
+
+
+@pytest.fixture
+def store():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from benchmarks.load import patch_mongomock
+    patch_mongomock()
+    return EventStore(mongomock_motor.AsyncMongoMockClient()["test"], recent_horizon_seconds=600)
+
+
+def test_insert_updates_hourly_rollups(store):
+    async def scenario():
+        # Même heure, dates distinctes
+        hour = hour_bucket(datetime.utcnow())
+        await store.insert(make_event(0.0, 0.0, -1, event_type="crime", severity=4, now=hour))
+        await store.insert(make_event(0.0, 0.0, -2, event_type="crime", severity=8, area="Grove Street", now=hour))
+        await store.insert(make_event(0.0, 0.0, -3, event_type="accident", severity=2, area="", now=hour))
+
+        (total,) = await store.rollup_series(hours=1)
+        assert total["count"] == 3 and total["severity_sum"] == 14 and total["max_severity"] == 8
+        summary = await store.summary(hours=1)
+        assert summary["total"] == 3
+        assert summary["by_type"] == {"crime": 2, "accident": 1}
+        assert summary["by_area"] == {"Downtown": 1, "Grove Street": 1, "unknown": 1}
+
+        recent = await store.recent(limit=2)
+        assert [event["event_type"] for event in recent] == ["accident", "crime"]
+        assert "position" not in recent[0] and "hour_bucket" not in recent[0]
+        assert await store.total() == 3
+
+    asyncio.run(scenario())
+
+
+def test_nearby_uses_memory_then_mongo_beyond_the_horizon(store):
+    async def scenario():
+        old = make_event(30.0, 40.0, age_seconds=1800)
+        await store.events.insert_one({**old.model_dump(), "position": [30.0, 40.0]})
+        await store.insert(make_event(0.0, 10.0, age_seconds=60))
+        await store.insert(make_event(900.0, 0.0, age_seconds=60))
+
+        # Fenêtre dans l'horizon : index en mémoire seulement
+        assert [event["distance_m"] for event in await store.nearby(0.0, 0.0, 100.0, seconds=300)] == [10.0]
+        # Au-delà : requête géographique sur Mongo
+        results = await store.nearby(0.0, 0.0, 100.0, seconds=3600)
+        assert [event["distance_m"] for event in results] == [10.0, 50.0]
+        assert isinstance(results[1]["timestamp"], str) and results[1]["age_s"] >= 1800
+
+        # Redémarrage : la fenêtre récente revient depuis Mongo
+        warmed = EventStore(store.db, recent_horizon_seconds=600)
+        assert await warmed.warm() == 2
+        assert len(warmed.nearby_recent(0.0, 0.0, 100.0, 300)) == 1
+
+    asyncio.run(scenario())
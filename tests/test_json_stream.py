@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from backend.json_stream import IncrementalJSONFields
+
+DECISION = {
+    "action": "fuir",
+    "target_location": {"x": 1.5, "y": -2.0, "z": 30.0, "area_name": "Downtown"},
+    "interaction_target": None,
+    "tags": ["danger", {"niveau": 3}],
+    "dialogue": "Il a dit \"cours\" !\nVite, {vite} [maintenant]",
+    "urgency": 8,
+    "reasoning": "coups de feu",
+}
+
+
+def feed_all(chunks):
+    parser = IncrementalJSONFields()
+    completed = []
+    for chunk in chunks:
+        completed += parser.feed(chunk)
+    return parser, completed
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_fields_are_the_same_whatever_the_chunking(size):
+    text = "```json\n" + json.dumps(DECISION, ensure_ascii=False) + "\n```"
+    parser, completed = feed_all(text[i:i + size] for i in range(0, len(text), size))
+    assert parser.done
+    assert parser.fields == DECISION
+    assert [key for key, _ in completed] == list(DECISION)
+
+
+def test_field_is_emitted_as_soon_as_it_is_complete():
+    parser = IncrementalJSONFields()
+    assert parser.feed('Voici : {"action": "fu') == []
+    assert parser.feed('ir", "reasoning": "pas ') == [("action", "fuir")]
+    assert not parser.done
+    assert parser.feed('fini"}') == [("reasoning", "pas fini")]
+    assert parser.done
+
+
+def test_scalar_before_closing_brace():
+    parser, completed = feed_all(['{"urgency": 4', "2}"])
+    assert completed == [("urgency", 42)]
+    assert parser.done
+
+
+def test_malformed_value_is_skipped():
+    parser, completed = feed_all(['{"action": "marcher", "urgency": 4x, "reasoning": "ok"}'])
+    assert parser.fields == {"action": "marcher", "reasoning": "ok"}
+    assert [key for key, _ in completed] == ["action", "reasoning"]
+
+
+def test_text_after_the_object_is_ignored():
+    parser, _ = feed_all(['{"action": "dormir"} {"action": "courir"}'])
+    assert parser.fields == {"action": "dormir"}
+    assert parser.feed(', "reasoning": "trop tard"}') == []
+
+
+def test_empty_object_and_no_object():
+    parser, completed = feed_all(["{}"])
+    assert parser.done and completed == []
+    parser, completed = feed_all(["Je ne peux pas répondre."])
+    assert not parser.done and parser.fields == {}
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from backend.change_feed import ChangeFeed
+from backend.live_stream import LIVE_NPC_FIELDS, LiveBroadcaster, Subscriber
+from backend.models import NPC, Location, Memory, NPCPersonality, NPCType
+
+
+def make_live(page_size: int = 500, max_pages: int = 10, queue_size: int = 64):
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    feed = ChangeFeed(db, settle_seconds=0)
+
+    async def changes(since, fields=None, limit=500):
+        return await feed.changes(db.npcs, since, fields, limit)
+
+    async def stats():
+        return {}
+
+    live = LiveBroadcaster(changes, stats, queue_size=queue_size, page_size=page_size, max_pages=max_pages)
+    return live, feed, db.npcs
+
+
+async def write_npcs(feed: ChangeFeed, npcs, count: int, npc_type: NPCType = NPCType.CIVILIAN,
+                     area: str = "Downtown"):
+    documents = []
+    for index in range(count):
+        npc = NPC(name=f"PNJ {index}", npc_type=npc_type, personality=NPCPersonality(),
+                  current_location=Location(x=0.0, y=0.0, z=30.0, area_name=area),
+                  short_term_memory=[Memory(event_type="decision", description="souvenir")])
+        documents.append({**npc.model_dump(), **await feed.stamp()})
+    await npcs.insert_many(documents)
+    return documents
+
+
+def decode(frames):
+    messages = []
+    for frame in frames:
+        head, data = frame.data.decode("utf-8").split("data: ", 1)
+        messages.append((head.split("\n")[0].removeprefix("event: "), json.loads(data)))
+    return messages
+
+
+def test_first_pass_starts_from_present_then_sends_projected_states():
+    async def scenario():
+        live, feed, npcs = make_live()
+        await write_npcs(feed, npcs, 3)
+        assert await live._npc_frames() == []
+
+        written = await write_npcs(feed, npcs, 2)
+        messages = decode(await live._npc_frames())
+        assert [event for event, _ in messages] == ["npc", "npc"]
+        assert {data["id"] for _, data in messages} == {document["id"] for document in written}
+        for _, data in messages:
+            assert "short_term_memory" not in data and "long_term_memory" not in data
+            assert set(LIVE_NPC_FIELDS) <= set(data)
+
+        # Rien de nouveau : rien à envoyer
+        assert await live._npc_frames() == []
+
+    asyncio.run(scenario())
+
+
+def test_backlog_is_read_page_after_page():
+    async def scenario():
+        live, feed, npcs = make_live(page_size=4, max_pages=3)
+        await live._npc_frames()
+        written = await write_npcs(feed, npcs, 11)
+        messages = decode(await live._npc_frames())
+        assert [data["id"] for _, data in messages] == [document["id"] for document in written]
+        assert live._cursor == written[-1]["change_seq"]
+
+    asyncio.run(scenario())
+
+
+def test_backlog_too_large_sends_resync():
+    async def scenario():
+        live, feed, npcs = make_live(page_size=4, max_pages=2)
+        await live._npc_frames()
+        written = await write_npcs(feed, npcs, 9)
+        messages = decode(await live._npc_frames())
+        assert [event for event, _ in messages] == ["resync"]
+        assert live.counters["resyncs"] == 1
+        # Reprise depuis le présent
+        assert live._cursor == written[-1]["change_seq"]
+        assert await live._npc_frames() == []
+
+    asyncio.run(scenario())
+
+
+def test_lost_cursor_sends_resync():
+    async def scenario():
+        live, feed, npcs = make_live()
+        await live._npc_frames()
+        live._cursor = 10_000
+        messages = decode(await live._npc_frames())
+        assert [event for event, _ in messages] == ["resync"]
+
+    asyncio.run(scenario())
+
+
+def test_dispatch_applies_subscriber_filters():
+    async def scenario():
+        live, feed, npcs = make_live()
+        await live._npc_frames()
+        await write_npcs(feed, npcs, 1, NPCType.POLICE, "Vinewood Hills")
+        await write_npcs(feed, npcs, 1, NPCType.CRIMINAL, "Downtown")
+        everything = Subscriber({"npcs"}, None, set(), 8)
+        police = Subscriber({"npcs"}, None, {"police"}, 8)
+        vinewood = Subscriber({"npcs"}, "vinewood", set(), 8)
+        events_only = Subscriber({"events"}, None, set(), 8)
+        live.subscribers.update({everything, police, vinewood, events_only})
+
+        live._dispatch(await live._npc_frames())
+        assert everything.queue.get_nowait().count(b"event: npc\n") == 2
+        assert police.queue.get_nowait().count(b"\"npc_type\":\"police\"") == 1
+        assert b"criminal" not in vinewood.queue.get_nowait()
+        assert events_only.queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_drops_the_slow_subscriber():
+    async def scenario():
+        live, feed, npcs = make_live(queue_size=1)
+        slow = Subscriber({"npcs"}, None, set(), 1)
+        live.subscribers.add(slow)
+        await live._npc_frames()
+        for _ in range(2):
+            await write_npcs(feed, npcs, 1)
+            live._dispatch(await live._npc_frames())
+
+        assert slow not in live.subscribers
+        assert slow.dropped and slow.closed
+        assert b"event: dropped" in slow.queue.get_nowait()
+        assert live.counters["dropped_subscribers"] == 1
+
+    asyncio.run(scenario())
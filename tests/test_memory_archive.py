@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from backend.memory_archive import LazyMemories, MemoryArchive
+from backend.models import Memory
+
+
+def make_archive() -> MemoryArchive:
+    return MemoryArchive(mongomock_motor.AsyncMongoMockClient()["test"].memories)
+
+
+def memory(index: int, importance: int = 8, when: datetime = datetime(2024, 1, 1)) -> Memory:
+    return Memory(id=f"m{index:02d}", event_type="crime", description=f"souvenir {index}", importance=importance,
+                  timestamp=when + timedelta(minutes=index))
+
+
+def test_should_archive_only_important_memories():
+    assert MemoryArchive.should_archive(memory(0, importance=7))
+    assert not MemoryArchive.should_archive(memory(0, importance=6))
+
+
+def test_recent_is_newest_first_and_per_npc():
+    async def scenario():
+        archive = make_archive()
+        assert await archive.add_many([("a", memory(index)) for index in range(5)] + [("b", memory(9))]) == 6
+        assert await archive.add_many([]) == 0
+        assert [m.id for m in await archive.recent("a")] == ["m04", "m03", "m02"]
+        assert [m.id for m in await archive.recent("b", limit=10)] == ["m09"]
+
+    asyncio.run(scenario())
+
+
+def test_pages_follow_the_cursor_without_gaps():
+    async def scenario():
+        archive = make_archive()
+        # Même date pour deux souvenirs : départagés par l'id
+        same = datetime(2024, 1, 1, 12)
+        memories = [memory(index) for index in range(7)] + [
+            Memory(id="x1", event_type="e", description="d", timestamp=same),
+            Memory(id="x2", event_type="e", description="d", timestamp=same),
+        ]
+        await archive.add_many(("a", m) for m in memories)
+
+        seen, before = [], None
+        while True:
+            page = await archive.page("a", before=before, limit=3)
+            seen += [document["id"] for document in page["memories"]]
+            before = page["next"]
+            if before is None:
+                break
+        assert seen == ["x2", "x1", "m06", "m05", "m04", "m03", "m02", "m01", "m00"]
+
+        important = await archive.page("a", min_importance=7, limit=50)
+        assert len(important["memories"]) == 7 and important["next"] is None
+
+    asyncio.run(scenario())
+
+
+def test_migrate_embedded_is_idempotent_and_clears_documents():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        archive = MemoryArchive(db.memories)
+        await db.npcs.insert_many([
+            {"id": "a", "long_term_memory": [memory(1).model_dump(), memory(2).model_dump()]},
+            {"id": "b", "long_term_memory": []},
+        ])
+        assert await archive.migrate_embedded(db.npcs) == 2
+        assert await db.npcs.count_documents({"long_term_memory": {"$exists": True}}) == 1
+        assert await archive.migrate_embedded(db.npcs) == 0
+
+        # Document réécrit avec les mêmes souvenirs : pas de doublon
+        await db.npcs.update_one({"id": "a"}, {"$set": {"long_term_memory": [memory(1).model_dump()]}})
+        assert await archive.migrate_embedded(db.npcs) == 1
+        assert await db.memories.count_documents({"npc_id": "a"}) == 2
+
+        assert await archive.delete_npc("a") == 2
+
+    asyncio.run(scenario())
+
+
+def test_lazy_memories_read_once_and_only_on_demand():
+    async def scenario():
+        archive = make_archive()
+        await archive.add("a", memory(1))
+        reads = []
+        recent = archive.recent
+
+        async def counting(npc_id, limit):
+            reads.append(npc_id)
+            return await recent(npc_id, limit)
+
+        archive.recent = counting
+        lazy = LazyMemories(archive, "a")
+        assert not lazy.loaded and reads == []
+        assert [m.id for m in await lazy.get()] == ["m01"]
+        await lazy.get()
+        assert lazy.loaded and reads == ["a"]
+
+    asyncio.run(scenario())
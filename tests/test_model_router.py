@@ -0,0 +1,77 @@
+import pytest
+
+from backend.model_router import ModelRouter, ModelTier
+from backend.models import NPC, DecisionRequest, Location, Memory, NPCPersonality, NPCType
+
+
+def make_npc(npc_type: NPCType = NPCType.CIVILIAN, stress_level: int = 0) -> NPC:
+    return NPC(name="Test", npc_type=npc_type, personality=NPCPersonality(), stress_level=stress_level,
+               current_location=Location(x=0.0, y=0.0, z=30.0))
+
+
+def make_request(**context) -> DecisionRequest:
+    return DecisionRequest(npc_id="npc", context=context, time_of_day=12)
+
+
+def test_quiet_context_scores_zero_and_stays_local():
+    router = ModelRouter()
+    tier, score = router.route(make_npc(), make_request(situation="calme"))
+    assert score == 0.0
+    assert tier.name == "local" and tier.model is None
+    assert router.stats()["local"]["decisions"] == 1
+
+
+def test_score_combines_the_signals():
+    router = ModelRouter()
+    npc = make_npc(NPCType.CRIMINAL, stress_level=50)
+    npc.short_term_memory = [Memory(event_type="fusillade", description="tirs", importance=9)] * 4
+    request = make_request(event_severity=5, recent_nearby_events=[{"severity": 10}],
+                           player_interaction=True, police_presence=5)
+    # 4 (gravité 10) + 3 (joueur) + 1 (stress) + 1.5 (police, criminel) + 1.5 (souvenirs, plafonnés)
+    assert router.score(npc, request) == 11.0
+    assert router.route(npc, request)[0].name == "large"
+
+
+@pytest.mark.parametrize("context", [
+    {"event_severity": "haute"},
+    {"event_severity": None, "recent_nearby_events": [{"severity": "grave"}, {"severity": [3]}, "bruit"]},
+    {"recent_nearby_events": "explosion"},
+    {"event_severity": float("nan"), "police_presence": "beaucoup"},
+    {"police_presence": {"agents": 4}},
+])
+def test_non_numeric_client_values_are_ignored(context):
+    assert ModelRouter().score(make_npc(), make_request(**context)) == 0.0
+
+
+def test_numeric_strings_are_coerced_and_severity_is_capped():
+    router = ModelRouter()
+    assert router.score(make_npc(), make_request(event_severity="5")) == 2.0
+    assert router.score(make_npc(), make_request(recent_nearby_events=[{"severity": 50}])) == 4.0
+    assert router.score(make_npc(), make_request(police_presence=-20)) == 0.0
+
+
+def test_high_priority_threshold():
+    router = ModelRouter(high_priority_score=4.0)
+    assert router.is_high_priority(4.0) and not router.is_high_priority(3.9)
+
+
+def test_tiers_from_env(monkeypatch):
+    monkeypatch.setenv("LLM_TIERS", '[{"name": "local", "min_score": 0, "model": null},'
+                                    ' {"name": "only", "min_score": 2, "model": "m", "max_tokens": 100}]')
+    monkeypatch.setenv("LLM_HIGH_PRIORITY_SCORE", "7")
+    router = ModelRouter.from_env()
+    assert [tier.name for tier in router.tiers] == ["local", "only"]
+    assert router.high_priority_score == 7.0
+    assert router.route(make_npc(), make_request(player_interaction=True))[0].name == "only"
+
+
+def test_record_call_feeds_the_stats():
+    tier = ModelTier("small", 1.0, "m", 200, 0.6, 0.002)
+    router = ModelRouter([ModelTier("local", 0.0, None), tier])
+    router.record_call(tier, 0.25, 500)
+    router.record_call(tier, 0.75, 1500)
+    stats = router.stats()["small"]
+    assert stats["llm_calls"] == 2
+    assert stats["avg_latency_ms"] == 500.0
+    assert stats["tokens"] == 2000 and stats["estimated_cost_usd"] == 0.004
+    assert router.stats()["local"]["avg_latency_ms"] is None
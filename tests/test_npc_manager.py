@@ -0,0 +1,208 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from backend.ai_engine import AIEngine
+from backend.llm_providers import FakeProvider
+from backend.models import DecisionResponse, Location, NPCCreate, NPCMood, NPCType, NPCUpdate
+from backend.npc_manager import MAX_WRITE_ATTEMPTS, NPCManager, VersionConflict
+from backend.population import generate_population, insert_population
+from backend.schedules import UnknownScheduleTemplate
+from benchmarks.load import patch_mongomock
+
+
+def make_manager() -> NPCManager:
+    patch_mongomock()
+    db = mongomock_motor.AsyncMongoMockClient()["test"]
+    return NPCManager(db, AIEngine(FakeProvider(latency_ms=1)))
+
+
+def test_ensure_indexes_removes_duplicate_ids():
+    async def scenario():
+        manager = make_manager()
+        documents = generate_population(20, seed=42)
+        await insert_population(manager.npcs_collection, documents)
+        # Même seed : mêmes ids, la copie la plus récente doit rester
+        again = generate_population(20, seed=42)
+        for document in again:
+            document["version"] = 3
+        await insert_population(manager.npcs_collection, again)
+        assert await manager.npcs_collection.count_documents({}) == 40
+
+        assert await manager.ensure_indexes() == 20
+        assert await manager.npcs_collection.count_documents({}) == 20
+        assert await manager.npcs_collection.count_documents({"version": 3}) == 20
+
+        # Index en place : un nouvel appel de populate n'insère plus rien
+        assert await insert_population(manager.npcs_collection, generate_population(20, seed=42)) == 0
+        assert await manager.ensure_indexes() == 0
+
+    asyncio.run(scenario())
+
+
+async def create(manager: NPCManager, x: float = 0.0):
+    return await manager.create_npc(NPCCreate(
+        name="Test", npc_type=NPCType.CIVILIAN, current_location=Location(x=x, y=0.0, z=30.0)
+    ))
+
+
+def test_create_rejects_unknown_schedule_template():
+    async def scenario():
+        manager = make_manager()
+        location = Location(x=0.0, y=0.0, z=30.0)
+        npc = await manager.create_npc(NPCCreate(name="Test", npc_type=NPCType.POLICE, current_location=location))
+        assert npc.schedule_template_id == "police.v1"
+        npc = await manager.create_npc(NPCCreate(name="Test", npc_type=NPCType.POLICE, current_location=location,
+                                                 schedule_template_id="worker.v1"))
+        assert npc.schedule_template_id == "worker.v1"
+
+        unknown = NPCCreate(name="Test", npc_type=NPCType.CIVILIAN, current_location=location,
+                            schedule_template_id="civilian.v9")
+        with pytest.raises(UnknownScheduleTemplate):
+            await manager.create_npc(unknown)
+        # Lot refusé en entier, rien n'est inséré
+        valid = NPCCreate(name="Test", npc_type=NPCType.CIVILIAN, current_location=location)
+        with pytest.raises(UnknownScheduleTemplate):
+            await manager.create_npcs([valid, unknown])
+        assert await manager.npcs_collection.count_documents({}) == 2
+
+    asyncio.run(scenario())
+
+
+def test_update_versioned_reevaluates_on_conflict():
+    async def scenario():
+        manager = make_manager()
+        stale = await create(manager)
+        # Écriture concurrente entre la lecture et l'écriture conditionnelle
+        await manager.update_npc(stale.id, NPCUpdate(current_mood=NPCMood.SCARED))
+        seen = []
+
+        def mutate(npc):
+            seen.append((npc.version, npc.current_mood))
+            return {"$inc": {"stress_level": 10}}
+
+        updated = await manager.update_versioned(stale.id, mutate, npc=stale)
+        assert seen == [(stale.version, NPCMood.NEUTRAL), (stale.version + 1, NPCMood.SCARED)]
+        assert updated.version == stale.version + 2
+        assert updated.current_mood == NPCMood.SCARED
+        assert updated.stress_level == stale.stress_level + 10
+        assert manager.write_stats["conflicts"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_update_versioned_gives_up_after_max_attempts(monkeypatch):
+    async def scenario():
+        manager = make_manager()
+        npc = await create(manager)
+
+        async def always_conflicting(*args, **kwargs):
+            return None
+
+        monkeypatch.setattr(manager.npcs_collection, "find_one_and_update", always_conflicting)
+        with pytest.raises(VersionConflict):
+            await manager.update_versioned(npc.id, lambda current: {"$set": {"health": 50}})
+        assert manager.write_stats["conflicts"] == MAX_WRITE_ATTEMPTS
+        assert manager.write_stats["retries_exhausted"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_bulk_decisions_report_conflicts_per_npc(monkeypatch):
+    async def scenario():
+        manager = make_manager()
+        # PNJ éloignés : pas de foule, une décision chacun
+        first, second = await create(manager, x=0.0), await create(manager, x=1000.0)
+        update_versioned = manager.update_versioned
+
+        async def conflicting(npc_id, mutate, npc=None):
+            if npc_id == first.id:
+                raise VersionConflict(npc_id, 0)
+            return await update_versioned(npc_id, mutate, npc=npc)
+
+        monkeypatch.setattr(manager, "update_versioned", conflicting)
+        result = await manager.process_bulk_decisions([
+            {"npc_id": first.id, "context": {"situation": "test"}},
+            {"npc_id": second.id, "context": {"situation": "test"}},
+        ])
+        assert result["results"][0] == {"npc_id": first.id, "error": "conflict"}
+        assert result["results"][1]["npc_id"] == second.id
+        assert result["results"][1]["decision"]["action"]
+
+    asyncio.run(scenario())
+
+
+def test_nearby_npcs_use_position_and_keep_3d_distance():
+    async def scenario():
+        manager = make_manager()
+        await manager.ensure_indexes()
+        center = await create(manager, x=0.0)
+        near = await create(manager, x=60.0)
+        await create(manager, x=150.0)
+        # Même point du plan, 200 m plus haut : hors de la sphère
+        high = await create(manager, x=10.0)
+        await manager.update_npc(high.id, NPCUpdate(current_location=Location(x=10.0, y=0.0, z=230.0)))
+
+        nearby = await manager.get_nearby_npcs(Location(x=0.0, y=0.0, z=30.0), radius=100.0)
+        assert {npc.id for npc in nearby} == {center.id, near.id}
+
+        npc, nearby_ids = await manager._load_decision_state(center.id)
+        assert npc.id == center.id
+        assert nearby_ids == [near.id]
+
+    asyncio.run(scenario())
+
+
+def test_ensure_indexes_backfills_positions():
+    async def scenario():
+        manager = make_manager()
+        documents = generate_population(5, seed=7)
+        for document in documents:
+            del document["position"]
+        await insert_population(manager.npcs_collection, documents)
+
+        await manager.ensure_indexes()
+        async for document in manager.npcs_collection.find({}):
+            assert document["position"] == [document["current_location"]["x"], document["current_location"]["y"]]
+
+    asyncio.run(scenario())
+
+
+def test_decision_move_updates_position():
+    async def scenario():
+        manager = make_manager()
+        npc = await create(manager)
+        decision = DecisionResponse(action="walk", reasoning="test",
+                                    target_location=Location(x=42.0, y=-7.0, z=30.0))
+        await manager.update_versioned(
+            npc.id, lambda current: manager._decision_update(current, decision, datetime.utcnow()), npc=npc
+        )
+        document = await manager.npcs_collection.find_one({"id": npc.id})
+        assert document["position"] == [42.0, -7.0]
+
+    asyncio.run(scenario())
+
+
+def test_closed_decision_stream_hands_over_to_waiting_caller():
+    async def scenario():
+        manager = make_manager()
+        engine = manager.ai_engine
+        engine.router.score = lambda npc, request: 10.0
+        engine.provider.latency_ms, engine.provider.latency_dist = 200, "constant"
+        npc = await create(manager)
+        context = {"situation": "test"}
+
+        stream = manager.process_npc_decision_stream(npc.id, context)
+        assert (await stream.__anext__())["type"] == "partial"
+        waiter = asyncio.ensure_future(manager.process_npc_decision(npc.id, context))
+        await asyncio.sleep(0.01)
+        # Client du flux parti : l'appel en attente reprend la décision au lieu d'échouer
+        await stream.aclose()
+        result = await asyncio.wait_for(waiter, 5)
+        assert result["npc_id"] == npc.id and result["decision"]["action"]
+        assert manager.decision_flight.stats()["leader_takeovers"] == 1
+
+    asyncio.run(scenario())
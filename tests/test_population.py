@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from backend.models import NPC, NPCType
+from backend.population import generate_population, insert_population
+from backend.schedules import SCHEDULE_TEMPLATES
+
+
+def strip_dates(documents):
+    return [{key: value for key, value in document.items()
+             if key not in ("created_at", "last_updated", "last_decision_time")} for document in documents]
+
+
+def test_same_seed_same_population():
+    assert strip_dates(generate_population(50, seed=7)) == strip_dates(generate_population(50, seed=7))
+    assert generate_population(5, seed=7)[0]["id"] != generate_population(5, seed=8)[0]["id"]
+
+
+def test_documents_are_valid_npcs():
+    documents = generate_population(200, seed=3)
+    assert len({document["id"] for document in documents}) == 200
+    for document in documents:
+        npc = NPC(**document)
+        assert npc.schedule_template_id in SCHEDULE_TEMPLATES
+        assert document["position"] == [npc.current_location.x, npc.current_location.y]
+        assert 0 <= npc.stress_level <= 30
+
+
+def test_mix_and_templates_are_respected():
+    documents = generate_population(100, seed=1, mix={NPCType.POLICE: 1.0},
+                                    schedule_templates={NPCType.POLICE: "worker.v1"})
+    assert {document["npc_type"] for document in documents} == {"police"}
+    assert {document["schedule_template_id"] for document in documents} == {"worker.v1"}
+
+
+def test_insert_skips_duplicates_without_stopping():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def scenario():
+        collection = mongomock_motor.AsyncMongoMockClient()["test"].npcs
+        await collection.create_index("id", unique=True)
+        documents = generate_population(30, seed=5)
+        assert await insert_population(collection, documents[:10]) == 10
+        again = generate_population(30, seed=5)
+        assert await insert_population(collection, again, chunk_size=7) == 20
+        assert await collection.count_documents({}) == 30
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from backend.relationships import EdgeUpdate, RelationshipGraph, witness_updates
+
+
+def test_updates_accumulate_and_are_clamped():
+    graph = RelationshipGraph()
+    changed = graph.apply([EdgeUpdate("a", "b", 4), EdgeUpdate("a", "b", 9), EdgeUpdate("a", "a", 5)])
+    assert changed == {("a", "b"): 10}
+    assert graph.apply([EdgeUpdate("a", "b", score=-30)]) == {("a", "b"): -10}
+    # Valeur inchangée : rien à écrire
+    assert graph.apply([EdgeUpdate("a", "b", -1)]) == {}
+    assert graph.edge_count == 1
+
+
+def test_adjacency_in_both_directions():
+    graph = RelationshipGraph()
+    graph.apply([EdgeUpdate("a", "b", score=7), EdgeUpdate("c", "b", score=-3), EdgeUpdate("a", "c", score=2)])
+    assert graph.neighbors("a") == {"b": 7, "c": 2}
+    assert graph.neighbors("a", min_score=5) == {"b": 7}
+    assert graph.reverse_neighbors("b") == {"a": 7, "c": -3}
+    assert graph.reverse_neighbors("b", max_score=0) == {"c": -3}
+    assert graph.stats() == {"edges": 3, "npcs_with_relationships": 2}
+
+
+def test_forget_removes_edges_both_ways():
+    graph = RelationshipGraph()
+    graph.apply([EdgeUpdate("a", "b", score=1), EdgeUpdate("b", "a", score=1), EdgeUpdate("c", "a", score=1),
+                 EdgeUpdate("b", "c", score=1)])
+    assert graph.forget("a") == 3
+    assert graph.edge_count == 1
+    assert graph.reverse_neighbors("b") == {} and graph.neighbors("c") == {}
+
+
+def test_listener_sees_every_change():
+    graph = RelationshipGraph()
+    seen = []
+    graph.listener = lambda kind, payload: seen.append((kind, payload))
+    graph.apply([EdgeUpdate("a", "b", 2)])
+    graph.apply([EdgeUpdate("a", "b", 0)])
+    asyncio.run(graph.remove_node("a"))
+    assert seen == [("edges", [["a", "b", 2]]), ("remove_npc", "a")]
+
+
+def test_propagation_decays_over_hops_and_keeps_the_strongest_path():
+    graph = RelationshipGraph()
+    graph.apply([
+        EdgeUpdate("témoin", "ami", score=10),
+        EdgeUpdate("témoin", "voisin", score=4),
+        EdgeUpdate("ami", "voisin", score=10),
+        EdgeUpdate("voisin", "lointain", score=10),
+        EdgeUpdate("témoin", "ennemi", score=-8),
+    ])
+    reached = graph.propagate({"témoin": 1.0}, hops=2)
+    # voisin : 0.2 en direct, 0.25 via ami au second saut
+    assert reached["ami"] == (0.5, 1)
+    assert reached["voisin"] == (0.25, 2)
+    assert "ennemi" not in reached
+    # lointain : 0.1 par le lien faible, puis 0.125 par le chemin via ami au saut suivant
+    assert reached["lointain"] == (0.1, 2)
+    assert graph.propagate({"témoin": 1.0}, hops=3)["lointain"] == (0.125, 3)
+    assert graph.propagate({"témoin": 1.0}, hops=3, threshold=0.3) == {"ami": (0.5, 1)}
+
+
+def test_witness_updates():
+    assert witness_updates(["a"], ["b"], severity=4) == []
+    assert witness_updates(["a", "b"], ["b", "c"], severity=9) == [
+        EdgeUpdate("a", "b", -3), EdgeUpdate("a", "c", -3), EdgeUpdate("b", "c", -3)
+    ]
+
+
+def test_persist_load_and_migrate():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        await db.npcs.insert_many([
+            {"id": "a", "relationships": {"b": 6, "c": -20}},
+            {"id": "b", "relationships": {}},
+        ])
+        graph = RelationshipGraph(db.relationships)
+        assert await graph.migrate_embedded(db.npcs) == 2
+        assert await db.npcs.count_documents({"relationships": {}}) == 2
+        await graph.apply_and_persist([EdgeUpdate("b", "a", 3)])
+
+        loaded = RelationshipGraph(db.relationships)
+        assert await loaded.load() == 3
+        assert loaded.neighbors("a") == {"b": 6, "c": -10}
+        assert loaded.reverse_neighbors("a") == {"b": 3}
+
+        assert await loaded.remove_node("a") == 3
+        assert await db.relationships.count_documents({}) == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,65 @@
+import pytest
+
+from backend.models import ActivityType, NPCSchedule, NPCType
+from backend.schedules import (
+    DEFAULT_TEMPLATES, SCHEDULE_TEMPLATES, UnknownScheduleTemplate, activity_table, build_activity_table,
+    checked_template_id, resolve_activity, template_matches
+)
+
+
+def test_every_type_has_a_default_template():
+    for npc_type in NPCType:
+        template = SCHEDULE_TEMPLATES[DEFAULT_TEMPLATES[npc_type]]
+        assert template.npc_type == npc_type
+        assert all(activity is not None for activity in activity_table(template.id))
+
+
+def test_activity_lasts_until_the_next_entry_and_wraps_over_midnight():
+    table = build_activity_table([
+        NPCSchedule(hour=8, activity=ActivityType.WORKING),
+        NPCSchedule(hour=22, activity=ActivityType.SLEEPING),
+    ])
+    assert table[8] == table[21] == ActivityType.WORKING
+    assert table[22] == table[0] == table[7] == ActivityType.SLEEPING
+    assert build_activity_table([]) == (None,) * 24
+
+
+def test_highest_priority_wins_at_the_same_hour():
+    table = build_activity_table([
+        NPCSchedule(hour=12, activity=ActivityType.EATING, priority=4),
+        NPCSchedule(hour=12, activity=ActivityType.WORKING, priority=8),
+    ])
+    assert table[12] == ActivityType.WORKING
+
+
+def test_overrides_replace_the_template_entry():
+    overrides = [NPCSchedule(hour=12, activity=ActivityType.SHOPPING, priority=6)]
+    assert resolve_activity("civilian.v1", 12) == ActivityType.EATING
+    assert resolve_activity("civilian.v1", 12, overrides) == ActivityType.SHOPPING
+    assert resolve_activity("civilian.v1", 13, overrides) == ActivityType.SHOPPING
+    assert resolve_activity("civilian.v1", 14, overrides) == ActivityType.WORKING
+    # Heure hors journée ramenée modulo 24
+    assert resolve_activity("civilian.v1", 36) == resolve_activity("civilian.v1", 12)
+
+
+def test_npcs_without_overrides_share_the_cached_table():
+    assert activity_table("police.v1") is activity_table("police.v1", ())
+
+
+def test_legacy_embedded_schedule_is_used_without_template():
+    legacy = [NPCSchedule(hour=0, activity=ActivityType.DRIVING)]
+    assert resolve_activity(None, 15, legacy_schedule=legacy) == ActivityType.DRIVING
+
+
+def test_checked_template_id():
+    assert checked_template_id(NPCType.WORKER) == "worker.v1"
+    assert checked_template_id(NPCType.WORKER, "police.v1") == "police.v1"
+    with pytest.raises(UnknownScheduleTemplate):
+        checked_template_id(NPCType.WORKER, "worker.v2")
+
+
+def test_template_matches_ignores_entry_order():
+    template = SCHEDULE_TEMPLATES["criminal.v1"]
+    assert template_matches("criminal.v1", list(reversed(template.items)))
+    assert not template_matches("criminal.v1", list(template.items[1:]))
+    assert not template_matches("inconnu.v1", list(template.items))
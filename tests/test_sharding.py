@@ -0,0 +1,25 @@
+from backend.sharding import ShardCoordinator, npc_id_from_path
+
+URLS = ["http://127.0.0.1:8001", "http://127.0.0.1:8002"]
+
+
+def test_peer_requires_sharding_header_and_secret():
+    shards = ShardCoordinator(0, URLS, secret="s3cret")
+    assert shards.is_peer("1", "s3cret")
+    assert not shards.is_peer(None, "s3cret")
+    assert not shards.is_peer("1", None)
+    assert not shards.is_peer("1", "wrong")
+
+
+def test_no_peer_without_secret_or_sharding():
+    assert not ShardCoordinator(0, URLS).is_peer("1", "")
+    assert not ShardCoordinator(0, [], secret="s3cret").is_peer("1", "s3cret")
+
+
+def test_owner_is_stable_and_npc_paths():
+    first, second = ShardCoordinator(0, URLS), ShardCoordinator(1, URLS)
+    for npc_id in ("a", "b", "c", "d"):
+        assert first.owner(npc_id) == second.owner(npc_id)
+        assert first.owns(npc_id) != second.owns(npc_id)
+    assert npc_id_from_path("/api/npcs/abc/decision") == "abc"
+    assert npc_id_from_path("/api/npcs/changes") is None
@@ -0,0 +1,135 @@
+import asyncio
+import types
+
+import pytest
+
+from backend import single_flight
+from backend.single_flight import SingleFlight, context_hash
+
+
+def counting(result="ok", delay=0.05):
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result
+
+    return calls, func
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight(idempotency_window=0)
+        calls, func = counting()
+        results = await asyncio.gather(*[flight.run("npc", str(i), func) for i in range(5)])
+        assert results == ["ok"] * 5
+        assert len(calls) == 1
+        stats = flight.stats()
+        assert stats["executions"] == 1 and stats["coalesced_in_flight"] == 4
+        assert stats["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_keys_are_independent():
+    async def scenario():
+        flight = SingleFlight(idempotency_window=0)
+        calls, func = counting()
+        await asyncio.gather(flight.run("a", "x", func), flight.run("b", "x", func))
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_idempotency_window(monkeypatch):
+    async def scenario():
+        now = [100.0]
+        monkeypatch.setattr(single_flight, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+        flight = SingleFlight(idempotency_window=2.0)
+        calls, func = counting(delay=0)
+        await flight.run("npc", "ctx", func)
+        await flight.run("npc", "ctx", func)
+        assert len(calls) == 1 and flight.idempotent_hits == 1
+
+        # Autre contexte : recalculé
+        await flight.run("npc", "other", func)
+        assert len(calls) == 2
+
+        now[0] += 2.5
+        await flight.run("npc", "ctx", func)
+        assert len(calls) == 3
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_waiters_and_is_not_cached():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.05)
+            raise ValueError("LLM indisponible")
+
+        results = await asyncio.gather(*[flight.run("npc", "ctx", failing) for _ in range(3)],
+                                       return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        calls, func = counting(delay=0)
+        assert await flight.run("npc", "ctx", func) == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_hands_over_to_a_waiter():
+    async def scenario():
+        flight = SingleFlight()
+        calls, func = counting(result="décision", delay=0.05)
+        leader = asyncio.ensure_future(flight.run("npc", "ctx", func))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.ensure_future(flight.run("npc", "ctx", func)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # Un seul des appelants en attente relance le calcul, les autres le partagent
+        assert await asyncio.gather(*waiters) == ["décision"] * 3
+        assert len(calls) == 2
+        assert flight.stats()["leader_takeovers"] == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_the_leader():
+    async def scenario():
+        flight = SingleFlight()
+        calls, func = counting(delay=0.05)
+        leader = asyncio.ensure_future(flight.run("npc", "ctx", func))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(flight.run("npc", "ctx", func))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert await leader == "ok"
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_recent_results_are_bounded():
+    async def scenario():
+        flight = SingleFlight(idempotency_window=60, max_cached=3)
+        calls, func = counting(delay=0)
+        for index in range(5):
+            await flight.run(f"npc-{index}", "ctx", func)
+        assert len(flight._recent) == 3
+        assert ("npc-0", "ctx") not in flight._recent
+
+    asyncio.run(scenario())
+
+
+def test_context_hash_ignores_key_order():
+    assert context_hash({"a": 1, "b": [1, 2]}) == context_hash({"b": [1, 2], "a": 1})
+    assert context_hash({"a": 1}) != context_hash({"a": 2})
@@ -0,0 +1,153 @@
+"""Parcours de bout en bout dans le processus : LLM `fake`, MongoDB remplacé par mongomock-motor"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+pytest.importorskip("mongomock_motor")
+httpx = pytest.importorskip("httpx")
+
+
+@pytest.fixture(scope="module")
+def server():
+    """Variables lues à l'import du serveur : posées avant `import backend.server`"""
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in {"MONGO_URL": "mongodb://localhost:27017", "DB_NAME": "gta5_ai_test",
+                            "LLM_PROVIDER": "fake", "LLM_FAKE_LATENCY_MS": "1"}.items():
+            patch.setenv(name, value)
+        for name in ("SNAPSHOT_PATH", "SHARD_ID", "SHARD_URLS", "ADMIN_TOKEN"):
+            patch.delenv(name, raising=False)
+        from benchmarks.load import use_memory_database
+        use_memory_database()
+        from backend import server
+        yield server
+
+
+@asynccontextmanager
+async def ready_client(server):
+    """Client HTTP sur l'application démarrée, une fois l'initialisation terminée"""
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            for _ in range(100):
+                if (await client.get("/api/health/ready")).status_code == 200:
+                    break
+                await asyncio.sleep(0.05)
+            else:
+                pytest.fail(f"Serveur pas prêt : {server.startup_state}")
+            yield client
+
+
+def test_npc_decision_event_and_change_feed(server):
+    async def scenario():
+        async with ready_client(server) as client:
+            feed = (await client.get("/api/npcs/changes")).json()
+            assert feed["resync"]
+            cursor = feed["cursor"]
+
+            response = await client.post("/api/npcs", json={
+                "name": "Témoin", "npc_type": "civilian",
+                "current_location": {"x": 100.0, "y": -200.0, "z": 30.0, "area_name": "Downtown"}
+            })
+            assert response.status_code == 200
+            npc = response.json()
+
+            # Événement avant la décision : la décision peut déplacer le PNJ
+            response = await client.post("/api/events", json={
+                "event_type": "crime", "description": "vol à l'arraché", "severity": 6,
+                "participants": [], "location": {"x": 110.0, "y": -200.0, "z": 30.0}
+            })
+            assert response.status_code == 200
+            assert response.json()["notified_npcs"] == 1
+
+            response = await client.post(f"/api/npcs/{npc['id']}/decision", json={
+                "situation": "test", "event_severity": 9, "player_interaction": True
+            })
+            assert response.status_code == 200
+            decision = response.json()
+            assert decision["npc_id"] == npc["id"]
+            assert decision["decision"]["action"]
+            assert "pacing" in decision
+
+            changes = (await client.get("/api/npcs/changes", params={"since": cursor})).json()
+            assert not changes["resync"]
+            changed = {item["id"]: item for item in changes["changes"]}
+            assert npc["id"] in changed
+            assert changed[npc["id"]]["version"] >= 2
+
+            memories = [memory["event_type"] for memory in
+                        (await client.get(f"/api/npcs/{npc['id']}")).json()["short_term_memory"]]
+            assert "decision" in memories and "witnessed_event" in memories
+
+    asyncio.run(scenario())
+
+
+def test_overloaded_decisions_map_to_429_and_503(server, monkeypatch):
+    async def scenario():
+        async with ready_client(server) as client:
+            npc = (await client.post("/api/npcs", json={
+                "name": "Client", "npc_type": "civilian",
+                "current_location": {"x": 0.0, "y": 0.0, "z": 30.0}
+            })).json()
+            url = f"/api/npcs/{npc['id']}/decision"
+
+            # Une seule place, déjà prise ; pas de file : refus immédiat
+            admission = server.AdmissionController("decision", max_in_flight=1, max_queue=0)
+            monkeypatch.setattr(server, "decision_admission", admission)
+            slot = await admission.acquire()
+            response = await client.post(url, json={"situation": "test"})
+            assert response.status_code == 429
+            assert response.json()["reason"] == "queue_full"
+            assert int(response.headers["Retry-After"]) >= 1
+
+            # File disponible mais place jamais rendue à temps
+            admission.max_queue, admission.queue_timeout = 4, 0.05
+            response = await client.post(url, json={"situation": "test"})
+            assert response.status_code == 503
+            assert response.json()["reason"] == "queue_timeout"
+
+            slot.release()
+            response = await client.post(url, json={"situation": "test"})
+            assert response.status_code == 200
+            assert admission.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_unknown_schedule_template_is_a_bad_request(server):
+    async def scenario():
+        async with ready_client(server) as client:
+            npc = {"name": "Test", "npc_type": "civilian", "schedule_template_id": "civilian.v9",
+                   "current_location": {"x": 0.0, "y": 0.0, "z": 30.0}}
+            response = await client.post("/api/npcs", json=npc)
+            assert response.status_code == 400
+            assert "civilian.v9" in response.json()["detail"]
+            response = await client.post("/api/npcs/batch", json=[npc])
+            assert response.status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_forwarded_header_needs_the_peer_secret(server, monkeypatch):
+    from backend.sharding import ShardCoordinator
+
+    async def scenario():
+        async with ready_client(server) as client:
+            # Deux shards ; le pair 1 n'écoute pas : une transmission vers lui répond 503
+            shards = ShardCoordinator(0, ["http://127.0.0.1:8001", "http://127.0.0.1:9"], timeout=2, secret="s3cret")
+            monkeypatch.setattr(server, "shards", shards)
+            npc_id = next(npc_id for npc_id in (f"npc-{i}" for i in range(100)) if not shards.owns(npc_id))
+            url = f"/api/npcs/{npc_id}"
+
+            # En-tête posé par un client : ignoré, la requête part vers le propriétaire
+            response = await client.get(url, headers={"x-shard-forwarded": "1"})
+            assert response.status_code == 503
+            response = await client.get(url, headers={"x-shard-forwarded": "1", "x-shard-secret": "wrong"})
+            assert response.status_code == 503
+
+            # Vrai pair : traité ici (PNJ absent de ce shard)
+            response = await client.get(url, headers={"x-shard-forwarded": "1", "x-shard-secret": "s3cret"})
+            assert response.status_code == 404
+            await shards.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.profiler import SamplingProfiler
+from backend.timing import CURRENT_TRACE, RequestTracing, StageStats, StageTimer, Trace, TraceBuffer, span
+
+
+def test_stage_timer_adds_up_repeated_stages_and_feeds_the_trace():
+    trace = Trace()
+    token = CURRENT_TRACE.set(trace)
+    try:
+        timer = StageTimer()
+        for _ in range(2):
+            with timer.stage("db"):
+                time.sleep(0.01)
+        with timer.stage("llm"):
+            pass
+    finally:
+        CURRENT_TRACE.reset(token)
+    timings = timer.finish()
+    assert timings["db"] >= 20 and timings["total"] >= timings["db"] + timings["llm"]
+    assert trace.spans["db"][1] == 2 and trace.spans["llm"][1] == 1
+
+
+def test_stage_stats_average_max_and_share():
+    stats = StageStats()
+    assert stats.stats() == {}
+    stats.record({"db": 10.0, "total": 40.0})
+    stats.record({"db": 30.0, "total": 60.0})
+    result = stats.stats()
+    assert result["db"] == {"avg_ms": 20.0, "max_ms": 30.0, "share": 0.4}
+    assert result["total"]["share"] == 1.0
+
+
+def test_span_is_a_no_op_outside_a_request():
+    with span("hors requête"):
+        pass
+    assert CURRENT_TRACE.get() is None
+
+
+def test_server_timing_header():
+    trace = Trace()
+    trace.add("db", 1.5)
+    trace.add("db", 2.0)
+    trace.add("llm", 10.0)
+    assert trace.server_timing(20.0) == 'db;dur=3.50;desc="x2", llm;dur=10.00, total;dur=20.00'
+
+
+def test_trace_buffer_keeps_slow_requests_and_filters():
+    buffer = TraceBuffer(size=3, sample_rate=0.0, slow_ms=100.0)
+    for index, duration in enumerate([50.0, 150.0, 300.0, 120.0, 500.0]):
+        buffer.offer({"route": "/a" if index % 2 else "/b", "duration_ms": duration})
+    assert buffer.stats()["seen"] == 5 and buffer.stats()["kept"] == 4
+    # Taille bornée : la plus ancienne lente est sortie
+    assert [entry["duration_ms"] for entry in buffer.query()] == [500.0, 120.0, 300.0]
+    assert [entry["duration_ms"] for entry in buffer.query(route="/a")] == [120.0]
+    assert [entry["duration_ms"] for entry in buffer.query(min_ms=200, limit=1)] == [500.0]
+
+
+def run_asgi(path: str, content_type: bytes = b"application/json"):
+    async def inner(scope, receive, send):
+        with span("db"):
+            await asyncio.sleep(0)
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", content_type)]})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    buffer = TraceBuffer(sample_rate=1.0)
+    scope = {"type": "http", "method": "GET", "path": path}
+    asyncio.run(RequestTracing(inner, buffer)(scope, receive, send))
+    return dict(sent[0]["headers"]), buffer
+
+
+def test_request_tracing_adds_server_timing_and_keeps_the_trace():
+    headers, buffer = run_asgi("/api/npcs")
+    assert headers[b"server-timing"].startswith(b"db;dur=")
+    (entry,) = buffer.query()
+    assert entry["status"] == 201 and entry["route"] == "other" and entry["spans"]["db"]["count"] == 1
+
+
+@pytest.mark.parametrize("path,content_type", [
+    ("/api/live", b"text/event-stream"),
+    ("/api/admin/profile", b"application/json"),
+])
+def test_streams_and_admin_requests_are_not_kept(path, content_type):
+    headers, buffer = run_asgi(path, content_type=content_type)
+    assert b"server-timing" in headers
+    assert buffer.stats()["seen"] == 0
+
+
+def busy_until(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_finds_the_busy_function():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_until, args=(stop,))
+    worker.start()
+    try:
+        profiler = SamplingProfiler(worker.ident)
+        report = profiler.profile(0.2, interval=0.002, top=5)
+    finally:
+        stop.set()
+        worker.join()
+    assert report["samples"] > 10 and report["idle_ratio"] == 0.0
+    assert any(entry["function"].endswith("test_timing.py:busy_until") for entry in report["cumulative"])
+    assert not profiler.running
+
+
+def test_only_one_profile_at_a_time():
+    profiler = SamplingProfiler(threading.get_ident())
+    profiler._busy.acquire()
+    try:
+        with pytest.raises(RuntimeError):
+            profiler.profile(0.01)
+    finally:
+        profiler._busy.release()
+
+
+def test_report_separates_self_and_cumulative_time():
+    stacks = {
+        ("main.py:run:1", "db.py:query:5"): 3,
+        ("main.py:run:2", "llm.py:call:8"): 1,
+    }
+    report = SamplingProfiler._report(stacks, idle=4, samples=8, elapsed=1.0, interval=0.01, top=10)
+    assert report["idle_ratio"] == 0.5
+    assert report["self"][0] == {"function": "db.py:query", "samples": 3, "share": 0.75}
+    assert report["cumulative"][0] == {"function": "main.py:run", "samples": 4, "share": 1.0}
+    assert report["hot_stacks"][0]["stack"] == ["main.py:run:1", "db.py:query:5"]
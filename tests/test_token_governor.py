@@ -0,0 +1,106 @@
+import types
+
+import pytest
+
+from backend import token_governor
+from backend.token_governor import PRUNE_MIN_SIZE, TokenBucket, TokenGovernor, estimate_tokens
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge du module remplacée (celle d'asyncio reste intacte)"""
+    now = [1000.0]
+    monkeypatch.setattr(token_governor, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 400) == 101
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(600)
+    assert bucket.try_consume(600)
+    assert not bucket.try_consume(1)
+    clock[0] += 6
+    assert bucket.remaining() == 60
+    clock[0] += 600
+    assert bucket.remaining() == 600
+    bucket.adjust(100)
+    assert bucket.remaining() == 600
+
+
+def test_levels_degrade_as_the_budget_drops(clock):
+    governor = TokenGovernor(10000)
+    plan = governor.plan("a", 100, high_priority=False)
+    assert plan.use_llm and plan.level == 0 and plan.max_tokens == 500 and plan.reserved == 600
+
+    # 40 % restant : niveau 1, complétion réduite, intervalle minimal de 10 s
+    governor.bucket.adjust(-5400)
+    plan = governor.plan("b", 10, high_priority=False)
+    assert plan.level == 1 and plan.max_tokens == 300
+    assert governor.plan("b", 10, high_priority=False).reason == "rate_limited"
+
+    # 9 % restant : seuls les PNJ prioritaires passent
+    governor.bucket.adjust(-2790)
+    assert governor.plan("c", 10, high_priority=False).reason == "low_priority"
+    plan = governor.plan("c", 10, high_priority=True)
+    assert plan.use_llm and plan.level == 3 and plan.max_tokens == 150
+    assert governor.plan("d", 1000, high_priority=True).reason == "budget_exhausted"
+    assert governor.stats()["local_decisions"] == {"rate_limited": 1, "low_priority": 1, "budget_exhausted": 1}
+
+
+def test_tier_max_tokens_caps_the_completion(clock):
+    governor = TokenGovernor(10000)
+    plan = governor.plan("a", 100, high_priority=False, max_tokens=200)
+    assert plan.max_tokens == 200 and plan.reserved == 300
+
+
+def test_commit_and_release_settle_the_reservation(clock):
+    governor = TokenGovernor(10000)
+    plan = governor.plan("a", 100, high_priority=False)
+    governor.commit(plan, 120, 80)
+    assert governor.bucket.remaining() == 9800
+    assert governor.stats()["prompt_tokens"] == 120 and governor.stats()["completion_tokens"] == 80
+
+    plan = governor.plan("b", 100, high_priority=False)
+    governor.release(plan)
+    assert governor.bucket.remaining() == 9800
+
+
+def test_hedge_reserves_its_own_tokens_only_at_the_first_level(clock):
+    governor = TokenGovernor(10000)
+    plan = governor.plan("a", 100, high_priority=False)
+    assert governor.hedge(plan) == plan
+    assert governor.bucket.remaining() == 10000 - 2 * plan.reserved
+
+    governor.bucket.adjust(-5000)
+    assert governor.current_level() == 1
+    assert governor.hedge(plan) is None
+    assert governor.stats()["hedges_refused"] == 1
+    assert governor.bucket.remaining() == 10000 - 2 * plan.reserved - 5000
+
+
+def test_pacing_reports_the_next_allowed_decision(clock):
+    governor = TokenGovernor(10000)
+    governor.bucket.adjust(-6000)
+    governor.plan("a", 10, high_priority=False)
+    clock[0] += 4
+    pacing = governor.pacing("a")
+    assert pacing["level"] == 1 and pacing["min_decision_interval_s"] == 10.0
+    assert pacing["next_decision_in_s"] == 6.0
+    assert governor.pacing("inconnu")["next_decision_in_s"] == 0.0
+
+
+def test_last_decisions_are_pruned_once_expired(clock):
+    governor = TokenGovernor(10 ** 9)
+    for index in range(PRUNE_MIN_SIZE - 1):
+        governor.plan(f"old-{index}", 1, high_priority=False)
+    clock[0] += 31
+    recent = [f"new-{index}" for index in range(10)]
+    for npc_id in recent:
+        governor.plan(npc_id, 1, high_priority=False)
+    # Purge au PRUNE_MIN_SIZE-ième : ne restent que les PNJ encore limités par un niveau
+    assert set(governor._last_llm_decision) == set(recent)
+    assert governor._prune_at == PRUNE_MIN_SIZE
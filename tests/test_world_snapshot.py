@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from backend.event_store import SpatialTimeIndex
+from backend.models import GameEvent, Location
+from backend.relationships import EdgeUpdate, RelationshipGraph
+from backend.world_snapshot import WorldSnapshot
+
+
+def make_snapshot(path, db_name: str = "test", max_age_seconds: float = 3600.0) -> WorldSnapshot:
+    return WorldSnapshot(path, RelationshipGraph(), SpatialTimeIndex(), db_name, max_age_seconds)
+
+
+def make_event(x: float) -> GameEvent:
+    return GameEvent(event_type="crime", description="vol", participants=["a"], severity=6,
+                     location=Location(x=x, y=0.0, z=30.0))
+
+
+def fill(snapshot: WorldSnapshot):
+    snapshot.graph.apply([
+        EdgeUpdate("a", "b", score=7), EdgeUpdate("a", "c", score=-4), EdgeUpdate("b", "a", score=2),
+        # « d » n'a que des arêtes entrantes
+        EdgeUpdate("c", "d", score=10),
+    ])
+    snapshot.event_index.add(make_event(10.0))
+
+
+def test_write_then_restore_gives_the_same_state(tmp_path):
+    snapshot = make_snapshot(tmp_path / "world.bin")
+    fill(snapshot)
+    assert snapshot.write() == {"generation": 1, "npcs": 4, "edges": 4}
+    snapshot.close()
+
+    restored = make_snapshot(tmp_path / "world.bin")
+    info = restored.restore()
+    assert info["generation"] == 1 and info["edges"] == 4 and info["events"] == 1 and info["replayed"] == 0
+    assert restored.graph.adjacency() == snapshot.graph.adjacency()
+    assert restored.event_index.entries() == snapshot.event_index.entries()
+
+
+def test_changes_after_the_snapshot_are_replayed_from_the_log(tmp_path):
+    snapshot = make_snapshot(tmp_path / "world.bin")
+    fill(snapshot)
+    snapshot.attach()
+    snapshot.write()
+    snapshot.graph.apply([EdgeUpdate("b", "c", score=5)])
+    snapshot.event_index.add(make_event(20.0))
+    assert asyncio.run(snapshot.graph.remove_node("d")) == 1
+    assert snapshot.pending == 3
+
+    restored = make_snapshot(tmp_path / "world.bin")
+    info = restored.restore()
+    assert info["replayed"] == 3
+    assert restored.graph.neighbors("b") == {"a": 2, "c": 5}
+    assert restored.graph.reverse_neighbors("d") == {}
+    assert len(restored.event_index) == 2
+    snapshot.close()
+    restored.close()
+
+
+def test_incomplete_last_log_line_is_cut(tmp_path):
+    snapshot = make_snapshot(tmp_path / "world.bin")
+    snapshot.attach()
+    snapshot.write()
+    snapshot.graph.apply([EdgeUpdate("a", "b", score=3)])
+    snapshot._log.write('["edges",[["a","c",')
+    snapshot._log.flush()
+
+    restored = make_snapshot(tmp_path / "world.bin")
+    assert restored.restore()["replayed"] == 1
+    assert restored.graph.neighbors("a") == {"b": 3}
+    assert restored.log_path.read_bytes().endswith(b"\n")
+    snapshot.close()
+    restored.close()
+
+
+def test_log_of_an_older_generation_is_ignored(tmp_path):
+    snapshot = make_snapshot(tmp_path / "world.bin")
+    snapshot.attach()
+    snapshot.write()
+    snapshot.graph.apply([EdgeUpdate("a", "b", score=3)])
+    log = snapshot.log_path.read_bytes()
+    snapshot.write()
+    snapshot.close()
+    # Journal de la génération 1 laissé en place après l'écriture de la génération 2
+    snapshot.log_path.write_bytes(log)
+
+    restored = make_snapshot(tmp_path / "world.bin")
+    info = restored.restore()
+    assert info["generation"] == 2 and info["replayed"] == 0
+    assert restored.graph.neighbors("a") == {"b": 3}
+    restored.close()
+
+
+def test_unusable_snapshots_fall_back_to_mongo(tmp_path):
+    path = tmp_path / "world.bin"
+    assert make_snapshot(path).restore() is None
+
+    snapshot = make_snapshot(path)
+    fill(snapshot)
+    snapshot.write()
+    snapshot.close()
+    assert make_snapshot(path, db_name="autre").restore() is None
+
+    old = time.time() - 7200
+    for file in (path, snapshot.log_path):
+        os.utime(file, (old, old))
+    assert make_snapshot(path).restore() is None
+
+    path.write_bytes(b"PASUNSNAPSHOT" + b"\0" * 16)
+    assert make_snapshot(path).restore() is None